@@ -3,6 +3,7 @@ from rest_framework import serializers, exceptions
 from rest_framework.generics import get_object_or_404
 
 from account_app.models import User, Profile
+from core.utils.compiled_serializer import Field, as_datetime, compile_spec
 from blog_app.models import CategoryBlog, PostBlog, TagBlog
 from core_app.models import Image
 
@@ -180,6 +181,18 @@ class BlogTagWithOutPagination(serializers.ModelSerializer):
         )
 
 
+# fast path of SeoBlogSerializer, same output
+serialize_seo_blog = compile_spec(
+    {
+        "post_title": "post_title",
+        "post_slug": "post_slug",
+        "created_at": Field("created_at", as_datetime),
+        "updated_at": Field("updated_at", as_datetime),
+    },
+    name="serialize_seo_blog",
+)
+
+
 class SeoBlogSerializer(serializers.ModelSerializer):
     class Meta:
         model = PostBlog
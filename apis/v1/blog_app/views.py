@@ -290,9 +290,9 @@ class SeoBlogViewSet(CacheMixin, viewsets.GenericViewSet, mixins.ListModelMixin)
         if get_cache:
             return response.Response(get_cache)
         else:
-            qs = super().list(request, *args, **kwargs)
-            self.set_cache(cache_key, qs.data)
-            return qs
+            data = [serializers.serialize_seo_blog(row) for row in self.filter_queryset(self.get_queryset())]
+            self.set_cache(cache_key, data)
+            return response.Response(data)
 
     def get_queryset(self):
         return PostBlog.objects.filter(
@@ -1,10 +1,9 @@
-from django.db.models import F
 from rest_framework import viewsets, permissions, views, response, status
-from django.utils import timezone
 
 from core.utils.custom_filters import AdminCouponFilter
 from core.utils.pagination import TwentyPageNumberPagination
 from . import serilizers
+from discount_app.coupons import get_valid_coupon
 from discount_app.models import Coupon, ProductDiscount
 
 
@@ -44,18 +43,12 @@ class ValidCouponCodeView(views.APIView):
         code = request.GET.get("code", None)
 
         if code:
-            coupon = Coupon.objects.filter(
-                code=code,
-                is_active=True,
-                valid_from__lte=timezone.now(),
-                valid_to__gte=timezone.now(),
-                number_of_uses__lt=F("maximum_use")
-            ).only("id", "amount")
+            coupon = get_valid_coupon(code)
             if coupon:
                 return response.Response(
                     {
                         "data": "ok",
-                        "amount": coupon.first().amount
+                        "amount": coupon.amount
                     }
                 )
             else:
@@ -14,12 +14,14 @@ from order_app.models import (
     ShippingCompany,
     PaymentGateWay,
 )
-from order_app.tasks import (
-    create_gateway_payment,
-    send_notification_to_user_after_complete_order,
-    send_sms_after_complete_order,
-)
+from order_app import cart
+from order_app.pricing import price_cart
+from order_app.totals import checkout_totals
+from order_app.fulfilment import BULK_LIMIT, FULFILMENT_TRANSITIONS
+from order_app.events import PAID, record_event
+from order_app.tasks import create_gateway_payment
 from product_app.models import ProductVariant
+from product_app.stock import get_stock_levels, hot_stock_guard
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -37,8 +39,9 @@ class OrderSerializer(serializers.ModelSerializer):
             "last_name",
             "phone",
             "description",
+            "grand_total",
         )
-        read_only_fields = ("is_complete", "tracking_code", "address_id")
+        read_only_fields = ("is_complete", "tracking_code", "address_id", "grand_total")
 
     def create(self, validated_data):
         # get user id by context request
@@ -51,6 +54,16 @@ class OrderSerializer(serializers.ModelSerializer):
         return Order.objects.create(profile_id=profile_id, **validated_data)
 
 
+class BulkOrderStatusSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=tuple(FULFILMENT_TRANSITIONS))
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        max_length=BULK_LIMIT,
+    )
+
+
 class SimpleProfileOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Profile
@@ -83,6 +96,7 @@ class AdminOrderSerializer(serializers.ModelSerializer):
             "is_deleted",
             "deleted_at",
         )
+        read_only_fields = ("items_total", "discount_total", "shipping_total", "grand_total")
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -143,7 +157,8 @@ class NestedCartItemSerializer(serializers.Serializer):
 
 
 class CreateOrderSerializer(serializers.Serializer):
-    items = NestedCartItemSerializer(many=True)
+    items = NestedCartItemSerializer(many=True, required=False)
+    cart_id = serializers.CharField(required=False, write_only=True, help_text=_("id of the cart in redis, instead of items"))
     address_id = serializers.IntegerField()
     shipping = serializers.PrimaryKeyRelatedField(
         queryset=ShippingMethod.objects.only(
@@ -169,31 +184,41 @@ class CreateOrderSerializer(serializers.Serializer):
         # validate stock number
         coupon_code = data.get("coupon_code", None)
 
-        # check variant dose exits
-        variant_ids = [item["product_variant_id"] for item in data["items"]]
-        validate_product_variant = ProductVariant.objects.filter(
-            id__in=variant_ids, stock_number__gt=0
-        ).only("id")
-        if not validate_product_variant.exists():
+        # lines of the cart in redis
+        cart_id = data.get("cart_id")
+        if cart_id:
+            current_cart_id, quantities = cart.read_cart(self.context["request"].user.id)
+            if current_cart_id != cart_id or not quantities:
+                raise serializers.ValidationError(
+                    {"message": _("cart is empty or already checked out")}
+                )
+            data["items"] = cart.cart_items(quantities)
+        elif not data.get("items"):
             raise serializers.ValidationError(
-                {"message": _("product variant not available")}
+                {"items": _("items or cart_id is required")}
             )
 
-        # filter variants
-        existing_variants = ProductVariant.objects.filter(
-            id__in=variant_ids
-        ).only("id")
+        # stock of variants in one query, hot variants are read from redis
+        variant_ids = {item["product_variant_id"] for item in data["items"]}
+        stock_levels = dict(
+            ProductVariant.objects.filter(id__in=variant_ids).values_list("id", "stock_number")
+        )
 
         # validate variants dose exits
-        if len(existing_variants) != len(variant_ids):
-            existing_ids = set(existing_variants.values_list("id", flat=True))
-            missing_ids = set(variant_ids) - existing_ids
+        missing_ids = variant_ids - stock_levels.keys()
+        if missing_ids:
             raise serializers.ValidationError(
                 {
                     "error": f"Product variants with ids {missing_ids} do not exist"
                 }
             )
 
+        stock_levels = get_stock_levels(stock_levels)
+        if not any(stock > 0 for stock in stock_levels.values()):
+            raise serializers.ValidationError(
+                {"message": _("product variant not available")}
+            )
+
         if coupon_code:
             res = Order.is_valid_coupon(code=coupon_code)
             if not res:
@@ -207,24 +232,22 @@ class CreateOrderSerializer(serializers.Serializer):
     def create(self, validated_data):
         user = self.context["request"].user  # get user by context
 
-        # check stock number befor order
-        variant_ids = [item["product_variant_id"] for item in validated_data["items"]]
-        quantities = {
-            item["product_variant_id"]: item["quantity"]
-            for item in validated_data["items"]
-        }
+        # redis holds of hot stock are given back when this transaction rolls back
+        with hot_stock_guard(), transaction.atomic():
+            # get coupon in validated data
+            coupon = validated_data.get("valid_coupon")
+
+            # price every item in one query
+            quote = price_cart(
+                validated_data["items"],
+                shipping=validated_data.get("shipping"),
+                coupon=coupon or None,
+            )
+            if quote["missing_ids"]:
+                raise serializers.ValidationError(
+                    {"message": _("product variant not available"), "ids": quote["missing_ids"]}
+                )
 
-        with transaction.atomic():
-            variants = ProductVariant.objects.filter(
-                id__in=variant_ids
-            ).select_for_update()
-
-            for variant in variants:
-                required_quantity = quantities[variant.id]
-                if variant.stock_number < required_quantity:
-                    raise serializers.ValidationError(
-                        f"amount product {variant.name} not enough"
-                    )
             # create order
             profile = Profile.objects.filter(user_id=self.context["request"].user.id).only("id").first()
 
@@ -248,43 +271,51 @@ class CreateOrderSerializer(serializers.Serializer):
                 phone=phone,
                 description=description,
                 items_data=items,
+                **checkout_totals(quote),
             )
 
-            # create order item
-            order_items = []
-            for item in validated_data["items"]:
-                variant = (
-                    ProductVariant.objects.filter(id=item["product_variant_id"])
-                    .only("id", "price")
-                    .first()
-                )
-                order_items.append(
-                    OrderItem(
-                        order_id=order.id,
-                        product_variant_id=variant.id,
-                        price=variant.price,
-                        quantity=item["quantity"],
-                    )
+            # create order item with the prices of the engine
+            order_items = [
+                OrderItem(
+                    order_id=order.id,
+                    product_variant_id=line["product_variant_id"],
+                    price=line["unit_price"],
+                    quantity=line["quantity"],
                 )
+                for line in quote["lines"]
+            ]
 
             items = OrderItem.objects.bulk_create(order_items)
 
-            # reserve order
-            order.reserved_stock()
+            # افزایش تعداد استفاده از کوپن، یک update شرطی
+            if coupon:
+                order.redeem_coupon(coupon)
+
+            # reserve order, one guarded update for all variants
+            order.reserved_stock(items=quote["lines"])
 
-        # get coupon in validated data
-        coupon = validated_data.get("valid_coupon")
+            # سبد خرید بعد از ثبت سفارش خالی میشود
+            cart_id = validated_data.get("cart_id")
+            if cart_id:
+                transaction.on_commit(lambda: cart.consume_cart(user.id, cart_id))
 
-        # ورینت های معتبر
-        variants = [i for i in validated_data["items"]]
         # محاسبه قیمت نهایی
-        calc_total_price = order.total_price(coupon_code=coupon, variants=variants)
+        calc_total_price = quote["grand_total"]
 
         if calc_total_price == 0:  # check final price is zero
-            order.status = "paid"
-            order.is_complete = True
-            order.payment_date = timezone.now()
-            order.save()
+            with transaction.atomic():
+                order.status = "paid"
+                order.is_complete = True
+                order.payment_date = timezone.now()
+                order.save(update_fields=("status", "is_complete", "payment_date", "updated_at"))
+                # notifications and sms go through the outbox after commit
+                record_event(
+                    order.id,
+                    PAID,
+                    user_id=user.id,
+                    mobile_phone=user.mobile_phone,
+                    tracking_code=order.tracking_code,
+                )
             json_data = {"message": "success", "result": 100}
             create_gateway_payment.delay(
                 order_id=order.id, json_data=json_data, user_id=user.id
@@ -295,10 +326,6 @@ class CreateOrderSerializer(serializers.Serializer):
             json_data["phone"] = phone
             json_data["first_name"] = first_name
             json_data["last_name"] = last_name
-            send_notification_to_user_after_complete_order.delay(
-                mobile_phone=user.mobile_phone
-            )
-            send_sms_after_complete_order.delay(user.mobile_phone, order.tracking_code)
             return json_data
         else:
             payment_gateway = request_gate_way(
@@ -327,6 +354,46 @@ class CreateOrderSerializer(serializers.Serializer):
         return data
 
 
+class CartQuoteSerializer(serializers.Serializer):
+    items = NestedCartItemSerializer(many=True)
+    shipping = serializers.PrimaryKeyRelatedField(
+        queryset=ShippingMethod.objects.only(
+            "id",
+            "price",
+        ),
+        required=False,
+    )
+    coupon_code = serializers.CharField(required=False)
+
+    def validate(self, data):
+        coupon = None
+        coupon_code = data.get("coupon_code", None)
+        if coupon_code:
+            res = Order.is_valid_coupon(code=coupon_code)
+            if not res:
+                raise serializers.ValidationError(
+                    {"message": _("coupon code is invalid")},
+                )
+            coupon = res
+
+        quote = price_cart(data["items"], shipping=data.get("shipping"), coupon=coupon)
+        if quote["missing_ids"]:
+            raise serializers.ValidationError(
+                {"message": _("product variant not available"), "ids": quote["missing_ids"]}
+            )
+        data["quote"] = quote
+        return data
+
+
+class CartItemSerializer(serializers.Serializer):
+    product_variant_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=cart.MAX_QUANTITY)
+
+
+class CartQuantitySerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=0, max_value=cart.MAX_QUANTITY, help_text=_("0 removes the line"))
+
+
 class AdminShippingSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShippingCompany
@@ -425,16 +492,12 @@ class ResultOrderSerializer(serializers.ModelSerializer):
     address = ResultOrderCityStateNameSerializer()
     user_order_count = serializers.SerializerMethodField()
     payment_gateways = ResultOrderPaymentGatewaySerializer(many=True)
-    # total_price = serializers.SerializerMethodField()
+    total_price = serializers.DecimalField(source="grand_total", max_digits=12, decimal_places=3, read_only=True)
 
     @extend_schema_field(serializers.IntegerField())
     def get_user_order_count(self, obj):
         return obj.user_order_count
 
-    # @extend_schema_field(serializers.DecimalField(decimal_places=3, max_digits=12))
-    # def get_total_price(self, obj):
-    #     return obj.total_price
-
     class Meta:
         model = Order
         fields = (
@@ -452,7 +515,10 @@ class ResultOrderSerializer(serializers.ModelSerializer):
             "last_name",
             "phone",
             "description",
-            # "total_price"
+            "items_total",
+            "discount_total",
+            "shipping_total",
+            "total_price",
         )
 
 
@@ -19,5 +19,9 @@ order_router.register("items", views.OrderItemViewSet, basename="order-items")
 
 urlpatterns = [
     path("create_order/", views.CreateOrderView.as_view(), name="create_order"),
+    path("quote/", views.CartQuoteView.as_view(), name="quote"),
+    path("cart/", views.CartView.as_view(), name="cart"),
+    path("cart/items/", views.CartItemView.as_view(), name="cart_items"),
+    path("cart/items/<int:variant_id>/", views.CartItemDetailView.as_view(), name="cart_item_detail"),
     path('verify_payment/', views.VerifyPaymentGatewayView.as_view(), name="verify_payment"),
 ] + router.urls + order_router.urls
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework.generics import get_object_or_404
 from drf_spectacular.utils import extend_schema_field
 
+from core.utils.compiled_serializer import Field, as_datetime, compile_spec
 from product_app.tasks import create_comment_notification_admin
 from core_app.models import Image
 from discount_app.models import ProductDiscount
@@ -137,6 +138,8 @@ class ProductSerializer(serializers.ModelSerializer):
             "is_deleted",
             "deleted_at",
             "created_at",
+            "search_text",
+            "search_vector",
         )
         read_only_fields = ("total_sale",)
 
@@ -589,6 +592,20 @@ class ListBrandNameSerializer(serializers.ModelSerializer):
         )
 
 
+# fast path of SeoProductSerializer, same output
+serialize_seo_product = compile_spec(
+    {
+        "category_id": "category_id",
+        "product_id": Field("id", str),
+        "product_name": "product_name",
+        "product_slug": "product_slug",
+        "created_at": Field("created_at", as_datetime),
+        "updated_at": Field("updated_at", as_datetime),
+    },
+    name="serialize_seo_product",
+)
+
+
 class SeoProductSerializer(serializers.ModelSerializer):
     product_id = serializers.CharField(source="id")
 
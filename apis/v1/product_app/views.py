@@ -1,6 +1,7 @@
 from django.db.models import Prefetch, OuterRef, Subquery
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, permissions, generics, filters, mixins, response
+from rest_framework.decorators import action
 
 from account_app.models import Profile
 from core.utils.custom_filters import (
@@ -12,10 +13,13 @@ from core.utils.custom_filters import (
     ProductHomePageFilter,
     ProductTagFilter
 )
-from core.utils.pagination import TwentyPageNumberPagination
+from core.utils.pagination import TwentyPageNumberPagination, KeysetPagination
 from core.utils.permissions import IsOwnerOrReadOnly
+from core.utils.renderers import FAST_RENDERER_CLASSES
 from discount_app.models import ProductDiscount
 from . import serializers
+from product_app.categories import in_category_subtree, cached_category_tree
+from product_app.stock import overlay_live_stock
 from product_app.models import (
     Category,
     Product,
@@ -34,7 +38,8 @@ from ..utils.cache_mixin import CacheMixin
 class ProductCategoryViewSet(CacheMixin, viewsets.ModelViewSet):
     """
     pagination --> 20 item, only user admin have pagination \n
-    filter query --> (category_name, is_active) --> only user admin have filter
+    filter query --> (category_name, is_active) --> only user admin have filter \n
+    tree --> every active category nested under its parent with product counts, without pagination
     """
     filterset_class = AdminProductCategoryFilter
     pagination_class = TwentyPageNumberPagination
@@ -80,6 +85,10 @@ class ProductCategoryViewSet(CacheMixin, viewsets.ModelViewSet):
         else:
             return serializers.ProductCategorySerializer
 
+    @action(detail=False, methods=["get"], pagination_class=None, filterset_class=None)
+    def tree(self, request):
+        return response.Response(cached_category_tree())
+
 
 class CreateAdminProductView(generics.CreateAPIView):
     serializer_class = serializers.ProductSerializer
@@ -114,6 +123,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     # TODO, better performance create product
     """
     search_filter --> (product_name, sku) \n
+    include_descendants=true --> products of the category and all of its subcategories \n
     pagination --> 20 item
     """
     pagination_class = TwentyPageNumberPagination
@@ -139,6 +149,13 @@ class ProductViewSet(viewsets.ModelViewSet):
             self.permission_classes = (permissions.IsAdminUser,)
         return super().get_permissions()
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            # live stock of hot variants
+            overlay_live_stock([variant for product in page for variant in product.variants.all()])
+        return page
+
     def get_queryset(self):
         product_image_fields = (
             "image__image",
@@ -157,9 +174,14 @@ class ProductViewSet(viewsets.ModelViewSet):
             "name",
         )
 
+        include_descendants = self.request.query_params.get("include_descendants", "").lower() in ("1", "true")
+        if self.action == "list" and include_descendants:
+            products = in_category_subtree(Product.objects.all(), self.kwargs["category_pk"])
+        else:
+            products = Product.objects.filter(category_id=self.kwargs["category_pk"])
+
         return (
-            Product.objects
-            .filter(category_id=self.kwargs["category_pk"])
+            products
             .select_related("category", "product_brand")
             .only(
                 "id",
@@ -622,6 +644,7 @@ class SeoProductViewSet(
     viewsets.GenericViewSet
 ):
     serializer_class = serializers.SeoProductSerializer
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def list(self, request, *args, **kwargs):
         cache_key = "list_seo_product_name"
@@ -629,9 +652,9 @@ class SeoProductViewSet(
         if get_cache:
             return response.Response(get_cache)
         else:
-            qs = super().list(request, *args, **kwargs)
-            self.set_cache(cache_key, qs.data)
-            return qs
+            data = [serializers.serialize_seo_product(row) for row in self.filter_queryset(self.get_queryset())]
+            self.set_cache(cache_key, data)
+            return response.Response(data)
 
     def get_queryset(self):
         return Product.objects.filter(
@@ -647,8 +670,21 @@ class SeoProductViewSet(
 
 class UserProductVariantViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = serializers.UserProductVariantSerializer
-    pagination_class = TwentyPageNumberPagination
+    pagination_class = KeysetPagination
     filterset_class = UserProductVariantsFilter
+    ordering_fields = ("id", "price", "updated_at")
+    keyset_default_ordering = "id"
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            overlay_live_stock(page)
+        return page
+
+    def get_object(self):
+        obj = super().get_object()
+        overlay_live_stock([obj])
+        return obj
 
     def get_queryset(self):
         return ProductVariant.objects.filter(is_active=True)
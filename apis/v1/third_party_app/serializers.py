@@ -1,8 +1,11 @@
+from functools import lru_cache
+
 from rest_framework import serializers, exceptions
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from django.core.validators import MinLengthValidator
 from core.utils.ba_salam import upload_image_file, upload_file
+from core.utils.compiled_serializer import Const, Field, Method, compile_spec
 from core.utils.enums import FileTypeChoices
 from core_app.models import Image, UploadFile
 from product_app.models import ProductImages, ProductVariant, ProductVariantAttributeValues
@@ -158,6 +161,51 @@ class TorobProductAttributeValue(serializers.ModelSerializer):
         )
 
 
+TOROB_BASE_URL = "https://gs-tools.ir"
+
+
+def torob_page_url(variant):
+    # base_url = "http://localhost:8000" if settings.DEBUG else "https://gs-tools.ir"
+    product = variant.product
+    return f"{TOROB_BASE_URL}/product/{variant.product_id}/{product.category_id}/{product.product_slug}"
+
+
+def torob_image_links(variant):
+    return [str(product_image.image.image.url) for product_image in variant.product.product_product_image.all()]
+
+
+@lru_cache(maxsize=1024)
+def spec_key(attribute_name):
+    # استفاده از slugify برای ایجاد کلیدهای استاندارد
+    return slugify(attribute_name, allow_unicode=True)
+
+
+def torob_spec(variant):
+    return {spec_key(attr.attribute.attribute_name): attr.value for attr in variant.product.product_attributes.all()}
+
+
+# fast path of TrobSerializer, same output
+serialize_torob = compile_spec(
+    {
+        "page_unique": Field("id", str),
+        "page_url": Method(torob_page_url),
+        "title": "name",
+        "availability": "is_active",
+        "category_name": Field("product.category.category_name", nullable=True),
+        "image_links": Method(torob_image_links),
+        "date_added": Field("created_at", str),
+        "date_updated": Field("updated_at", str),
+        "current_price": Field("price", int),
+        "subtitle": "subtitle",
+        "old_price": Field("price", str),
+        "short_desc": "short_desc",
+        "guarantee": Const(None),
+        "spec": Method(torob_spec),
+    },
+    name="serialize_torob",
+)
+
+
 class TrobSerializer(serializers.ModelSerializer):
     title = serializers.CharField(source="name")
     availability = serializers.BooleanField(source="is_active")
@@ -192,31 +240,13 @@ class TrobSerializer(serializers.ModelSerializer):
         )
 
     def get_image_links(self, obj):
-        return [
-            str(product_image.image.image.url)
-            for product_image in obj.product.product_product_image.all()
-        ]
+        return torob_image_links(obj)
 
     def get_page_url(self, obj):
-        product_category_id = obj.product.category_id
-        product_id = obj.product_id
-        product_slug = obj.product.product_slug
-        # product_variant_id = obj.id
-        # base_url = "http://localhost:8000" if settings.DEBUG else "https://gs-tools.ir"
-        base_url = "https://gs-tools.ir"
-        page_url = f"{base_url}/product/{product_id}/{product_category_id}/{product_slug}"
-        return page_url
+        return torob_page_url(obj)
 
     def get_spec(self, obj):
-        attributes = obj.product.attributes.all()
-        spec_dict = {}
-        
-        for attr in attributes:
-            # استفاده از slugify برای ایجاد کلیدهای استاندارد
-            key = slugify(attr.attribute.attribute_name, allow_unicode=True)
-            spec_dict[key] = attr.value
-
-        return spec_dict
+        return torob_spec(obj)
 
 
 class PostRequestTorobSerializer(serializers.Serializer):
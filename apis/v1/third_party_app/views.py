@@ -9,9 +9,10 @@ from core.utils import ba_salam
 from core.utils.ba_salam import read_categories, list_retrieve_product
 from core.utils.pagination import FlexiblePagination
 from core_app.models import Image, UploadFile
-from product_app.models import ProductVariant, Product, ProductImages
+from product_app.models import ProductVariant, Product, ProductImages, ProductVariantAttributeValues
 from product_app.tasks import update_product_id_ba_salam
 from core.utils.pagination import TorobPagination
+from core.utils.renderers import FAST_RENDERER_CLASSES
 from drf_spectacular.utils import extend_schema
 
 
@@ -215,6 +216,7 @@ class UpdateProductView(views.APIView):
 class TorobProductView(views.APIView):
     serializer_class = serializers.PostRequestTorobSerializer
     pagination_class = TorobPagination
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def parse_url(self, url):
         parse = urlparse(url)
@@ -259,7 +261,6 @@ class TorobProductView(views.APIView):
                 "short_desc",
                 "is_active",
                 "stock_number",
-                "old_price",
                 "created_at",
                 "updated_at"
             ).prefetch_related(
@@ -271,8 +272,8 @@ class TorobProductView(views.APIView):
                     )
                 ),
                 Prefetch(
-                    "product__attributes",
-                    queryset=ProductAttributeValues.objects.select_related("attribute").only(
+                    "product__product_attributes",
+                    queryset=ProductVariantAttributeValues.objects.filter(is_active=True).select_related("attribute").only(
                         "product_id",
                         "attribute__attribute_name",
                         "value"
@@ -303,8 +304,7 @@ class TorobProductView(views.APIView):
             query = self.get_queryset().filter(id=int(page_unique[0])).first()
             if query is None:
                 return response.Response(data=self.get_empty_response)
-            serializer = serializers.TrobSerializer(query)
-            data = self.not_empty_reponse(serializer.data)
+            data = self.not_empty_reponse(serializers.serialize_torob(query))
             return response.Response(data)
 
         if page and sort:
@@ -313,14 +313,13 @@ class TorobProductView(views.APIView):
             paginator = self.pagination_class()
             queryset = None
             if sort == "date_added_desc":
-                queryset = self.get_queryset()
+                queryset = self.get_queryset().order_by("id")
             elif sort == "date_updated_desc":
                 queryset = self.get_queryset().order_by("-updated_at")
             else:
                 raise exceptions.ValidationError({"error": "sort must be (date_updated_desc) or (date_added_desc)"})
             p = paginator.paginate_queryset(queryset=queryset, request=request, view=self)
-            serializer = serializers.TrobSerializer(p, many=True)
-            return paginator.get_paginated_response(serializer.data)
+            return paginator.get_paginated_response([serializers.serialize_torob(row) for row in p])
 
         if page_urls:
             # import ipdb
@@ -331,6 +330,5 @@ class TorobProductView(views.APIView):
             if query is None:
                 return response.Response(self.get_empty_response)
             else:
-                serializer = serializers.TrobSerializer(query)
-                data = self.not_empty_reponse(serializer.data)
+                data = self.not_empty_reponse(serializers.serialize_torob(query))
                 return response.Response(data)
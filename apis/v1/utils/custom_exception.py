@@ -36,3 +36,27 @@ class CartNotFound(APIException):
     status_code = status.HTTP_404_NOT_FOUND
     default_detail = "کارت قابل دسترسی نمی‌باشد"
     default_code = "cart_not_found"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "این Idempotency-Key قبلا برای درخواست دیگری استفاده شده است"
+    default_code = "idempotency_key_reused"
+
+
+class IdempotencyRequestInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "درخواستی با همین Idempotency-Key در حال پردازش است"
+    default_code = "idempotency_request_in_progress"
+
+
+class ShoppingCartUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "سبد خرید در حال حاضر در دسترس نیست"
+    default_code = "shopping_cart_unavailable"
+
+
+class OrderStatusConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "وضعیت سفارش اجازه این تغییر را نمی دهد"
+    default_code = "order_status_conflict"
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework import exceptions, response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .custom_exception import IdempotencyKeyReused, IdempotencyRequestInProgress
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _fingerprint(request):
+    body = json.dumps(
+        {
+            "method": request.method,
+            "path": request.path,
+            "query": sorted(request.query_params.lists()),
+            "data": request.data if request.method not in ("GET", "HEAD") else None,
+        },
+        cls=JSONEncoder,
+        sort_keys=True,
+    )
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(stored):
+    return response.Response(
+        json.loads(stored["data"]),
+        status=stored["status"],
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+def idempotent(scope, ttl=60 * 60 * 24, lock_timeout=60, wait=10, poll_interval=0.1):
+    """
+    replay the first response of a request that has Idempotency-Key header \n
+    scope --> name of the endpoint, keys are per user and scope \n
+    a duplicate that arrives while the first one is running waits up to `wait` seconds for its response,
+    5xx and 429 responses are not stored so the client can retry them \n
+    when the cache is down (django-redis ignores its errors and returns None) the request runs
+    without idempotency
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return func(self, request, *args, **kwargs)
+            if len(key) > 255:
+                raise exceptions.ValidationError({"message": f"{IDEMPOTENCY_HEADER} is too long"})
+
+            fingerprint = _fingerprint(request)
+            cache_key = f"idempotency:{scope}:{request.user.id}:{hashlib.sha256(key.encode()).hexdigest()}"
+            lock_key = f"{cache_key}:lock"
+
+            deadline = time.monotonic() + wait
+            while True:
+                stored = cache.get(cache_key)
+                if stored is not None:
+                    if stored["fingerprint"] != fingerprint:
+                        raise IdempotencyKeyReused()
+                    return _replay(stored)
+
+                added = cache.add(lock_key, fingerprint, timeout=lock_timeout)
+                if added is None:
+                    logger.warning("cache unavailable, %s runs without idempotency", scope)
+                    return func(self, request, *args, **kwargs)
+                if added:
+                    break
+
+                # the same key is running in another worker, wait for its response
+                while True:
+                    if time.monotonic() >= deadline:
+                        raise IdempotencyRequestInProgress()
+                    time.sleep(poll_interval)
+                    if cache.get(cache_key) is not None or cache.get(lock_key) is None:
+                        break
+
+            try:
+                result = func(self, request, *args, **kwargs)
+                if result.status_code < 500 and result.status_code != 429:
+                    cache.set(
+                        cache_key,
+                        {
+                            "fingerprint": fingerprint,
+                            "status": result.status_code,
+                            "data": json.dumps(result.data, cls=JSONEncoder),
+                        },
+                        timeout=ttl,
+                    )
+                return result
+            finally:
+                cache.delete(lock_key)
+        return wrapper
+    return decorator
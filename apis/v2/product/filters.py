@@ -1,8 +1,10 @@
-from django.db.models import OuterRef, Exists
-from django_filters.rest_framework import FilterSet, BooleanFilter, NumberFilter
+from django.db.models import OuterRef, Exists, Subquery
+from django.utils import timezone
+from django_filters.rest_framework import FilterSet, BooleanFilter, NumberFilter, CharFilter
 
 from discount_app.models import ProductDiscount
-from product_app.models import ProductVariant
+from product_app.models import Product, ProductVariant, ProductListing
+from product_app.search import search_products
 
 
 class ProductVariantFilter(FilterSet):
@@ -48,3 +50,35 @@ class ProductVariantFilter(FilterSet):
             return queryset
         else:
             return queryset.filter(product__product_brand=int(value))
+
+
+class ProductListingFilter(FilterSet):
+    """
+    same query params as ProductVariantFilter, on the product_listing columns
+    """
+    name__icontains = CharFilter(field_name="variant_name", lookup_expr="icontains", label="name__icontains")
+    id = NumberFilter(field_name="variant_id", label="id")
+    has_discount = BooleanFilter(method='filter_has_discount', label="has_discount")
+    category_id = NumberFilter(field_name="category_id", label="category_id")
+    brand_id = NumberFilter(field_name="brand_id", label="brand_id")
+    null_sku = BooleanFilter(field_name="sku", lookup_expr="isnull", label="null_sku")
+    q = CharFilter(method="search", label="q")
+
+    class Meta:
+        model = ProductListing
+        fields = ()
+
+    def search(self, queryset, name, value):
+        # the product index finds the products, the rank is computed only for their rows
+        matched = search_products(Product.objects.all(), value)
+        rank = matched.filter(id=OuterRef("product_id")).values("search_rank")[:1]
+        return queryset.filter(
+            product_id__in=matched.values("id")
+        ).annotate(search_rank=Subquery(rank))
+
+    def filter_has_discount(self, queryset, name, value):
+        if value is None:
+            return queryset
+        if value is True:
+            return queryset.filter(discount_end__gte=timezone.now())
+        return queryset.exclude(discount_end__gte=timezone.now())
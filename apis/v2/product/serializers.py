@@ -1,8 +1,11 @@
+from django.core.files.storage import default_storage
+from django.utils import timezone
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from core.utils.compiled_serializer import Field, Method, as_datetime, as_decimal, compile_spec
 from discount_app.models import ProductDiscount
-from product_app.models import Product, ProductVariant, ProductImages
+from product_app.models import Product, ProductVariant, ProductImages, ProductListing
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -120,3 +123,127 @@ class ProductListHomePageSerializer(serializers.ModelSerializer):
             }
         ]
         return data
+
+
+def listing_images(row):
+    if row.image_name is None and row.image_url is None:
+        return []
+    return [
+        {
+            "image": {
+                "get_image_url": default_storage.url(row.image_name) if row.image_name else row.image_url,
+                "image_id_ba_salam": None,
+            },
+            "order": row.image_order,
+            "alt_text_image": row.image_alt,
+            "updated_at": None if row.image_updated_at is None else as_datetime(row.image_updated_at),
+        }
+    ]
+
+
+as_price = as_decimal(3)
+
+
+def listing_variants(row):
+    # the listing is refreshed periodically, a discount that ended since is not shown
+    discount = None
+    if row.discount_end is not None and row.discount_end >= timezone.now():
+        discount = {
+            "amount": row.discount_amount,
+            "discount_type": row.discount_type,
+        }
+    stock_number = getattr(row, "live_stock", row.stock_number)
+    return [
+        {
+            "id": row.product_id,
+            "price": as_price(row.price),
+            "effective_price": as_price(row.effective_price if discount else row.price),
+            "variant_id": row.variant_id,
+            "product_variant_discounts": discount,
+            "is_available": stock_number != 0,
+            "stock_number": stock_number,
+            "name": row.variant_name,
+        }
+    ]
+
+
+# fast path of ProductListingSerializer, same output
+serialize_listing = compile_spec(
+    {
+        "id": "product_id",
+        "category_id": "category_id",
+        "product_product_image": Method(listing_images),
+        "brand_id": "brand_id",
+        "product_name": "product_name",
+        "product_slug": "product_slug",
+        "description_slug": "description_slug",
+        "created_at": Field("created_at", as_datetime),
+        "updated_at": Field("updated_at", as_datetime),
+        "base_price": Field("price", int),
+        "sku": "sku",
+        "product_brand_name": "brand_name",
+        "in_person_purchase": "in_person_purchase",
+        "variants": Method(listing_variants),
+    },
+    name="serialize_listing",
+)
+
+
+class ProductListingSerializer(serializers.ModelSerializer):
+    """
+    same response as ProductListHomePageSerializer, read from one product_listing row \n
+    only the first active image of the product is returned, the view answers with
+    serialize_listing, this class documents the schema
+    """
+    id = serializers.IntegerField(source="product_id")
+    product_brand_name = serializers.CharField(source="brand_name", allow_null=True)
+    base_price = serializers.IntegerField(source="price", allow_null=True)
+    product_product_image = serializers.SerializerMethodField()
+
+    @extend_schema_field(ProductImageSerializer(many=True))
+    def get_product_product_image(self, obj):
+        return listing_images(obj)
+
+    class Meta:
+        model = ProductListing
+        fields = (
+            "id",
+            "category_id",
+            "product_product_image",
+            "brand_id",
+            "product_name",
+            "product_slug",
+            "description_slug",
+            "created_at",
+            "updated_at",
+            "base_price",
+            "sku",
+            "product_brand_name",
+            "in_person_purchase",
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["variants"] = listing_variants(instance)
+        return data
+
+
+class FacetValueSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class PriceFacetSerializer(serializers.Serializer):
+    # null --> open ended bucket
+    min_price = serializers.IntegerField(allow_null=True)
+    max_price = serializers.IntegerField(allow_null=True)
+    count = serializers.IntegerField()
+
+
+class ProductFacetSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    brands = FacetValueSerializer(many=True)
+    categories = FacetValueSerializer(many=True)
+    tags = FacetValueSerializer(many=True)
+    prices = PriceFacetSerializer(many=True)
@@ -1,8 +1,9 @@
 from rest_framework.urls import path
-from .views import ProductListHomePageView
+from .views import ProductListHomePageView, ProductFacetView
 
 app_name = "v2_product"
 
 urlpatterns = [
     path("product_list", ProductListHomePageView.as_view(), name="product_home_page"),
+    path("facets", ProductFacetView.as_view(), name="product_facets"),
 ]
@@ -1,74 +1,80 @@
-from django.db.models import Prefetch, OuterRef
+from django.db.models import F
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import generics, filters
+from rest_framework import generics, response, exceptions
 
-from core.utils.pagination import TwentyPageNumberPagination
-from discount_app.models import ProductDiscount
-from product_app.models import ProductVariant, ProductImages
-from .filters import ProductVariantFilter
-from .serializers import ProductListHomePageSerializer
+from core.utils.normalize_number import normalize_text
+from core.utils.pagination import KeysetPagination
+from core.utils.renderers import FAST_RENDERER_CLASSES
+from product_app.facets import cached_facets, filter_signature
+from product_app.models import ProductListing
+from product_app.stock import get_stock_levels
+from .filters import ProductListingFilter
+from .serializers import ProductListingSerializer, ProductFacetSerializer, serialize_listing
 
 
 class ProductListHomePageView(generics.ListAPIView):
-    serializer_class = ProductListHomePageSerializer
-    pagination_class = TwentyPageNumberPagination
-    filter_backends = (filters.OrderingFilter, DjangoFilterBackend)
-    ordering_fields = ("id", "price")
-    filterset_class = ProductVariantFilter
+    """
+    reads the precomputed product_listing table, one row per active variant \n
+    stock is read from product_variant (primary key join) and redis for hot variants
+    """
+    serializer_class = ProductListingSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = FAST_RENDERER_CLASSES
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = ProductListingFilter
+
+    @property
+    def ordering_fields(self):
+        fields = (("id", "variant_id"), "price", "updated_at")
+        if self.request.query_params.get("q"):
+            # search results are ranked unless another ordering is asked
+            fields += (("rank", "search_rank"),)
+        return fields
+
+    @property
+    def keyset_default_ordering(self):
+        return "-rank" if self.request.query_params.get("q") else "-id"
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            # live stock of hot variants
+            levels = get_stock_levels({row.variant_id: row.live_stock for row in page})
+            for row in page:
+                row.live_stock = levels[row.variant_id]
+        return page
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response([serialize_listing(row) for row in page])
 
     def get_queryset(self):
-        # fields
-        product_image_fields = (
-            "image__image",
-            "order",
-            "alt_text_image",
-            "product_id",
-            "image__image_id_ba_salam",
-            "updated_at"
-        )
-        product_discount_field = (
-            "id",
-            "product_variant_id",
-            "amount",
-            "discount_type",
-        )
-        product_variant_fields = (
-            "product__category__id",
-            "product__product_brand__id",
-            "product__product_slug",
-            "product__description_slug",
-            "product__product_brand__brand_name",
-            "product__product_name",
-            "in_person_purchase",
-            "sku",
-            "name",
-            "price",
-            "stock_number",
-            "created_at",
-            "updated_at",
+        # ordering is applied by the paginator
+        return ProductListing.objects.annotate(
+            live_stock=F("variant__stock_number")
         )
 
-        # last discount
-        latest_discount_subquery = ProductDiscount.objects.filter(
-            id__in=ProductDiscount.objects.filter(
-                product_variant=OuterRef("product_variant")
-            ).valid_discount().order_by("-id").values_list("id", flat=True)
-        ).only(*product_discount_field)
 
-        return ProductVariant.objects.filter(
-            is_active=True
-        ).select_related(
-            "product__category",
-            "product__product_brand",
-        ).prefetch_related(
-            Prefetch(
-                "product__product_product_image", queryset=ProductImages.objects.filter(
-                    is_active=True
-                ).select_related("image").only(*product_image_fields)
-            ),
-            Prefetch(
-                "product_variant_discounts",
-                queryset=latest_discount_subquery,
-                to_attr="discounts",
-            )
-        ).only(*product_variant_fields).order_by("-id")
+class ProductFacetView(generics.GenericAPIView):
+    """
+    number of variants per brand, category, tag and price bucket for the filters of the v2
+    listing, cached per filter until the listing changes
+    """
+    serializer_class = ProductFacetSerializer
+    filterset_class = ProductListingFilter
+    pagination_class = None
+
+    def get_queryset(self):
+        return ProductListing.objects.all()
+
+    def get(self, request, *args, **kwargs):
+        filterset = self.filterset_class(request.query_params, queryset=self.get_queryset(), request=request)
+        if not filterset.is_valid():
+            raise exceptions.ValidationError(filterset.errors)
+
+        params = dict(filterset.form.cleaned_data)
+        if params.get("q"):
+            params["q"] = normalize_text(params["q"])
+        facets = cached_facets(filter_signature(params), filterset.qs)
+        return response.Response(self.get_serializer(facets).data)
@@ -332,4 +332,4 @@ AWS_SECRET_ACCESS_KEY = config('ARVAN_AWS_SECRET_ACCESS_KEY', cast=str)
 AWS_STORAGE_BUCKET_NAME = config('ARVAN_AWS_STORAGE_BUCKET_NAME', cast=str)
 AWS_S3_ENDPOINT_URL = config('ARVAN_AWS_S3_ENDPOINT_URL', cast=str)
 AWS_S3_FILE_OVERWRITE = False
-AWS_S3_MAX_MEMORY_SIZE = 1024 * 1024 * 2
\ No newline at end of file
+AWS_S3_MAX_MEMORY_SIZE = 1024 * 1024 * 2
@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # third party  package
     "rest_framework",
@@ -177,6 +178,19 @@ REST_FRAMEWORK = {
     }
 }
 
+# renderer and parser on orjson for every view, without orjson installed they behave as drf's
+FAST_JSON = config("FAST_JSON", cast=bool, default=False)
+if FAST_JSON:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
+        "core.utils.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = (
+        "core.utils.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    )
+
 # config JWT settings
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=30),
@@ -224,6 +238,18 @@ CACHES = {
              }
         }
     },
+    # cache of the api views, cleared by product_app/signals.py
+    "api-cache": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": config("REDIS_API_CACHE_URL", default="redis://127.0.0.1:6381/2", cast=str),
+        "TIMEOUT": config("REDIS_API_CACHE_TIMEOUT", default=1209600, cast=int),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "SOCKET_CONNECT_TIMEOUT": config("SOCKET_SECOND_CONNECT_TIMEOUT", default=5, cast=int),
+            "SOCKET_TIMEOUT": config("SOCKET_SECOND_TIMEOUT", default=10, cast=int),
+            "SERIALIZER": "django_redis.serializers.msgpack.MSGPackSerializer",
+        }
+    },
 }
 SESSION_ENGINE = config("SESSION_ENGINE", default="django.contrib.sessions.backends.cache", cast=str)
 SESSION_CACHE_ALIAS = config("SESSION_CACHE_ALIAS", default="default", cast=str)
@@ -253,6 +279,9 @@ if USE_CORS:
     MIDDLEWARE.insert(0, "corsheaders.middleware.CorsMiddleware")
     CORS_ALLOWED_ORIGINS = config("PRODUCTION_CORS_ALLOWED_ORIGINS", cast=Csv())
     CORS_ALLOW_CREDENTIALS = config("CORS_ALLOW_CREDENTIALS", cast=bool, default=True)
+    from corsheaders.defaults import default_headers
+    CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+    CORS_EXPOSE_HEADERS = ("idempotent-replayed",)
     INSTALLED_APPS.append("corsheaders")
 
 USE_SSL = config("USE_SSL", cast=bool, default=False)
@@ -348,5 +377,16 @@ if USE_DEBUG_TOOLBAR and DEBUG:
     MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware",)
     INTERNAL_IPS = ["127.0.0.1"]
 
+# موجودی کالا های پرفروش در ردیس (hot_stock)
+STOCK_REDIS_BACKEND = config("STOCK_REDIS_BACKEND", cast=bool, default=False)
+STOCK_REDIS_ALIAS = config("STOCK_REDIS_ALIAS", cast=str, default="default")
+
+# سبد خرید در ردیس
+CART_REDIS_ALIAS = config("CART_REDIS_ALIAS", cast=str, default="default")
+CART_TTL = config("CART_TTL", cast=int, default=60 * 60 * 24 * 30)
+
+# آرشیو json درگاه پرداخت در باکت
+GATEWAY_ARCHIVE_PREFIX = config("GATEWAY_ARCHIVE_PREFIX", cast=str, default="gateway-archive")
+
 # django silk
 USE_DJANGO_SILK = config("USE_DJANGO_SILK", cast=bool, default=False)
\ No newline at end of file
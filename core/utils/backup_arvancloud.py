@@ -43,6 +43,9 @@ class Bucket:
         return s3_resource
 
     def bucket_s3_client(self):
+        # boto3 clients are thread safe, build it once per bucket
+        if getattr(self, "_s3_client", None) is not None:
+            return self._s3_client
         s3_client = boto3.client(
             service_name=self.service_name,
             region_name=self.region_name,
@@ -53,6 +56,7 @@ class Bucket:
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key
         )
+        self._s3_client = s3_client
         return s3_client
 
     def create_object_for_backup(self, file_name, file_path=None):
@@ -88,6 +92,23 @@ class Bucket:
         except Exception as e:
             raise ValidationError(str(e))
 
+    def put_object(self, key, body, content_type="application/octet-stream", content_encoding=None):
+        extra = {"ContentEncoding": content_encoding} if content_encoding else {}
+        return self.bucket_s3_client().put_object(
+            ACL="private",
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=body,
+            ContentType=content_type,
+            **extra
+        )
+
+    def get_object(self, key):
+        """
+        return body of the object as bytes
+        """
+        return self.bucket_s3_client().get_object(Bucket=self.bucket_name, Key=key)["Body"].read()
+
 
 # b1 = Bucket()
 # b1.create_object_for_backup_as_multi_part(
@@ -1,6 +1,5 @@
-from django.utils import timezone
 from django_filters import DateTimeFromToRangeFilter, DateTimeFilter
-from django_filters.rest_framework import FilterSet, NumberFilter, RangeFilter, BooleanFilter
+from django_filters.rest_framework import FilterSet, NumberFilter, RangeFilter, BooleanFilter, CharFilter
 from django_filters.widgets import RangeWidget
 
 from account_app.models import User, UserAddress, PrivateNotification, TicketRoom
@@ -9,6 +8,7 @@ from core_app.models import Image
 from discount_app.models import Coupon
 from order_app.models import Order
 from product_app.models import Category, ProductBrand, ProductImages, Attribute, Product, Tag
+from product_app.search import search_products
 
 
 class AdminUserInformationFilter(FilterSet):
@@ -138,6 +138,10 @@ class ProductFilter(FilterSet):
         method="product_image_id_ba_salam",
         label="Has Image ID",
     )
+    q = CharFilter(method="search", label="search name, sku, brand, category and tags")
+
+    def search(self, queryset, name, value):
+        return search_products(queryset, value).order_by("-search_rank", "-id")
 
     def product_image_id_ba_salam(self, queryset, name, value):
         return queryset.filter(
@@ -156,9 +160,11 @@ class ProductFilter(FilterSet):
 class ProductHomePageFilter(FilterSet):
     more_price = NumberFilter(method='more_price_filter')
     min_price = NumberFilter(method="min_price_filter")
-    price = RangeFilter(field_name='variants__price', label='Price range')
+    price = RangeFilter(method='price_range_filter', label='Price range')
+    min_effective_price = RangeFilter(field_name='min_effective_price', label='Price after discount range')
     has_discount = BooleanFilter(method='filter_has_discount', label="Has discount")
     null_sku = BooleanFilter(method='is_null_sku', label="Is null sku")
+    q = CharFilter(method="search", label="search name, sku, brand, category and tags")
 
     class Meta:
         model = Product
@@ -172,25 +178,31 @@ class ProductHomePageFilter(FilterSet):
     def is_null_sku(self, queryset, name, value):
         return queryset.filter(sku__isnull=value)
 
+    def search(self, queryset, name, value):
+        return search_products(queryset, value).order_by("-search_rank", "-id")
+
+    # price bounds are stored on product by product_app.listing, no join with variants
     def more_price_filter(self, queryset, name, value):
-        return queryset.filter(
-            variants__price__gte=value,
-            variants__is_active=True
-        ).distinct()
+        # an active variant at or above value
+        return queryset.filter(max_price__gte=value)
 
     def min_price_filter(self, queryset, name, value):
-        return queryset.filter(
-            variants__price__lte=value,
-            variants__is_active=True
-        ).distinct()
+        # an active variant at or below value
+        return queryset.filter(min_price__lte=value)
+
+    def price_range_filter(self, queryset, name, value):
+        # price range of the active variants overlaps the asked range
+        if value is None:
+            return queryset
+        if value.start is not None:
+            queryset = queryset.filter(max_price__gte=value.start)
+        if value.stop is not None:
+            queryset = queryset.filter(min_price__lte=value.stop)
+        return queryset
 
     def filter_has_discount(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                variants__product_variant_discounts__is_active=True,
-                variants__product_variant_discounts__start_date__lte=timezone.now(),
-                variants__product_variant_discounts__end_date__gte=timezone.now()
-            ).distinct()
+            return queryset.filter(has_active_discount=True)
 
         return queryset
 
@@ -210,7 +222,8 @@ class OrderFilter(FilterSet):
             "is_complete": ['exact'],
             "is_active": ['exact'],
             "status": ['iexact'],
-            "is_reserved": ['exact']
+            "is_reserved": ['exact'],
+            "grand_total": ['gte', 'lte'],
         }
 
 
@@ -234,7 +247,8 @@ class ResultOrderFilter(FilterSet):
         fields = {
             "profile__user__mobile_phone": ['contains'],
             "is_complete": ['exact'],
-            "status": ['exact']
+            "status": ['exact'],
+            "grand_total": ['gte', 'lte'],
         }
 
 
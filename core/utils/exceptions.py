@@ -25,3 +25,19 @@ def http_error(func):
         except Exception as e:
             raise Exception(f"General Error: {e}")
     return wrapper
+
+
+def async_http_error(func):
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except httpx.ConnectError as ce:
+            raise Exception(f"Connection Error: {ce}")
+        except httpx.TimeoutException as te:
+            raise Exception(f"Timeout Error: {te}")
+        except httpx.HTTPStatusError as he:
+            raise Exception(f"HTTP Status Error: {he}")
+        except Exception as e:
+            raise Exception(f"General Error: {e}")
+    return wrapper
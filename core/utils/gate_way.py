@@ -1,8 +1,33 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
 import httpx
 from decouple import config
 
 from core.utils.custom_exception import HttpxCustomApiException
-from core.utils.exceptions import http_error
+from core.utils.exceptions import http_error, async_http_error
+
+logger = logging.getLogger(__name__)
+
+# timeout و pool درگاه پرداخت
+ZIBAL_CONNECT_TIMEOUT = config("ZIBAL_CONNECT_TIMEOUT", cast=float, default=3.0)
+ZIBAL_READ_TIMEOUT = config("ZIBAL_READ_TIMEOUT", cast=float, default=10.0)
+ZIBAL_POOL_TIMEOUT = config("ZIBAL_POOL_TIMEOUT", cast=float, default=2.0)
+ZIBAL_MAX_CONNECTIONS = config("ZIBAL_MAX_CONNECTIONS", cast=int, default=20)
+ZIBAL_MAX_KEEPALIVE = config("ZIBAL_MAX_KEEPALIVE", cast=int, default=10)
+ZIBAL_KEEPALIVE_EXPIRY = config("ZIBAL_KEEPALIVE_EXPIRY", cast=float, default=30.0)
+ZIBAL_VERIFY_RETRIES = config("ZIBAL_VERIFY_RETRIES", cast=int, default=3)
+ZIBAL_RETRY_BACKOFF = config("ZIBAL_RETRY_BACKOFF", cast=float, default=0.3)
+
+# errors where the request never reached zibal, safe to retry for every call
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# verify is idempotent (a second verify returns result 201), retry on these too
+VERIFY_RETRY_ERRORS = CONNECT_ERRORS + (httpx.ReadTimeout, httpx.RemoteProtocolError)
 
 
 def http_header():
@@ -11,36 +36,214 @@ def http_header():
     }
     return header
 
+
+class GatewayMetrics:
+    """
+    latency and result counters of gateway calls in this process
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, name, elapsed, outcome):
+        with self._lock:
+            item = self._data.setdefault(
+                name, {"count": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            if outcome == "retry":
+                item["retries"] += 1
+                return
+            elapsed_ms = elapsed * 1000
+            item["count"] += 1
+            item["total_ms"] += elapsed_ms
+            item["max_ms"] = max(item["max_ms"], elapsed_ms)
+            if outcome != "ok":
+                item["errors"] += 1
+        logger.info("zibal %s %s in %.1fms", name, outcome, elapsed * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {**item, "avg_ms": item["total_ms"] / item["count"] if item["count"] else 0.0}
+                for name, item in self._data.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+metrics = GatewayMetrics()
+
+
+def _client_options():
+    return {
+        "headers": http_header(),
+        "timeout": httpx.Timeout(
+            connect=ZIBAL_CONNECT_TIMEOUT,
+            read=ZIBAL_READ_TIMEOUT,
+            write=ZIBAL_READ_TIMEOUT,
+            pool=ZIBAL_POOL_TIMEOUT,
+        ),
+        "limits": httpx.Limits(
+            max_connections=ZIBAL_MAX_CONNECTIONS,
+            max_keepalive_connections=ZIBAL_MAX_KEEPALIVE,
+            keepalive_expiry=ZIBAL_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """
+    one pooled client per process, created lazily so it is never shared across a fork
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(**_client_options())
+    return _client
+
+
+def get_async_client():
+    """
+    one pooled async client per event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(**_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+def _reset_after_fork():
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+    _async_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _backoff(attempt):
+    # exponential backoff with full jitter
+    return random.uniform(0, ZIBAL_RETRY_BACKOFF * (2 ** attempt))
+
+
+def _should_retry(error, idempotent):
+    if isinstance(error, httpx.HTTPStatusError):
+        return idempotent and error.response.status_code >= 500
+    return isinstance(error, VERIFY_RETRY_ERRORS if idempotent else CONNECT_ERRORS)
+
+
+def _send(name, url, payload, retries=0, idempotent=False):
+    client = get_client()
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            response = client.post(url=url, json=payload)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            elapsed = time.perf_counter() - started
+            if attempt < retries and _should_retry(e, idempotent):
+                metrics.record(name, elapsed, "retry")
+                time.sleep(_backoff(attempt))
+                continue
+            metrics.record(name, elapsed, type(e).__name__)
+            raise
+        metrics.record(name, time.perf_counter() - started, "ok")
+        return response.json()
+
+
+async def _async_send(name, url, payload, retries=0, idempotent=False):
+    client = get_async_client()
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            response = await client.post(url=url, json=payload)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            elapsed = time.perf_counter() - started
+            if attempt < retries and _should_retry(e, idempotent):
+                metrics.record(name, elapsed, "retry")
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            metrics.record(name, elapsed, type(e).__name__)
+            raise
+        metrics.record(name, time.perf_counter() - started, "ok")
+        return response.json()
+
+
+def _request_payload(amount, description, order_id, mobile):
+    change_amount = amount * 10 # rial into Toma
+    return {
+        "amount": int(change_amount),
+        "merchant": config("ZIBAL_MERCHANT_API_KEY", cast=str),
+        "description": description,
+        "orderId": order_id,
+        "mobile": mobile,
+        "callbackUrl": config("ZIBAL_CALLBACK_URL", cast=str),
+    }
+
+
+def _verify_payload(track_id):
+    return {
+        "trackId": track_id,
+        "merchant": config("ZIBAL_MERCHANT_API_KEY", cast=str),
+    }
+
+
 @http_error
 def request_gate_way(amount, description, order_id, mobile):
-    change_amount = amount * 10 # rial into Toma
+    return _send(
+        "request",
+        config("ZIBAL_REQUEST_GATE_WAY", cast=str),
+        _request_payload(amount, description, order_id, mobile),
+        retries=1,
+    )
 
-    with httpx.Client() as client:
-        response = client.post(
-            url=config("ZIBAL_REQUEST_GATE_WAY", cast=str),
-            headers=http_header(),
-            json={
-                "amount": int(change_amount),
-                "merchant": config("ZIBAL_MERCHANT_API_KEY", cast=str),
-                "description": description,
-                "orderId": order_id,
-                "mobile": mobile,
-                "callbackUrl": config("ZIBAL_CALLBACK_URL", cast=str),
-            },
-        )
-    return response.json()
 
 @http_error
 def verify_payment(track_id):
     try:
-        response = httpx.post(
-            url=config("ZIBAL_VERIFY_URL", cast=str),
-            json={
-                "trackId": track_id,
-                "merchant": config("ZIBAL_MERCHANT_API_KEY", cast=str),
-            },
-            headers=http_header(),
+        return _send(
+            "verify",
+            config("ZIBAL_VERIFY_URL", cast=str),
+            _verify_payload(track_id),
+            retries=ZIBAL_VERIFY_RETRIES,
+            idempotent=True,
+        )
+    except Exception as e:
+        raise HttpxCustomApiException(e)
+
+
+@async_http_error
+async def async_request_gate_way(amount, description, order_id, mobile):
+    return await _async_send(
+        "request",
+        config("ZIBAL_REQUEST_GATE_WAY", cast=str),
+        _request_payload(amount, description, order_id, mobile),
+        retries=1,
+    )
+
+
+@async_http_error
+async def async_verify_payment(track_id):
+    try:
+        return await _async_send(
+            "verify",
+            config("ZIBAL_VERIFY_URL", cast=str),
+            _verify_payload(track_id),
+            retries=ZIBAL_VERIFY_RETRIES,
+            idempotent=True,
         )
-        return response.json()
     except Exception as e:
         raise HttpxCustomApiException(e)
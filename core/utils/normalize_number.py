@@ -14,3 +14,38 @@ def normalize_digits(value):
         return value
     else:
         return value.translate(TRANSLATION_TABLE)
+
+
+# arabic letters that look like persian ones, zero width non joiner is searched as a space
+PERSIAN_CHARACTERS = {
+    "ي": "ی",
+    "ى": "ی",
+    "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+    "\u200c": " ",
+}
+# tatweel and diacritics (fatha, kasra, tanwin, ...) are dropped
+REMOVED_CHARACTERS = "ـ" + "".join(chr(code) for code in range(0x064B, 0x0653))
+
+# same mapping for postgres translate(), text is stored and searched with one normalization
+TRANSLATE_FROM = PERSIAN_DIGITS + ARABIC_DIGITS + "".join(PERSIAN_CHARACTERS) + REMOVED_CHARACTERS
+TRANSLATE_TO = ASCII_DIGITS * 2 + "".join(PERSIAN_CHARACTERS.values())
+
+TEXT_TRANSLATION_TABLE = str.maketrans(
+    TRANSLATE_FROM[:len(TRANSLATE_TO)],
+    TRANSLATE_TO,
+    REMOVED_CHARACTERS,
+)
+
+
+def normalize_text(value):
+    """
+    ascii digits, persian letters, lower case and single spaces, used by the product search
+    """
+    return " ".join(value.translate(TEXT_TRANSLATION_TABLE).lower().split())
@@ -1,6 +1,14 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
 from rest_framework import pagination, response
 from django.utils.functional import cached_property
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.utils.urls import replace_query_param, remove_query_param
 
 class TwentyPageNumberPagination(pagination.PageNumberPagination):
     page_size = 20
@@ -20,29 +28,269 @@ class FlexiblePagination(pagination.LimitOffsetPagination):
     max_limit = 100
 
 
+def seek_filter(field, value, pk, descending):
+    """
+    rows after (value, pk) in the order (field, pk), both asc or both desc \n
+    the extra range on field lets postgres scan an index on (field, id) from the key
+    """
+    lookup = "lt" if descending else "gt"
+    if field == "pk":
+        return Q(**{f"pk__{lookup}": pk})
+    return Q(**{f"{field}__{lookup}e": value}) & (
+        Q(**{f"{field}__{lookup}": value}) | Q(**{field: value, f"pk__{lookup}": pk})
+    )
+
+
+def dump_key(key):
+    # full isoformat, the json encoders of drf and django cut microseconds and a timestamp key
+    # would then skip or repeat rows
+    return json.dumps(key, default=lambda value: value.isoformat() if hasattr(value, "isoformat") else str(value))
+
+
+def key_value(row, field):
+    if field == "pk":
+        return row.pk
+    for attr in field.split("__"):
+        row = getattr(row, attr)
+    return row
+
+
+def estimate_count(queryset):
+    """
+    number of rows the planner expects, read from EXPLAIN without running the query
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    keyset pagination, the next page is read with WHERE (field, id) > (last field, last id)
+    instead of OFFSET so a deep page costs the same as the first one \n
+    ordering --> ?ordering= one of view.ordering_fields (name or (param, field)), id breaks ties \n
+    count --> planner estimate, exact count only when the estimate is small
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    default_ordering = "-id"
+    exact_count_below = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering_fields(self, view):
+        fields = {"id": "pk"}
+        for field in getattr(view, "ordering_fields", None) or ():
+            param, name = field if isinstance(field, (tuple, list)) else (field, field)
+            fields[param] = "pk" if name == "id" else name
+        return fields
+
+    def get_ordering(self, request, view):
+        fields = self.get_ordering_fields(view)
+        default = getattr(view, "keyset_default_ordering", self.default_ordering)
+        ordering = request.query_params.get(self.ordering_query_param, default)
+        if ordering.lstrip("-") not in fields:
+            ordering = default
+        return ordering, fields[ordering.lstrip("-")], ordering.startswith("-")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()))
+            value, pk = cursor["k"]
+            direction = cursor["d"]
+        except (BinasciiError, UnicodeDecodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        # a cursor of another ordering would skip rows
+        if cursor.get("o") != self.ordering or direction not in ("n", "p"):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, direction
+
+    def make_cursor(self, row, direction):
+        payload = {"o": self.ordering, "k": [key_value(row, self.field), row.pk], "d": direction}
+        return urlsafe_b64encode(dump_key(payload).encode()).decode()
+
+    def encode_cursor(self, row, direction):
+        return replace_query_param(self.base_url, self.cursor_query_param, self.make_cursor(row, direction))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering, self.field, self.descending = self.get_ordering(request, view)
+        if self.field in (queryset.model._meta.pk.name, queryset.model._meta.pk.attname):
+            self.field = "pk"
+        cursor = self.decode_cursor(request)
+
+        # a previous page is read backwards from its cursor and reversed
+        backwards = cursor is not None and cursor[2] == "p"
+        descending = self.descending != backwards
+        fields = ("pk",) if self.field == "pk" else (self.field, "pk")
+        page_queryset = queryset.order_by(*(f"-{field}" if descending else field for field in fields))
+        if cursor is not None:
+            page_queryset = page_queryset.filter(seek_filter(self.field, cursor[0], cursor[1], descending))
+
+        rows = list(page_queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+        self.has_next = True if backwards else has_more
+        self.has_previous = has_more if backwards else cursor is not None
+
+        self.count = estimate_count(queryset)
+        if self.count < self.exact_count_below:
+            self.count = queryset.count()
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], "n")
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], "p")
+
+    def get_paginated_response(self, data):
+        return response.Response({
+            "count": self.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["count", "results"],
+            "properties": {
+                "count": {"type": "integer", "example": 123, "description": "estimated for large results"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "cursor of the next or previous link",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.ordering_query_param,
+                "required": False,
+                "in": "query",
+                "description": ", ".join(sorted(self.get_ordering_fields(view))) + " (prefix - for desc)",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"at most {self.max_page_size}",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
 class TorobPagination(pagination.PageNumberPagination):
+    """
+    torob crawls page numbers one after another, the last key of every served page is kept
+    in cache so page n + 1 seeks from it, without a cached key the page falls back to OFFSET \n
+    the queryset must be ordered by one field, id breaks ties
+    """
     page_size = 100
+    boundary_cache_key = "torob:boundary:{ordering}:{page}"
+    count_cache_key = "torob:count:{ordering}"
+    boundary_timeout = 60 * 60
+    count_timeout = 60 * 10
 
-    def get_page_number(self, request, paginator):
+    def get_page_number(self, request, paginator=None):
         if request.method == 'POST' and 'page' in request.data:
             try:
                 return int(request.data['page'])
             except Exception as e:
                 raise ValidationError(e)
-        return super().get_page_number(request, paginator)
+        try:
+            return int(request.query_params.get(self.page_query_param, 1))
+        except ValueError as e:
+            raise ValidationError(e)
+
+    def get_count(self, queryset):
+        # max_pages has to be exact or torob misses the tail, the count is cached between pages
+        key = self.count_cache_key.format(ordering=self.ordering)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_timeout)
+        return count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.number = max(self.get_page_number(request), 1)
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        self.ordering = ordering[0]
+        field = self.ordering.lstrip("-")
+        field = "pk" if field == "id" else field
+        descending = self.ordering.startswith("-")
+        fields = ("pk",) if field == "pk" else (field, "pk")
+        ordered = queryset.order_by(*(f"-{name}" if descending else name for name in fields))
+
+        boundary = None
+        if self.number > 1:
+            boundary = cache.get(self.boundary_cache_key.format(ordering=self.ordering, page=self.number - 1))
+        if boundary is not None:
+            boundary = json.loads(boundary)
+            rows = list(ordered.filter(seek_filter(field, boundary[0], boundary[1], descending))[:self.page_size])
+        else:
+            offset = (self.number - 1) * self.page_size
+            rows = list(ordered[offset:offset + self.page_size])
+
+        if rows:
+            last = rows[-1]
+            cache.set(
+                self.boundary_cache_key.format(ordering=self.ordering, page=self.number),
+                dump_key([key_value(last, field), last.pk]),
+                self.boundary_timeout,
+            )
+        self.count = self.get_count(queryset)
+        self.page = rows
+        return rows
 
     @cached_property
     def max_page(self):
-        total = self.page.paginator.count
+        total = self.count
         page_size = self.page_size
         return (total + page_size - 1) // page_size
 
     def get_paginated_response(self, data=None):
         return response.Response({
             "api_version": "torob_api_v3",
-            'total': self.page.paginator.count,
+            'total': self.count,
             "max_pages": self.max_page,
-            "current_page": self.page.number,
+            "current_page": self.number,
             # 'next': self.get_next_link(),
             # 'previous': self.get_previous_link(),
             'products': data,
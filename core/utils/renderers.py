@@ -0,0 +1,70 @@
+import codecs
+
+from django.conf import settings
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib classes of drf are used without it
+    orjson = None
+
+# drf escapes these two so the output is also valid javascript
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer on orjson, same bytes as drf for the data our serializers return \n
+    Decimal, datetime, date, time, timedelta, lazy strings and querysets go through the
+    JSONEncoder of drf (orjson would write datetime in its own format), UUID and dict keys that
+    are not strings are written as json.dumps does \n
+    indent other than 2, ascii or non compact output and values orjson cannot write (int above
+    64 bit) fall back to the stdlib renderer, NaN is written as null instead of an error
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # orjson writes utf-8 and compact separators only
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=option)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class FastJSONParser(parsers.JSONParser):
+    """
+    JSONParser on orjson, NaN and Infinity are rejected as drf does in strict mode
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
+# per view: renderer_classes = FAST_RENDERER_CLASSES, same negotiation as the drf defaults
+FAST_RENDERER_CLASSES = (FastJSONRenderer, renderers.BrowsableAPIRenderer)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.utils import gate_way
+
+
+class Command(BaseCommand):
+    help = "request and verify payments in parallel against zibal (use zibal_stub) and print latency metrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--payments", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=20, help="threads, or concurrent tasks with --async")
+        parser.add_argument("--async", dest="use_async", action="store_true", help="use the async client")
+
+    def pay(self, index):
+        result = gate_way.request_gate_way(10_000, "bench", index, "09120000000")
+        return gate_way.verify_payment(result["trackId"])
+
+    async def async_pay(self, index, semaphore):
+        async with semaphore:
+            result = await gate_way.async_request_gate_way(10_000, "bench", index, "09120000000")
+            return await gate_way.async_verify_payment(result["trackId"])
+
+    async def run_async(self, payments, workers):
+        semaphore = asyncio.Semaphore(workers)
+        return await asyncio.gather(
+            *(self.async_pay(i, semaphore) for i in range(payments)),
+            return_exceptions=True,
+        )
+
+    def handle(self, *args, **options):
+        gate_way.metrics.reset()
+        started = time.perf_counter()
+        if options["use_async"]:
+            results = asyncio.run(self.run_async(options["payments"], options["workers"]))
+        else:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                futures = [executor.submit(self.pay, i) for i in range(options["payments"])]
+                results = [f.exception() or f.result() for f in futures]
+        elapsed = time.perf_counter() - started
+
+        failed = sum(isinstance(result, Exception) for result in results)
+        self.stdout.write(f"payments: {len(results)} in {elapsed:.3f}s ({len(results) / elapsed:.1f}/s), failed: {failed}")
+        for name, item in gate_way.metrics.snapshot().items():
+            self.stdout.write(
+                f"{name}: count={item['count']} errors={item['errors']} retries={item['retries']} "
+                f"avg={item['avg_ms']:.1f}ms max={item['max_ms']:.1f}ms"
+            )
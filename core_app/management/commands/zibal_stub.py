@@ -0,0 +1,105 @@
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class ZibalStubHandler(BaseHTTPRequestHandler):
+    """
+    answer /v1/request and /v1/verify like zibal does \n
+    a second verify of the same trackId returns result 201 (already verified)
+    """
+    protocol_version = "HTTP/1.1"  # keepalive, like the real gateway
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.send_json(400, {"result": 105, "message": "invalid json"})
+
+        server = self.server
+        time.sleep(max(random.gauss(server.latency, server.jitter), 0))
+        if random.random() < server.error_rate:
+            return self.send_json(502, {"message": "bad gateway"})
+
+        if self.path.rstrip("/").endswith("/request"):
+            track_id = next(server.track_ids)
+            with server.lock:
+                server.payments[track_id] = {"amount": payload.get("amount"), "verified": False}
+            return self.send_json(200, {"trackId": track_id, "result": 100, "message": "success"})
+
+        if self.path.rstrip("/").endswith("/verify"):
+            track_id = payload.get("trackId")
+            with server.lock:
+                payment = server.payments.get(track_id)
+                already_verified = payment is not None and payment["verified"]
+                if payment is not None:
+                    payment["verified"] = True
+
+            if payment is None:
+                return self.send_json(200, {"result": 203, "message": "trackId is invalid"})
+            return self.send_json(
+                200,
+                {
+                    "result": 201 if already_verified else 100,
+                    "status": 1,
+                    "amount": payment["amount"],
+                    "paidAt": timezone.now().isoformat(),
+                    "cardNumber": "62741****44",
+                    "refNumber": track_id,
+                    "message": "already verified" if already_verified else "success",
+                },
+            )
+
+        return self.send_json(404, {"message": "not found"})
+
+
+class Command(BaseCommand):
+    help = "run a local zibal stand-in for load tests, point ZIBAL_REQUEST_GATE_WAY and ZIBAL_VERIFY_URL at it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8089)
+        parser.add_argument("--latency", type=float, default=150, help="mean latency of every call in ms")
+        parser.add_argument("--jitter", type=float, default=50, help="standard deviation of latency in ms")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with 502")
+        parser.add_argument("--verbose", action="store_true")
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer((options["host"], options["port"]), ZibalStubHandler)
+        server.daemon_threads = True
+        server.latency = options["latency"] / 1000
+        server.jitter = options["jitter"] / 1000
+        server.error_rate = options["error_rate"]
+        server.verbose = options["verbose"]
+        server.track_ids = itertools.count(int(time.time()))
+        server.payments = {}
+        server.lock = threading.Lock()
+
+        base_url = f"http://{options['host']}:{options['port']}/v1"
+        self.stdout.write(f"ZIBAL_REQUEST_GATE_WAY={base_url}/request")
+        self.stdout.write(f"ZIBAL_VERIFY_URL={base_url}/verify")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
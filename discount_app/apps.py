@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DiscountAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'discount_app'
+
+    def ready(self):
+        import discount_app.signals
@@ -0,0 +1,98 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+# کوپن معتبر، فیلد های مورد نیاز موتور قیمت گذاری
+CouponInfo = namedtuple("CouponInfo", ("id", "code", "coupon_type", "amount"))
+
+CACHE_KEY = "coupon:valid:{}"
+# unknown or disabled codes are cached for a short time only
+NEGATIVE_TIMEOUT = 60
+
+REDEEM_SQL = """
+    UPDATE coupon
+    SET number_of_uses = number_of_uses + 1, updated_at = now()
+    WHERE code = %s
+        AND is_active
+        AND is_deleted IS NOT TRUE
+        AND valid_from <= now() AND valid_to >= now()
+        AND number_of_uses < maximum_use
+    RETURNING number_of_uses >= maximum_use
+"""
+
+
+def _cache_key(code):
+    return CACHE_KEY.format(code)
+
+
+def _load(code):
+    """
+    entry --> {"id", "coupon_type", "amount", "valid_from", "valid_to", "exhausted"} or {"invalid": True} \n
+    datetimes are stored as timestamps, the cache serializer is msgpack
+    """
+    from discount_app.models import Coupon
+
+    coupon = Coupon.objects.filter(code=code, is_active=True).exclude(is_deleted=True).only(
+        "id", "coupon_type", "amount", "valid_from", "valid_to", "maximum_use", "number_of_uses"
+    ).first()
+    now = timezone.now()
+    if coupon is None or coupon.valid_to < now:
+        entry = {"invalid": True}
+        cache.set(_cache_key(code), entry, timeout=NEGATIVE_TIMEOUT)
+        return entry
+
+    entry = {
+        "id": coupon.id,
+        "coupon_type": coupon.coupon_type,
+        "amount": coupon.amount,
+        "valid_from": coupon.valid_from.timestamp(),
+        "valid_to": coupon.valid_to.timestamp(),
+        "exhausted": coupon.number_of_uses >= coupon.maximum_use,
+    }
+    # the entry is useless after valid_to
+    cache.set(_cache_key(code), entry, timeout=max(int((coupon.valid_to - now).total_seconds()), 1))
+    return entry
+
+
+def get_valid_coupon(code):
+    """
+    return CouponInfo when the code can be used now, otherwise None \n
+    served from redis, postgres is read once per code until the entry is invalidated
+    """
+    if not code:
+        return None
+
+    entry = cache.get(_cache_key(code))
+    if entry is None:
+        entry = _load(code)
+
+    if entry.get("invalid") or entry["exhausted"]:
+        return None
+    if not entry["valid_from"] <= timezone.now().timestamp() <= entry["valid_to"]:
+        return None
+    return CouponInfo(entry["id"], code, entry["coupon_type"], entry["amount"])
+
+
+def redeem_coupon(code):
+    """
+    use the coupon once with one conditional update, return False when it is
+    no longer valid or maximum_use is reached (the caller must roll back)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(REDEEM_SQL, (code,))
+        row = cursor.fetchone()
+
+    if row is None:
+        # the cached entry was stale, the caller rolls back so drop it now
+        invalidate_coupon(code)
+        return False
+    if row[0]:
+        # this was the last use, the next check reloads it from db after commit
+        transaction.on_commit(lambda: invalidate_coupon(code))
+    return True
+
+
+def invalidate_coupon(code):
+    cache.delete(_cache_key(code))
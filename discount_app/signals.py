@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch.dispatcher import receiver
+
+from .coupons import invalidate_coupon
+from . import models
+
+
+@receiver(pre_save, sender=models.Coupon)
+def remember_old_coupon_code(sender, instance, **kwargs):
+    if instance.pk:
+        instance._old_code = sender.objects.filter(pk=instance.pk).values_list("code", flat=True).first()
+
+
+@receiver([post_delete, post_save], sender=models.Coupon)
+def clean_cache_valid_coupon(sender, instance, **kwargs):
+    # after commit, a reader before it would cache the old row again
+    codes = {instance.code, getattr(instance, "_old_code", None)} - {None}
+
+    def invalidate():
+        for code in codes:
+            invalidate_coupon(code)
+
+    transaction.on_commit(invalidate)
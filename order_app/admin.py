@@ -1,7 +1,10 @@
+import json
+
 from django.contrib import admin
 from django.db.models import JSONField
 from django_json_widget.widgets import JSONEditorWidget
 from daterangefilter.filters import DateRangeFilter
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from .models import (
     Order,
@@ -9,8 +12,12 @@ from .models import (
     ShippingCompany,
     ShippingMethod,
     PaymentGateWay,
-    VerifyPaymentGateWay
+    VerifyPaymentGateWay,
+    StockReservation,
+    OrderEvent
 )
+from .totals import recompute_order_totals
+from .fulfilment import transition_orders
 
 
 @admin.register(Order)
@@ -25,6 +32,7 @@ class OrderAdmin(admin.ModelAdmin):
         "is_complete",
         "address_id",
         "tracking_code",
+        "grand_total",
         "created_at",
         "updated_at"
     )
@@ -41,6 +49,29 @@ class OrderAdmin(admin.ModelAdmin):
     }
     list_display_links = ("id", "status")
     raw_id_fields = ("profile", "address", "shipping")
+    readonly_fields = ("items_total", "discount_total", "shipping_total", "grand_total")
+    actions = ("mark_preparing", "mark_shipped", "mark_delivered")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "shipping" in form.changed_data:
+            recompute_order_totals([obj.id])
+
+    def _transition(self, request, queryset, status):
+        moved = transition_orders(status, queryset=queryset, staff_id=request.user.id)
+        self.message_user(request, f"{len(moved)} orders moved to {status}, {queryset.count() - len(moved)} skipped")
+
+    @admin.action(description="mark selected orders as preparing")
+    def mark_preparing(self, request, queryset):
+        self._transition(request, queryset, "preparing")
+
+    @admin.action(description="mark selected orders as shipped")
+    def mark_shipped(self, request, queryset):
+        self._transition(request, queryset, "shipped")
+
+    @admin.action(description="mark selected orders as delivered")
+    def mark_delivered(self, request, queryset):
+        self._transition(request, queryset, "delivered")
 
     def get_queryset(self, request):
         qs = super().get_queryset(request).select_related("profile__user")
@@ -51,6 +82,7 @@ class OrderAdmin(admin.ModelAdmin):
                 "is_complete",
                 "address_id",
                 "tracking_code",
+                "grand_total",
                 "created_at",
                 "updated_at",
                 "profile__user__mobile_phone",
@@ -74,7 +106,11 @@ class OrderAdmin(admin.ModelAdmin):
                 "reserved_until",
                 "is_active",
                 "items_data",
-                "description"
+                "description",
+                "items_total",
+                "discount_total",
+                "shipping_total",
+                "grand_total",
             )
 
 @admin.register(OrderItem)
@@ -99,6 +135,20 @@ class OrderItemAdmin(admin.ModelAdmin):
     
     def get_user_phone(self, obj):
         return obj.order.profile.user.mobile_phone
+
+    def save_model(self, request, obj, form, change):
+        old_order_id = form.initial.get("order")
+        super().save_model(request, obj, form, change)
+        recompute_order_totals([obj.order_id, old_order_id] if old_order_id else [obj.order_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recompute_order_totals([obj.order_id])
+
+    def delete_queryset(self, request, queryset):
+        order_ids = list(queryset.values_list("order_id", flat=True))
+        super().delete_queryset(request, queryset)
+        recompute_order_totals(order_ids)
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -149,6 +199,12 @@ class ShippingMethodAdmin(admin.ModelAdmin):
     list_filter = ("is_active",)
 
 
+def archived_json(payload):
+    if not payload:
+        return "-"
+    return format_html("<pre>{}</pre>", json.dumps(payload, indent=2, ensure_ascii=False))
+
+
 @admin.register(PaymentGateWay)
 class PaymentGateWayAdmin(admin.ModelAdmin):
     raw_id_fields = ("user", "order")
@@ -157,6 +213,7 @@ class PaymentGateWayAdmin(admin.ModelAdmin):
         "id",
         "user_id",
         "get_user_phone",
+        "track_id",
         "created_at",
         )
     formfield_overrides = {
@@ -166,17 +223,25 @@ class PaymentGateWayAdmin(admin.ModelAdmin):
     list_per_page = 20
     search_help_text = _("برای جست و جو میتوانید از شماره موبایل کاربر استفاده کنید")
     list_display_links = ("id", "user_id", "order_id")
+    readonly_fields = ("archive_key", "archived_payload")
 
     def get_user_phone(self, obj):
         return obj.user.mobile_phone
 
+    @admin.display(description="archived payload")
+    def archived_payload(self, obj):
+        # فقط در صفحه جزییات از باکت خوانده میشود
+        return archived_json(obj.archive_key and obj.gateway_payload())
+
     def get_queryset(self, request):
         return super().get_queryset(request).select_related("user").only(
             "order_id",
             "id",
             "user__mobile_phone",
             "created_at",
-            "payment_gateway"
+            "track_id",
+            "payment_gateway",
+            "archive_key",
         )
 
 @admin.register(VerifyPaymentGateWay)
@@ -195,6 +260,11 @@ class ResultPaymentGateWayAdmin(admin.ModelAdmin):
     }
     search_fields = ("payment_gateway__user__mobile_phone",)
     search_help_text = _("برای سرچ میتوانید از شماره موبایل کاربر استفاد کنید")
+    readonly_fields = ("archive_key", "archived_result")
+
+    @admin.display(description="archived result")
+    def archived_result(self, obj):
+        return archived_json(obj.archive_key and obj.verify_result())
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -209,5 +279,40 @@ class ResultPaymentGateWayAdmin(admin.ModelAdmin):
             return qs.select_related("payment_gateway").only(
                 "payment_gateway__user_id",
                 "created_at",
-                "result"
+                "result",
+                "archive_key",
             )
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_per_page = 20
+    raw_id_fields = ("order", "product_variant")
+    list_display = (
+        "id",
+        "order_id",
+        "product_variant_id",
+        "quantity",
+        "status",
+        "expires_at",
+        "released_at",
+        "created_at",
+    )
+    list_display_links = ("id", "order_id")
+    list_filter = ("status", ("expires_at", DateRangeFilter))
+    search_fields = ("order__tracking_code",)
+    search_help_text = _("برای جست و جو میتوانید از کد پیگیری سفارش استفاده کنید")
+
+
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    list_per_page = 20
+    raw_id_fields = ("order",)
+    list_display = ("id", "order_id", "event_type", "dispatched_at", "created_at")
+    list_display_links = ("id", "order_id")
+    list_filter = ("event_type", ("created_at", DateRangeFilter))
+    search_fields = ("order__tracking_code",)
+    search_help_text = _("برای جست و جو میتوانید از کد پیگیری سفارش استفاده کنید")
+    formfield_overrides = {
+        JSONField: {'widget': JSONEditorWidget},
+    }
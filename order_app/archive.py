@@ -0,0 +1,152 @@
+import gzip
+import json
+from collections import namedtuple
+from datetime import timedelta
+from functools import lru_cache
+from itertools import groupby
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+# سفارش هایی که هنوز ممکن است پرداخت انها تغییر کند، payload انها آرشیو نمیشود
+OPEN_STATUSES = ("pending", "processing")
+
+ArchiveSpec = namedtuple("ArchiveSpec", ("table", "column", "kept", "select_sql"))
+
+ARCHIVES = {
+    "payment": ArchiveSpec(
+        table="payment_gateway",
+        column="payment_gateway",
+        kept=("trackId", "result", "message"),
+        select_sql="""
+            SELECT pg.id, pg.created_at, pg.payment_gateway
+            FROM payment_gateway AS pg
+            JOIN orders AS o ON o.id = pg.order_id
+            WHERE pg.archive_key IS NULL
+                AND pg.created_at < %(before)s
+                AND jsonb_typeof(pg.payment_gateway) = 'object'
+                AND o.status <> ALL(%(open_statuses)s)
+            ORDER BY pg.created_at, pg.id
+            LIMIT %(batch_size)s
+        """,
+    ),
+    "result": ArchiveSpec(
+        table="result_payment_gateway",
+        column="result",
+        # amount is read by the order totals backfill
+        kept=("status", "result", "message", "amount", "refNumber", "paidAt", "orderId"),
+        select_sql="""
+            SELECT r.id, r.created_at, r.result
+            FROM result_payment_gateway AS r
+            JOIN payment_gateway AS pg ON pg.id = r.payment_gateway_id
+            JOIN orders AS o ON o.id = pg.order_id
+            WHERE r.archive_key IS NULL
+                AND r.created_at < %(before)s
+                AND jsonb_typeof(r.result) = 'object'
+                AND o.status <> ALL(%(open_statuses)s)
+            ORDER BY r.created_at, r.id
+            LIMIT %(batch_size)s
+        """,
+    ),
+}
+
+# keep only the queried keys of the json and point the row at its archive object
+SLIM_SQL = """
+    UPDATE {table}
+    SET {column} = coalesce(
+            (SELECT jsonb_object_agg(e.key, e.value) FROM jsonb_each({column}) AS e WHERE e.key = ANY(%s)),
+            '{{}}'::jsonb
+        ),
+        archive_key = %s
+    WHERE id = ANY(%s) AND archive_key IS NULL
+"""
+
+
+@lru_cache(maxsize=1)
+def _bucket():
+    from core.utils.backup_arvancloud import Bucket
+
+    return Bucket()
+
+
+def _prefix():
+    return getattr(settings, "GATEWAY_ARCHIVE_PREFIX", "gateway-archive")
+
+
+def _object_key(kind, day, rows):
+    return f"{_prefix()}/{kind}/{day:%Y/%m/%d}/{rows[0][0]}-{rows[-1][0]}.ndjson.gz"
+
+
+def _ndjson(rows):
+    lines = (
+        json.dumps({"id": row_id, "created_at": created_at, "payload": payload}, cls=JSONEncoder, ensure_ascii=False)
+        for row_id, created_at, payload in rows
+    )
+    return gzip.compress("\n".join(lines).encode(), compresslevel=6)
+
+
+def archive_batch(kind, days, batch_size=1000):
+    """
+    move payloads of one batch of settled rows older than `days` into gzip ndjson objects,
+    one object per created day \n
+    the object is uploaded before the row is slimmed, a failed update leaves only an object
+    that the next run overwrites with the same key \n
+    return number of archived rows
+    """
+    spec = ARCHIVES[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            spec.select_sql,
+            {
+                "before": timezone.now() - timedelta(days=days),
+                "open_statuses": list(OPEN_STATUSES),
+                "batch_size": batch_size,
+            },
+        )
+        rows = cursor.fetchall()
+
+    archived = 0
+    for day, day_rows in groupby(rows, key=lambda row: row[1].date()):
+        day_rows = list(day_rows)
+        key = _object_key(kind, day, day_rows)
+        _bucket().put_object(key, _ndjson(day_rows), content_type="application/x-ndjson", content_encoding="gzip")
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                SLIM_SQL.format(table=spec.table, column=spec.column),
+                (list(spec.kept), key, [row[0] for row in day_rows]),
+            )
+            archived += cursor.rowcount
+    return archived
+
+
+def count_archivable(kind, days):
+    spec = ARCHIVES[kind]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT count(*) FROM ({spec.select_sql}) AS archivable",
+            {
+                "before": timezone.now() - timedelta(days=days),
+                "open_statuses": list(OPEN_STATUSES),
+                "batch_size": None,
+            },
+        )
+        return cursor.fetchone()[0]
+
+
+@lru_cache(maxsize=16)
+def _read_object(key):
+    body = _bucket().get_object(key)
+    # boto3 returns the stored bytes, the content encoding is only metadata
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    return {row["id"]: row["payload"] for row in map(json.loads, body.splitlines())}
+
+
+def load_archived_payload(key, row_id):
+    """
+    full payload of an archived row, objects are fetched on first use and kept in the process
+    """
+    return _read_object(key).get(row_id)
@@ -0,0 +1,139 @@
+import uuid
+
+from django.conf import settings
+
+from order_app.pricing import cached_variant_prices, price_cart
+
+# سبد خرید هر کاربر یک hash در ردیس
+# field "id" --> id of the cart, other fields --> variant_id: quantity
+CART_KEY = "cart:{}"
+ID_FIELD = "id"
+MAX_LINES = 50
+MAX_QUANTITY = 100
+
+# KEYS[1] --> cart, ARGV --> variant_id, quantity, mode (add or set), new cart id, ttl, max lines, max quantity \n
+# return the quantity of the line, -1 when the cart is full
+SET_LINE_SCRIPT = """
+redis.call('HSETNX', KEYS[1], 'id', ARGV[4])
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current and redis.call('HLEN', KEYS[1]) - 1 >= tonumber(ARGV[6]) then
+    return -1
+end
+local quantity = tonumber(ARGV[2])
+if ARGV[3] == 'add' then
+    quantity = quantity + tonumber(current or '0')
+end
+quantity = math.min(quantity, tonumber(ARGV[7]))
+if quantity <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+else
+    redis.call('HSET', KEYS[1], ARGV[1], quantity)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return quantity
+"""
+
+# delete the cart only when it is still the cart that was checked out
+CONSUME_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'id') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class CartIsFull(Exception):
+    pass
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection(getattr(settings, "CART_REDIS_ALIAS", "default"))
+
+
+def _ttl():
+    return getattr(settings, "CART_TTL", 60 * 60 * 24 * 30)
+
+
+def _cart_key(user_id):
+    return CART_KEY.format(user_id)
+
+
+def read_cart(user_id):
+    """
+    return (cart_id, {variant_id: quantity}), one HGETALL \n
+    cart_id is None when the user has no cart
+    """
+    raw = _redis().hgetall(_cart_key(user_id))
+    cart_id = None
+    quantities = {}
+    for field, value in raw.items():
+        field = field.decode()
+        if field == ID_FIELD:
+            cart_id = value.decode()
+        else:
+            quantities[int(field)] = int(value)
+    return cart_id, quantities
+
+
+def _set_line(user_id, variant_id, quantity, mode):
+    quantity = _redis().eval(
+        SET_LINE_SCRIPT,
+        1,
+        _cart_key(user_id),
+        int(variant_id),
+        int(quantity),
+        mode,
+        uuid.uuid4().hex,
+        _ttl(),
+        MAX_LINES,
+        MAX_QUANTITY,
+    )
+    if quantity == -1:
+        raise CartIsFull()
+    return quantity
+
+
+def add_item(user_id, variant_id, quantity):
+    return _set_line(user_id, variant_id, quantity, "add")
+
+
+def set_quantity(user_id, variant_id, quantity):
+    """
+    quantity 0 removes the line
+    """
+    return _set_line(user_id, variant_id, quantity, "set")
+
+
+def remove_item(user_id, variant_id):
+    _redis().hdel(_cart_key(user_id), int(variant_id))
+
+
+def clear_cart(user_id):
+    _redis().delete(_cart_key(user_id))
+
+
+def consume_cart(user_id, cart_id):
+    """
+    drop the cart after checkout, a cart changed in another tab keeps its lines
+    """
+    return bool(_redis().eval(CONSUME_SCRIPT, 1, _cart_key(user_id), cart_id))
+
+
+def cart_items(quantities):
+    return [
+        {"product_variant_id": variant_id, "quantity": quantity}
+        for variant_id, quantity in quantities.items()
+    ]
+
+
+def quote_cart(user_id):
+    """
+    priced cart of the user, prices and discounts come from the price cache in redis
+    and stock of hot variants from their counters, so most reads never reach postgres
+    """
+    cart_id, quantities = read_cart(user_id)
+    quote = price_cart(cart_items(quantities), variants=cached_variant_prices(quantities))
+    quote["id"] = cart_id
+    return quote
@@ -0,0 +1,137 @@
+from functools import partial
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+PAID = "paid"
+CANCELLED_BY_USER = "fail_by_user"
+NEEDS_REFUND = "needs_refund"
+
+# پیام کاربر برای رویداد های ارسال سفارش
+FULFILMENT_MESSAGES = {
+    "preparing": ("سفارش در حال آماده سازی", "کاربر محترم سفارش شما در حال آماده سازی است"),
+    "shipped": ("ارسال سفارش", "کاربر محترم سفارش شما ارسال شد"),
+    "delivered": ("تحویل سفارش", "کاربر محترم سفارش شما تحویل داده شد"),
+}
+
+# total_sale of products of the paid orders in one statement
+TOTAL_SALE_SQL = """
+    UPDATE product AS p
+    SET total_sale = p.total_sale + s.qty
+    FROM (
+        SELECT pv.product_id, sum(oi.quantity) AS qty
+        FROM order_item AS oi
+        JOIN product_variant AS pv ON pv.id = oi.product_variant_id
+        WHERE oi.order_id = ANY(%s) AND oi.is_active AND oi.is_deleted IS NOT TRUE
+        GROUP BY pv.product_id
+    ) AS s
+    WHERE p.id = s.product_id
+"""
+
+
+def schedule_dispatch():
+    """
+    one broker message per transaction, sent only after commit
+    """
+    from order_app.tasks import dispatch_order_events
+
+    transaction.on_commit(lambda: dispatch_order_events.delay())
+
+
+def record_event(order_id, event_type, **payload):
+    """
+    write the event in the current transaction, must be called inside transaction.atomic
+    """
+    from order_app.models import OrderEvent
+
+    event = OrderEvent.objects.create(order_id=order_id, event_type=event_type, payload=payload)
+    schedule_dispatch()
+    return event
+
+
+def _notifications(events, admin_ids):
+    from account_app.models import PrivateNotification
+
+    notifications = []
+    for event in events:
+        if event.event_type in FULFILMENT_MESSAGES and event.payload.get("user_id"):
+            title, body = FULFILMENT_MESSAGES[event.event_type]
+            notifications.append(
+                PrivateNotification(user_id=event.payload["user_id"], title=title, body=body)
+            )
+            continue
+        if event.event_type == NEEDS_REFUND:
+            notifications.extend(
+                PrivateNotification(
+                    user_id=admin_id,
+                    body="ادمین گرامی یک سفارش لغو شده پرداخت شد، مبلغ باید بازگردانده شود",
+                    title="پرداخت بعد از لغو سفارش",
+                )
+                for admin_id in admin_ids
+            )
+            continue
+        if event.event_type != PAID:
+            continue
+        notifications.extend(
+            PrivateNotification(
+                user_id=admin_id,
+                body="ادمین گرامی یک سفارش ثبت و پرداخت شده هست",
+                title="سفارش موفق",
+            )
+            for admin_id in admin_ids
+        )
+        if event.payload.get("user_id"):
+            notifications.append(
+                PrivateNotification(
+                    user_id=event.payload["user_id"],
+                    title="ثبت سفارش موفق",
+                    body="کاربر محترم سفارش شما با موفقیت پرداخت و ثبت شده است",
+                    notif_type="accept_order",
+                )
+            )
+    return notifications
+
+
+def dispatch_events(batch_size=100):
+    """
+    drain the outbox batch by batch, workers lock different rows (skip locked) \\n
+    notifications and total_sale are written with the dispatched mark, sms tasks are queued after commit
+    """
+    from account_app.models import PrivateNotification, User
+    from order_app.models import OrderEvent
+    from order_app.tasks import send_sms_after_cancel_order, send_sms_after_complete_order
+
+    sms_tasks = {PAID: send_sms_after_complete_order, CANCELLED_BY_USER: send_sms_after_cancel_order}
+    dispatched = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                OrderEvent.objects.select_for_update(skip_locked=True).filter(
+                    dispatched_at__isnull=True
+                ).only("id", "order_id", "event_type", "payload")[:batch_size]
+            )
+            if not events:
+                return dispatched
+
+            paid_order_ids = [event.order_id for event in events if event.event_type == PAID]
+            admin_ids = []
+            if paid_order_ids or any(event.event_type == NEEDS_REFUND for event in events):
+                admin_ids = list(User.objects.filter(is_staff=True, is_active=True).values_list("id", flat=True))
+            if paid_order_ids:
+                with connection.cursor() as cursor:
+                    cursor.execute(TOTAL_SALE_SQL, (paid_order_ids,))
+            PrivateNotification.objects.bulk_create(_notifications(events, admin_ids))
+
+            OrderEvent.objects.filter(id__in=[event.id for event in events]).update(
+                dispatched_at=timezone.now()
+            )
+
+            for event in events:
+                mobile_phone = event.payload.get("mobile_phone")
+                task = sms_tasks.get(event.event_type)
+                if task and mobile_phone:
+                    transaction.on_commit(partial(task.delay, mobile_phone, event.payload.get("tracking_code")))
+
+        dispatched += len(events)
+        if len(events) < batch_size:
+            return dispatched
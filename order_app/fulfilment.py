@@ -0,0 +1,80 @@
+from django.db import connection, transaction
+
+from order_app.events import schedule_dispatch
+
+# وضعیت مقصد --> وضعیت هایی که اجازه تغییر به ان را دارند
+# processing is the payment in progress status of settlement and reconciliation, a paid order
+# never goes back to it
+FULFILMENT_TRANSITIONS = {
+    "preparing": ("paid",),
+    "shipped": ("paid", "preparing"),
+    "delivered": ("shipped",),
+}
+BULK_LIMIT = 1000
+# سفارش های پرداخت شده در هر مرحله ارسال، فروش گزارش ها
+SOLD_STATUSES = ("paid", "preparing", "shipped", "delivered")
+
+# lock the orders that may move, move them with one UPDATE and write one outbox event per
+# moved order, {orders} is either ANY(array of ids) or a subquery of ids
+TRANSITION_SQL = """
+    WITH target AS (
+        SELECT o.id, o.status
+        FROM orders AS o
+        WHERE o.id IN ({orders})
+            AND o.status = ANY(%s)
+            AND o.is_deleted IS NOT TRUE
+        ORDER BY o.id
+        LIMIT %s
+        FOR UPDATE OF o
+    ), moved AS (
+        UPDATE orders AS o
+        SET status = %s, updated_at = now()
+        FROM target AS t
+        WHERE o.id = t.id
+        RETURNING o.id, o.profile_id, o.tracking_code, t.status AS previous_status
+    ), events AS (
+        INSERT INTO order_event (order_id, event_type, payload, created_at)
+        SELECT m.id, %s,
+               jsonb_build_object(
+                   'user_id', p.user_id,
+                   'mobile_phone', u.mobile_phone,
+                   'tracking_code', m.tracking_code,
+                   'previous_status', m.previous_status,
+                   'staff_id', %s::bigint
+               ),
+               now()
+        FROM moved AS m
+        JOIN auth_profile AS p ON p.id = m.profile_id
+        JOIN auth_user AS u ON u.id = p.user_id
+        RETURNING order_id
+    )
+    SELECT m.id, m.previous_status
+    FROM moved AS m
+    ORDER BY m.id
+"""
+
+
+def transition_orders(status, order_ids=None, queryset=None, staff_id=None, limit=BULK_LIMIT):
+    """
+    move many orders to status in one statement \n
+    order_ids --> list of ids, or queryset --> filtered Order queryset used as a subquery \n
+    orders whose current status does not allow the transition are skipped \n
+    return {order_id: previous_status} of the moved orders
+    """
+    if order_ids is not None:
+        if not order_ids:
+            return {}
+        orders, params = "SELECT unnest(%s::bigint[])", [list(order_ids)]
+    else:
+        orders, params = queryset.order_by().values("id").query.sql_with_params()
+        params = list(params)
+
+    params += [list(FULFILMENT_TRANSITIONS[status]), limit, status, status, staff_id]
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(TRANSITION_SQL.format(orders=orders), params)
+            moved = dict(cursor.fetchall())
+
+        if moved:
+            schedule_dispatch()
+    return moved
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from order_app.archive import ARCHIVES, archive_batch, count_archivable
+
+
+class Command(BaseCommand):
+    help = "move gateway json of settled orders older than --days into gzip ndjson objects in the bucket"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=180)
+        parser.add_argument("--batch-size", type=int, default=1000, help="rows per select")
+        parser.add_argument("--kind", choices=tuple(ARCHIVES), help="default is every kind")
+        parser.add_argument("--dry-run", action="store_true", help="only count the rows")
+
+    def handle(self, *args, **options):
+        kinds = (options["kind"],) if options["kind"] else tuple(ARCHIVES)
+
+        for kind in kinds:
+            if options["dry_run"]:
+                self.stdout.write(f"{kind}: {count_archivable(kind, options['days'])} rows to archive")
+                continue
+
+            total = 0
+            while True:
+                archived = archive_batch(kind, options["days"], batch_size=options["batch_size"])
+                total += archived
+                if not archived:
+                    break
+                self.stdout.write(f"{kind}: {total} rows archived so far")
+
+            self.stdout.write(self.style.SUCCESS(f"{kind}: {total} rows archived"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from order_app.totals import backfill_order_totals
+
+
+class Command(BaseCommand):
+    help = "fill stored totals of orders created before the totals columns, one id range per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="ids per batch")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT min(id), max(id) FROM orders WHERE grand_total IS NULL")
+            min_id, max_id = cursor.fetchone()
+
+        if min_id is None:
+            self.stdout.write("every order has its totals")
+            return
+
+        updated = 0
+        for start in range(min_id, max_id + 1, batch_size):
+            with transaction.atomic():
+                updated += backfill_order_totals(start, start + batch_size)
+            self.stdout.write(f"ids {start} - {start + batch_size - 1}: {updated} orders updated so far")
+
+        self.stdout.write(self.style.SUCCESS(f"totals filled for {updated} orders"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+BACKFILL_SQL = """
+    UPDATE payment_gateway
+    SET track_id = (payment_gateway ->> 'trackId')::bigint
+    WHERE id >= %s AND id < %s
+        AND track_id IS NULL
+        AND payment_gateway ->> 'trackId' ~ '^[0-9]{1,18}$'
+"""
+
+
+class Command(BaseCommand):
+    help = "fill payment_gateway.track_id from the trackId key of the json, one id range per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="ids per batch")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT min(id), max(id) FROM payment_gateway")
+            min_id, max_id = cursor.fetchone()
+
+        if min_id is None:
+            self.stdout.write("payment_gateway is empty")
+            return
+
+        updated = 0
+        for start in range(min_id, max_id + 1, batch_size):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(BACKFILL_SQL, (start, start + batch_size))
+                updated += cursor.rowcount
+            self.stdout.write(f"ids {start} - {start + batch_size - 1}: {updated} rows updated so far")
+
+        self.stdout.write(self.style.SUCCESS(f"track_id filled for {updated} rows"))
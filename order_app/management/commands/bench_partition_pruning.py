@@ -0,0 +1,119 @@
+import json
+import random
+import statistics
+import time
+from datetime import UTC, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from order_app.partitions import add_months, bound_literal
+
+# same shape as order_item, the real tables are untouched
+COLUMNS = """
+    id bigint NOT NULL,
+    created_at timestamptz NOT NULL,
+    order_id bigint NOT NULL,
+    price numeric(12, 3) NOT NULL,
+    quantity integer NOT NULL
+"""
+FILL_SQL = """
+    INSERT INTO {table} (id, created_at, order_id, price, quantity)
+    SELECT g,
+           %(start)s::timestamptz + (%(span)s::float8 * (g - 1) / %(rows)s) * interval '1 second',
+           g / 3,
+           (random() * 1000000)::numeric(12, 3),
+           1 + (random() * 4)::int
+    FROM generate_series(1, %(rows)s) AS g
+"""
+# date bounded aggregate as the analytics endpoints run it
+AGGREGATE_SQL = """
+    SELECT count(*), sum(price * quantity)
+    FROM {table}
+    WHERE created_at >= %s AND created_at < %s
+"""
+TABLES = ("bench_items_plain", "bench_items_part")
+
+
+def _scanned_relations(plan):
+    relations = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        stack.extend(node.get("Plans", ()))
+    return relations
+
+
+class Command(BaseCommand):
+    help = "compare a one month aggregate on a plain table and on a monthly partitioned table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=3_000_000)
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument("--queries", type=int, default=30)
+
+    def setup(self, cursor, rows, years):
+        start = datetime(datetime.now().year - years, 1, 1, tzinfo=UTC)
+        end = start.replace(year=start.year + years)
+        params = {"start": start, "span": (end - start).total_seconds(), "rows": rows}
+
+        cursor.execute(f"CREATE TABLE bench_items_plain ({COLUMNS}, PRIMARY KEY (id))")
+        cursor.execute(f"CREATE TABLE bench_items_part ({COLUMNS}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)")
+        month = start
+        while month < end:
+            upper = add_months(month, 1)
+            cursor.execute(
+                f"CREATE TABLE bench_items_part_p{month:%Y%m} PARTITION OF bench_items_part "
+                f"FOR VALUES FROM ({bound_literal(month)}) TO ({bound_literal(upper)})"
+            )
+            month = upper
+
+        for table in TABLES:
+            cursor.execute(FILL_SQL.format(table=table), params)
+            cursor.execute(f"ANALYZE {table}")
+        return start, years * 12
+
+    def measure(self, cursor, table, windows):
+        timings = []
+        for window in windows:
+            started = time.perf_counter()
+            cursor.execute(AGGREGATE_SQL.format(table=table), window)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        cursor.execute("EXPLAIN (FORMAT JSON) " + AGGREGATE_SQL.format(table=table), windows[0])
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return {
+            "avg": statistics.fmean(timings),
+            "p50": timings[len(timings) // 2],
+            "p95": timings[max(int(len(timings) * 0.95) - 1, 0)],
+            "scanned": len(_scanned_relations(plan[0]["Plan"])),
+        }
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            self.stdout.write(f"creating {options['rows']} rows over {options['years']} years in each table ...")
+            try:
+                start, months = self.setup(cursor, options["rows"], options["years"])
+                windows = []
+                for _ in range(options["queries"]):
+                    month = add_months(start, random.randrange(months))
+                    windows.append((month, month + timedelta(days=30)))
+
+                results = {table: self.measure(cursor, table, windows) for table in TABLES}
+            finally:
+                for table in TABLES:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+
+        for table, result in results.items():
+            self.stdout.write(
+                f"{table}: avg={result['avg']:.1f}ms p50={result['p50']:.1f}ms p95={result['p95']:.1f}ms "
+                f"relations scanned={result['scanned']}"
+            )
+        plain, part = results["bench_items_plain"], results["bench_items_part"]
+        self.stdout.write(self.style.SUCCESS(f"speedup (avg): {plain['avg'] / part['avg']:.1f}x"))
@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# same table shape as payment_gateway, in a temp table so real data is untouched
+SETUP_SQL = (
+    """
+    CREATE TEMP TABLE bench_payment_gateway (
+        id bigserial PRIMARY KEY,
+        payment_gateway jsonb NOT NULL,
+        track_id bigint
+    ) ON COMMIT PRESERVE ROWS
+    """,
+    """
+    INSERT INTO bench_payment_gateway (payment_gateway, track_id)
+    SELECT jsonb_build_object('trackId', 4000000000 + g, 'result', 100, 'message', 'success'),
+           4000000000 + g
+    FROM generate_series(1, %s) AS g
+    """,
+    "CREATE INDEX bench_payment_gateway_track_idx ON bench_payment_gateway (track_id)",
+    "ANALYZE bench_payment_gateway",
+)
+
+# json lookup as the orm compiles payment_gateway__trackId=...
+JSON_LOOKUP_SQL = "SELECT id FROM bench_payment_gateway WHERE (payment_gateway -> 'trackId') = %s::jsonb"
+COLUMN_LOOKUP_SQL = "SELECT id FROM bench_payment_gateway WHERE track_id = %s"
+
+
+class Command(BaseCommand):
+    help = "compare trackId lookups on the json key and on the indexed track_id column"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--lookups", type=int, default=200)
+
+    def measure(self, cursor, sql, track_ids, as_json):
+        timings = []
+        for track_id in track_ids:
+            started = time.perf_counter()
+            cursor.execute(sql, (str(track_id) if as_json else track_id,))
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            "avg": statistics.fmean(timings),
+            "p50": timings[len(timings) // 2],
+            "p95": timings[int(len(timings) * 0.95) - 1],
+        }
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        track_ids = [4000000000 + random.randint(1, rows) for _ in range(options["lookups"])]
+
+        with connection.cursor() as cursor:
+            self.stdout.write(f"creating {rows} rows ...")
+            for sql in SETUP_SQL:
+                cursor.execute(sql, (rows,) if "%s" in sql else None)
+
+            try:
+                json_result = self.measure(cursor, JSON_LOOKUP_SQL, track_ids, as_json=True)
+                column_result = self.measure(cursor, COLUMN_LOOKUP_SQL, track_ids, as_json=False)
+            finally:
+                cursor.execute("DROP TABLE IF EXISTS bench_payment_gateway")
+
+        for name, result in (("json key", json_result), ("track_id", column_result)):
+            self.stdout.write(
+                f"{name}: avg={result['avg']:.3f}ms p50={result['p50']:.3f}ms p95={result['p95']:.3f}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"speedup (avg): {json_result['avg'] / column_result['avg']:.1f}x"))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from order_app.partitions import (
+    PARTITIONED_TABLES,
+    convert_table,
+    create_partitions,
+    detach_partitions,
+    is_partitioned,
+    list_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = "monthly partitions of order_item and result_payment_gateway: list, convert, create, detach"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=("list", "convert", "create", "detach"))
+        parser.add_argument("--table", choices=PARTITIONED_TABLES, help="default is every table")
+        parser.add_argument("--months-ahead", type=int, default=3, help="partitions created after the current month")
+        parser.add_argument("--keep-months", type=int, default=24, help="detach partitions older than this")
+
+    def handle(self, *args, **options):
+        tables = (options["table"],) if options["table"] else PARTITIONED_TABLES
+        action = options["action"]
+
+        for table in tables:
+            partitioned = is_partitioned(table)
+            if action == "convert":
+                if partitioned:
+                    self.stdout.write(f"{table} is already partitioned")
+                    continue
+                created = convert_table(table, months_ahead=options["months_ahead"])
+                self.stdout.write(self.style.SUCCESS(f"{table} converted, partitions created: {', '.join(created)}"))
+                continue
+
+            if not partitioned:
+                raise CommandError(f"{table} is not partitioned, run convert first")
+
+            if action == "list":
+                for name, upper in list_partitions(table):
+                    self.stdout.write(f"{name}: {'default' if upper is None else f'until {upper:%Y-%m-%d}'}")
+            elif action == "create":
+                created = create_partitions(table, months_ahead=options["months_ahead"])
+                self.stdout.write(f"{table}: {len(created)} partitions created {' '.join(created)}")
+            else:
+                detached = detach_partitions(table, keep_months=options["keep_months"])
+                self.stdout.write(f"{table}: {len(detached)} partitions detached {' '.join(detached)}")
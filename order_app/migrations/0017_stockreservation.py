@@ -0,0 +1,47 @@
+# Generated by Django 6.0.6 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_app', '0016_alter_order_address'),
+        ('product_app', '0037_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('reserved', 'رزرو شده'), ('released', 'آزاد شده'), ('committed', 'نهایی شده')], default='reserved', max_length=10)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_reservations', to='order_app.order')),
+                ('product_variant', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_reservations', to='product_app.productvariant')),
+            ],
+            options={
+                'db_table': 'stock_reservation',
+                'ordering': ('id',),
+                'indexes': [models.Index(condition=models.Q(('status', 'reserved')), fields=['expires_at'], name='stock_reservation_open_idx')],
+            },
+        ),
+        # ledger rows for orders that were reserved before the ledger existed
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO stock_reservation (created_at, order_id, product_variant_id, quantity, expires_at, status)
+                SELECT now(), oi.order_id, oi.product_variant_id, sum(oi.quantity),
+                       coalesce(o.reserved_until, now()), 'reserved'
+                FROM order_item AS oi
+                JOIN orders AS o ON o.id = oi.order_id
+                WHERE o.is_reserved AND oi.is_active
+                    AND o.status IN ('pending', 'processing', 'fail_by_user')
+                GROUP BY oi.order_id, oi.product_variant_id, o.reserved_until
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
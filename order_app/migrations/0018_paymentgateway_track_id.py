@@ -0,0 +1,25 @@
+# Generated by Django 6.0.6 on 2026-10-18 11:40
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the index is built concurrently so payment_gateway stays writable
+    atomic = False
+
+    dependencies = [
+        ('order_app', '0017_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentgateway',
+            name='track_id',
+            field=models.BigIntegerField(blank=True, help_text='trackId درگاه زیبال', null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='paymentgateway',
+            index=models.Index(fields=['track_id'], name='payment_gateway_track_idx'),
+        ),
+    ]
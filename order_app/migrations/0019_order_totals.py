@@ -0,0 +1,37 @@
+# Generated by Django 6.0.6 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_app', '0018_paymentgateway_track_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True, verbose_name='جمع اقلام'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='discount_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True, verbose_name='جمع تخفیف'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='shipping_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True, verbose_name='هزینه ارسال و بسته بندی'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='grand_total',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True, verbose_name='مبلغ نهایی'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['grand_total'], name='orders_grand_total_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.6 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_app', '0019_order_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event_type', models.CharField(choices=[('paid', 'پرداخت شده'), ('fail_by_user', 'لغو شده توسط کاربر')], max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='events', to='order_app.order')),
+            ],
+            options={
+                'db_table': 'order_event',
+                'ordering': ('id',),
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['id'], name='order_event_pending_idx')],
+            },
+        ),
+    ]
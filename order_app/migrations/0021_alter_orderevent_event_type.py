@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_app', '0020_orderevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderevent',
+            name='event_type',
+            field=models.CharField(choices=[('paid', 'پرداخت شده'), ('fail_by_user', 'لغو شده توسط کاربر'), ('processing', 'در حال پردازش'), ('shipped', 'ارسال شده'), ('delivered', 'تحویل داده شده')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.6 on 2026-10-18 14:10
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # the indexes are built concurrently so orders and payment_gateway stay writable
+    atomic = False
+
+    dependencies = [
+        ('order_app', '0021_alter_orderevent_event_type'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='orders_created_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='paymentgateway',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['created_at'], name='payment_gateway_created_brin'),
+        ),
+    ]
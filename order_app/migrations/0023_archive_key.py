@@ -0,0 +1,23 @@
+# Generated by Django 6.0.6 on 2026-10-18 14:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_app', '0022_brin_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentgateway',
+            name='archive_key',
+            field=models.CharField(blank=True, help_text='کلید فایل آرشیو در باکت', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='verifypaymentgateway',
+            name='archive_key',
+            field=models.CharField(blank=True, help_text='کلید فایل آرشیو در باکت', max_length=255, null=True),
+        ),
+    ]
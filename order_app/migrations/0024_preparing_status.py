@@ -0,0 +1,36 @@
+# Generated by Django 6.0.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_app', '0023_archive_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'در انتظار پرداخت'), ('fail_by_user', 'لغو شده توسط کاربر'), ('fail', 'خطا در پرداخت'), ('paid', 'پرداخت شده'), ('processing', 'در حال پردازش'), ('preparing', 'در حال آماده سازی'), ('shipped', 'ارسال شده'), ('delivered', 'تحویل داده شده'), ('cancelled', 'لغو شده')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='orderevent',
+            name='event_type',
+            field=models.CharField(choices=[('paid', 'پرداخت شده'), ('fail_by_user', 'لغو شده توسط کاربر'), ('preparing', 'در حال آماده سازی'), ('shipped', 'ارسال شده'), ('delivered', 'تحویل داده شده')], max_length=20),
+        ),
+        # paid orders moved to processing by the fulfilment actions, payment in progress orders
+        # have no payment_date
+        migrations.RunSQL(
+            sql="""
+                UPDATE orders SET status = 'preparing'
+                WHERE status = 'processing' AND payment_date IS NOT NULL;
+                UPDATE order_event SET event_type = 'preparing' WHERE event_type = 'processing';
+            """,
+            reverse_sql="""
+                UPDATE orders SET status = 'processing' WHERE status = 'preparing';
+                UPDATE order_event SET event_type = 'processing' WHERE event_type = 'preparing';
+            """,
+        ),
+    ]
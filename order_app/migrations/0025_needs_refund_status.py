@@ -0,0 +1,23 @@
+# Generated by Django 6.0.6 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_app', '0024_preparing_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('pending', 'در انتظار پرداخت'), ('fail_by_user', 'لغو شده توسط کاربر'), ('fail', 'خطا در پرداخت'), ('paid', 'پرداخت شده'), ('processing', 'در حال پردازش'), ('preparing', 'در حال آماده سازی'), ('shipped', 'ارسال شده'), ('delivered', 'تحویل داده شده'), ('cancelled', 'لغو شده'), ('needs_refund', 'پرداخت بعد از لغو، نیاز به بازگشت وجه')], default='pending', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='orderevent',
+            name='event_type',
+            field=models.CharField(choices=[('paid', 'پرداخت شده'), ('fail_by_user', 'لغو شده توسط کاربر'), ('preparing', 'در حال آماده سازی'), ('shipped', 'ارسال شده'), ('delivered', 'تحویل داده شده'), ('needs_refund', 'پرداخت بعد از لغو، نیاز به بازگشت وجه')], max_length=20),
+        ),
+    ]
@@ -1,17 +1,19 @@
 import uuid
-from decimal import Decimal
 from rest_framework.exceptions import ValidationError
+from django.contrib.postgres.indexes import BrinIndex
 from django.core.validators import MinValueValidator
 from django.db import models
-from django.db.models import F
+from django.db.models import Q
 from django.utils.functional import cached_property
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from core_app.models import CreateMixin, UpdateMixin, SoftDeleteMixin
-from discount_app.models import Coupon, ProductDiscount
-from order_app.tasks import send_notification_order_complete
-from product_app.models import ProductVariant
+from discount_app import coupons
+from order_app.archive import load_archived_payload
+from order_app.pricing import price_cart
+from order_app.reservations import create_reservations, release_order_reservations
+from product_app.stock import reserve_stock
 
 
 # Create your models here.
@@ -28,9 +30,11 @@ class Order(CreateMixin, UpdateMixin, SoftDeleteMixin):
         ("fail", "خطا در پرداخت"),
         ('paid', 'پرداخت شده'),
         ('processing', 'در حال پردازش'),
+        ('preparing', 'در حال آماده سازی'),
         ('shipped', 'ارسال شده'),
         ('delivered', 'تحویل داده شده'),
         ('cancelled', 'لغو شده'),
+        ('needs_refund', 'پرداخت بعد از لغو، نیاز به بازگشت وجه'),
     ]
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -54,17 +58,22 @@ class Order(CreateMixin, UpdateMixin, SoftDeleteMixin):
     )
     is_active = models.BooleanField(default=True)
     items_data = models.JSONField(blank=True, null=True)
+    # جمع سفارش، در checkout محاسبه و با تغییر آیتم ها دوباره محاسبه میشود
+    items_total = models.DecimalField(_("جمع اقلام"), max_digits=12, decimal_places=3, null=True, blank=True)
+    discount_total = models.DecimalField(_("جمع تخفیف"), max_digits=12, decimal_places=3, null=True, blank=True)
+    shipping_total = models.DecimalField(_("هزینه ارسال و بسته بندی"), max_digits=12, decimal_places=3, null=True, blank=True)
+    grand_total = models.DecimalField(_("مبلغ نهایی"), max_digits=12, decimal_places=3, null=True, blank=True)
 
     def save(self, *args, **kwargs):
         if not self.tracking_code:
             uid = uuid.uuid4().hex[:10]
             self.tracking_code = f"gs-{str(timezone.now().date())}-{uid}"
-        if self.is_complete:
-            send_notification_order_complete.delay()
         super().save(*args, **kwargs)
 
     @cached_property
     def sub_total(self):
+        if self.items_total is not None:
+            return self.items_total
         total = sum(
             item.calc_price_quantity for item in self.order_items.filter(is_active=True).only(
                 "order_id", "price", "quantity"
@@ -85,31 +94,30 @@ class Order(CreateMixin, UpdateMixin, SoftDeleteMixin):
     def shipping_cost(self):
         return self.shipping.price if self.shipping else None
 
-    def reserved_stock(self, duration=10):
+    def reserved_stock(self, duration=10, items=None):
         self.reserved_until = timezone.now() + timezone.timedelta(minutes=duration)
         self.is_reserved = True
-        self.save()
-
-        order_items = self.order_items.filter(is_active=True)
-        for item in order_items:
-            variant = item.product_variant
-            if variant.stock_number >= item.quantity:
-                variant.stock_number -= item.quantity
-                variant.save()
-            else:
-                raise ValidationError(f"amount not enough for {variant.name}")
+        self.save(update_fields=("reserved_until", "is_reserved", "updated_at"))
+
+        if items is None:
+            items = self.order_items.filter(is_active=True).values("product_variant_id", "quantity")
+
+        # ledger of the reservation, released by release_expired_reservations
+        create_reservations(self.id, items, self.reserved_until)
+
+        # decrement all variants in one statement, hot counters are held in redis until commit
+        failed_ids = reserve_stock(items)
+        if failed_ids:
+            raise ValidationError(
+                {
+                    "message": "amount not enough",
+                    "product_variant_ids": failed_ids,
+                }
+            )
 
     def release_stock(self, save=False):
         if self.is_reserved and self.status != 'paid':
-            order_items = self.order_items.filter(is_active=True)
-            for item in order_items:
-                variant = item.product_variant
-                variant.stock_number += item.quantity
-                variant.save()
-            
-            # self.is_reserved = False
-            # self.reserved_until = None
-            # self.save()
+            release_order_reservations(self.id)
         if save:
             self.save()
 
@@ -118,68 +126,31 @@ class Order(CreateMixin, UpdateMixin, SoftDeleteMixin):
 
     @classmethod
     def is_valid_coupon(self, code):
-        coupon = Coupon.objects.filter(
-            is_active=True,
-            valid_from__lte=timezone.now(),
-            valid_to__gte=timezone.now(),
-            number_of_uses__lt=F("maximum_use"),
-            code=code
-        ).only("amount", "coupon_type")
-
-        if not coupon:
-            return False
-        return coupon
-
-    @cached_property
-    def calc_price_preposition_wight(self):
-        amount = 20_000
-        return amount
+        """
+        return CouponInfo (id, code, coupon_type, amount) or False, read from redis cache
+        """
+        return coupons.get_valid_coupon(code) or False
 
     def total_price(self, variants, coupon_code=None):
-        final_price = Decimal(0)
-        for i in variants:
-            have_discount = ProductDiscount.objects.filter(product_variant_id=i['product_variant_id']).valid_discount().only("id")
-            get_price = ProductVariant.objects.filter(id=i['product_variant_id']).only("price")[0].price
-            if have_discount:
-                final_price += self._apply_product_discounts(get_price, have_discount)
-                final_price *= i['quantity']
-            else:
-                final_price += i['quantity'] * get_price
-        if coupon_code:
-            final_price = self._apply_coupon_discount(final_price, coupon_code)
-
-        final_price += self.shipping_cost
-        final_price += self.calc_price_preposition_wight
-        return final_price
-
-    def _apply_product_discounts(self, amount, product_discounts):
-        """اعمال تخفیف‌های محصول بر روی مبلغ"""
-        discounted_amount = amount
-        for discount in product_discounts:
-            if discount.discount_type == "percent":
-                discounted_amount -= (discounted_amount * int(discount.amount) / 100)
-            else:
-                discounted_amount -= int(discount.amount)
-        return max(discounted_amount, 0)  # اطمینان از عدم منفی شدن مبلغ
-
-    def _apply_coupon_discount(self, amount, valid_coupon):
-        """اعمال کوپن تخفیف بر روی مبلغ"""
-        coupon = valid_coupon[0]  # چون کوپن از قبل اعتبارسنجی شده
-        if coupon.coupon_type == "percent":
-            discounted_amount = amount - (amount * int(coupon.amount) / 100)
-        else:
-            discounted_amount = amount - int(coupon.amount)
-
-        # افزایش تعداد استفاده از کوپن
-        coupon.number_of_uses += 1
-        coupon.save()
-
-        return max(discounted_amount, 0)  # اطمینان از عدم منفی شد
+        coupon = coupons.get_valid_coupon(coupon_code) if coupon_code else None
+        quote = price_cart(variants, shipping=self.shipping, coupon=coupon)
+        if coupon is not None:
+            self.redeem_coupon(coupon)
+        return quote["grand_total"]
 
+    def redeem_coupon(self, coupon):
+        """افزایش تعداد استفاده از کوپن"""
+        if not coupons.redeem_coupon(coupon.code):
+            raise ValidationError({"message": _("coupon code is invalid")})
 
     class Meta:
         ordering = ("id",)
         db_table = "orders"
+        indexes = (
+            models.Index(fields=("grand_total",), name="orders_grand_total_idx"),
+            # rows are appended in created_at order, a few kb of brin serves the date ranges
+            BrinIndex(fields=("created_at",), name="orders_created_brin"),
+        )
 
 
 class OrderItem(CreateMixin, UpdateMixin, SoftDeleteMixin):
@@ -209,6 +180,77 @@ class OrderItem(CreateMixin, UpdateMixin, SoftDeleteMixin):
         db_table = "order_item"
 
 
+class OrderEvent(CreateMixin):
+    """
+    outbox of order events, written in the transaction of the status change and
+    drained by dispatch_order_events after commit
+    """
+    class EventType(models.TextChoices):
+        PAID = "paid", _("پرداخت شده")
+        CANCELLED_BY_USER = "fail_by_user", _("لغو شده توسط کاربر")
+        PREPARING = "preparing", _("در حال آماده سازی")
+        SHIPPED = "shipped", _("ارسال شده")
+        DELIVERED = "delivered", _("تحویل داده شده")
+        NEEDS_REFUND = "needs_refund", _("پرداخت بعد از لغو، نیاز به بازگشت وجه")
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.PROTECT,
+        related_name="events",
+    )
+    event_type = models.CharField(max_length=20, choices=EventType.choices)
+    payload = models.JSONField(default=dict, blank=True)
+    dispatched_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ("id",)
+        db_table = "order_event"
+        indexes = (
+            models.Index(
+                fields=("id",),
+                name="order_event_pending_idx",
+                condition=Q(dispatched_at__isnull=True),
+            ),
+        )
+
+
+class StockReservation(CreateMixin):
+    class ReservationStatus(models.TextChoices):
+        RESERVED = "reserved", _("رزرو شده")
+        RELEASED = "released", _("آزاد شده")
+        COMMITTED = "committed", _("نهایی شده")
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.PROTECT,
+        related_name="stock_reservations",
+    )
+    product_variant = models.ForeignKey(
+        "product_app.ProductVariant",
+        on_delete=models.PROTECT,
+        related_name="stock_reservations",
+    )
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    status = models.CharField(
+        max_length=10,
+        choices=ReservationStatus.choices,
+        default=ReservationStatus.RESERVED,
+    )
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("id",)
+        db_table = "stock_reservation"
+        indexes = (
+            models.Index(
+                fields=("expires_at",),
+                name="stock_reservation_open_idx",
+                condition=Q(status="reserved"),
+            ),
+        )
+
+
 class ShippingCompany(CreateMixin, UpdateMixin, SoftDeleteMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
@@ -258,9 +300,23 @@ class PaymentGateWay(CreateMixin, SoftDeleteMixin):
     )
     user = models.ForeignKey("account_app.User", on_delete=models.PROTECT, related_name="gateways", blank=True, null=True)
     payment_gateway = models.JSONField()
+    track_id = models.BigIntegerField(blank=True, null=True, help_text=_("trackId درگاه زیبال"))
+    archive_key = models.CharField(max_length=255, blank=True, null=True, help_text=_("کلید فایل آرشیو در باکت"))
+
+    def gateway_payload(self):
+        """
+        full json of the gateway, read from the archive when only the kept keys are in the row
+        """
+        if self.archive_key:
+            return load_archived_payload(self.archive_key, self.id)
+        return self.payment_gateway
 
     class Meta:
         db_table = "payment_gateway"
+        indexes = (
+            models.Index(fields=("track_id",), name="payment_gateway_track_idx"),
+            BrinIndex(fields=("created_at",), name="payment_gateway_created_brin"),
+        )
 
 
 class VerifyPaymentGateWay(CreateMixin, UpdateMixin, SoftDeleteMixin):
@@ -270,6 +326,15 @@ class VerifyPaymentGateWay(CreateMixin, UpdateMixin, SoftDeleteMixin):
         related_name="result_payment_gateways",
     )
     result = models.JSONField()
+    archive_key = models.CharField(max_length=255, blank=True, null=True, help_text=_("کلید فایل آرشیو در باکت"))
+
+    def verify_result(self):
+        """
+        full json of the verify, read from the archive when only the kept keys are in the row
+        """
+        if self.archive_key:
+            return load_archived_payload(self.archive_key, self.id)
+        return self.result
 
     class Meta:
         db_table = "result_payment_gateway"
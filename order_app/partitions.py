@@ -0,0 +1,205 @@
+import re
+from datetime import UTC, datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# جدول هایی که بر اساس created_at ماهانه پارتیشن میشوند
+# only leaf tables, no foreign key points to them so the primary key can become (id, created_at)
+PARTITIONED_TABLES = ("order_item", "result_payment_gateway")
+
+PARTITION_NAME = "{table}_p{year}{month:02d}"
+PARTITION_NAME_RE = r"^{table}_p(\d{{4}})(\d{{2}})$"
+UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+# lock_timeout of ddl on the parent, so attach and detach never queue behind long queries
+DDL_LOCK_TIMEOUT = "5s"
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=UTC)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def bound_literal(value):
+    # ddl does not take bind parameters
+    return f"'{value.isoformat()}'"
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def list_partitions(table):
+    """
+    return [(name, upper bound or None), ...] of the attached partitions, None --> default partition
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits AS i
+            JOIN pg_class AS c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+            """,
+            (table,),
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = UPPER_BOUND_RE.search(bound)
+        upper = datetime.fromisoformat(match.group(1)) if match else None
+        partitions.append((name, upper))
+    return partitions
+
+
+def _prepare_table(table, bound):
+    """
+    the slow parts of convert outside its transaction, under locks that do not block writes:
+    the (id, created_at) unique index that becomes the primary key and the validated bound check
+    that lets attach skip its own scan
+    """
+    index = f"{table}_id_created_at_uniq"
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (index,))
+        row = cursor.fetchone()
+        if row and not row[0]:
+            # left by a failed concurrent build
+            cursor.execute(f"DROP INDEX CONCURRENTLY {index}")
+        if not row or not row[0]:
+            cursor.execute(f"CREATE UNIQUE INDEX CONCURRENTLY {index} ON {table} (id, created_at)")
+
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_partition_bound")
+        # not valid --> only new rows are checked, validate scans without blocking writes
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_partition_bound "
+            f"CHECK (created_at IS NOT NULL AND created_at < {bound_literal(bound)}) NOT VALID"
+        )
+        cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_partition_bound")
+    return index
+
+
+def convert_table(table, months_ahead=3):
+    """
+    turn table into a partitioned table, the old table becomes the first partition
+    (MINVALUE up to the month after next) so no row is copied \n
+    the primary key becomes (id, created_at) and the id identity continues from max(id) \n
+    the index build and the bound check run first without blocking writes, the transaction
+    holds the exclusive lock only for catalog changes, must not run inside transaction.atomic
+    """
+    legacy = f"{table}_legacy"
+    # a month of room for the rows written between the check and the lock
+    bound = add_months(_month_start(timezone.now()), 2)
+    index = _prepare_table(table, bound)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM {table}")
+        max_id = cursor.fetchone()[0]
+
+        # foreign keys and secondary indexes are recreated on the parent
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+            """,
+            (table,),
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index AS x
+            JOIN pg_class AS i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(%s) AND NOT x.indisprimary AND NOT x.indisunique
+            """,
+            (table,),
+        )
+        indexes = cursor.fetchall()
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        # a partition can have only the primary key of the parent, the prebuilt index replaces it
+        cursor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey")
+        cursor.execute(f"ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_pkey PRIMARY KEY USING INDEX {index}")
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT")
+
+        cursor.execute(
+            f"""
+            CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)
+            PARTITION BY RANGE (created_at)
+            """
+        )
+        # like copies the bound check too, it belongs only to the old table
+        cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_partition_bound")
+        cursor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {max_id + 1})"
+        )
+        cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)")
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+        for name, definition in indexes:
+            # the same definition on the parent, attach reuses the index of the old table
+            definition = re.sub(r" ON (ONLY )?\S+ ", f" ON {table} ", definition, count=1)
+            cursor.execute(definition.replace(f"INDEX {name} ", f"INDEX {name}_part ", 1))
+
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ({bound_literal(bound)})"
+        )
+        cursor.execute(f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_partition_bound")
+        cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    return create_partitions(table, months_ahead=months_ahead)
+
+
+def create_partitions(table, months_ahead=3):
+    """
+    create the monthly partitions from the end of the last partition up to months_ahead months
+    after the current one, return names of the created partitions
+    """
+    uppers = [upper for _, upper in list_partitions(table) if upper is not None]
+    start = max(uppers) if uppers else _month_start(timezone.now())
+    end = add_months(_month_start(timezone.now()), months_ahead + 1)
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'")
+        while start < end:
+            upper = add_months(start, 1)
+            name = PARTITION_NAME.format(table=table, year=start.year, month=start.month)
+            cursor.execute(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ({bound_literal(start)}) TO ({bound_literal(upper)})"
+            )
+            created.append(name)
+            start = upper
+    return created
+
+
+def detach_partitions(table, keep_months):
+    """
+    detach monthly partitions that end before the first day of (now - keep_months), the tables
+    stay in the database under the same name for archiving, return their names
+    """
+    cutoff = add_months(_month_start(timezone.now()), -keep_months)
+    pattern = re.compile(PARTITION_NAME_RE.format(table=table))
+
+    detached = []
+    for name, upper in list_partitions(table):
+        if upper is None or not pattern.match(name) or upper > cutoff:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'")
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+        detached.append(name)
+    return detached
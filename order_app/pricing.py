@@ -0,0 +1,222 @@
+import json
+import logging
+import re
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.db.models import Q
+from django.db.models.functions import JSONObject
+from django.utils import timezone
+
+from product_app.models import ProductVariant
+from product_app.stock import get_stock_levels
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# هزینه بسته بندی و وزن سفارش
+PACKAGING_COST = Decimal(20_000)
+
+# قیمت و تخفیف هر variant در ردیس برای سبد خرید
+PRICE_KEY = "price:variant:{}"
+PRICE_TIMEOUT = 60
+
+# same check as product_app.listing.SOURCE_SQL, other amounts do not discount
+NUMERIC_AMOUNT = re.compile(r"[0-9]+(\.[0-9]+)?")
+
+
+def _apply_discount(amount, discount_type, discount_amount):
+    discount_amount = Decimal(str(discount_amount))
+    if discount_type == "percent":
+        amount -= amount * discount_amount / 100
+    else:
+        amount -= discount_amount
+    return max(amount, Decimal(0))  # اطمینان از عدم منفی شدن مبلغ
+
+
+def latest_discount(discounts):
+    """
+    discounts --> active discounts of a variant ordered by id \n
+    only the latest one applies, the rule of the listing table (min_effective_price, facets),
+    None when there is none or its amount is not a number
+    """
+    if not discounts:
+        return None
+    discount = discounts[-1]
+    if not NUMERIC_AMOUNT.fullmatch(str(discount["amount"] or "")):
+        return None
+    return discount
+
+
+def load_variant_prices(variant_ids):
+    """
+    load price, stock and active discounts of every variant in one query
+    """
+    now = timezone.now()
+    active_discount = Q(
+        product_variant_discounts__is_active=True,
+        product_variant_discounts__start_date__lte=now,
+        product_variant_discounts__end_date__gte=now,
+    )
+    rows = ProductVariant.objects.filter(
+        id__in=variant_ids,
+        is_active=True,
+    ).values(
+        "id",
+        "name",
+        "price",
+        "stock_number",
+    ).annotate(
+        discounts=JSONBAgg(
+            JSONObject(
+                id="product_variant_discounts__id",
+                discount_type="product_variant_discounts__discount_type",
+                amount="product_variant_discounts__amount",
+            ),
+            filter=active_discount,
+            order_by="product_variant_discounts__id",
+        )
+    ).order_by()
+    variants = {row["id"]: row for row in rows}
+
+    # live stock of hot variants
+    levels = get_stock_levels({variant_id: row["stock_number"] for variant_id, row in variants.items()})
+    for variant_id, row in variants.items():
+        row["stock_number"] = levels[variant_id]
+    return variants
+
+
+def _price_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection(getattr(settings, "CART_REDIS_ALIAS", "default"))
+
+
+def cached_variant_prices(variant_ids):
+    """
+    same result as load_variant_prices, rows are kept in redis for PRICE_TIMEOUT seconds \n
+    one MGET for all ids, postgres is queried only for the ids that are not cached,
+    stock is always overlaid with the live counters of hot variants \n
+    a started or ended discount shows up after PRICE_TIMEOUT at most, checkout prices from db
+    """
+    ids = [int(variant_id) for variant_id in variant_ids]
+    if not ids:
+        return {}
+
+    try:
+        conn = _price_redis()
+        cached = conn.mget([PRICE_KEY.format(variant_id) for variant_id in ids])
+    except RedisError:
+        logger.warning("redis unavailable, load variant prices from db")
+        return load_variant_prices(ids)
+
+    variants = {}
+    missing_ids = []
+    for variant_id, value in zip(ids, cached):
+        if value is None:
+            missing_ids.append(variant_id)
+            continue
+        row = json.loads(value)
+        # null --> inactive or deleted variant
+        if row is not None:
+            row["price"] = Decimal(row["price"])
+            variants[variant_id] = row
+
+    levels = get_stock_levels({variant_id: row["stock_number"] for variant_id, row in variants.items()})
+    for variant_id, row in variants.items():
+        row["stock_number"] = levels[variant_id]
+
+    if missing_ids:
+        loaded = load_variant_prices(missing_ids)
+        try:
+            with conn.pipeline(transaction=False) as pipe:
+                for variant_id in missing_ids:
+                    row = loaded.get(variant_id)
+                    value = None if row is None else {**row, "price": str(row["price"])}
+                    pipe.set(PRICE_KEY.format(variant_id), json.dumps(value), ex=PRICE_TIMEOUT)
+                pipe.execute()
+        except RedisError:
+            logger.warning("redis unavailable, variant prices are not cached")
+        variants.update(loaded)
+    return variants
+
+
+def invalidate_variant_prices(variant_ids):
+    if not variant_ids:
+        return
+    try:
+        _price_redis().delete(*[PRICE_KEY.format(variant_id) for variant_id in variant_ids])
+    except RedisError:
+        # entries expire after PRICE_TIMEOUT anyway
+        logger.warning("redis unavailable, variant prices are not invalidated")
+
+
+def price_cart(items, shipping=None, coupon=None, variants=None):
+    """
+    items --> [{"product_variant_id": 1, "quantity": 2}, ...] \n
+    variants --> result of load_variant_prices, loaded here when not passed \n
+    return priced line items, discount breakdown, shipping and grand total
+    """
+    quantities = {}
+    for item in items:
+        variant_id = item["product_variant_id"]
+        quantities[variant_id] = quantities.get(variant_id, 0) + item["quantity"]
+
+    if variants is None:
+        variants = load_variant_prices(quantities.keys())
+
+    lines = []
+    missing_ids = []
+    items_total = Decimal(0)
+    product_discount_total = Decimal(0)
+    for variant_id, quantity in quantities.items():
+        variant = variants.get(variant_id)
+        if variant is None:
+            missing_ids.append(variant_id)
+            continue
+
+        unit_price = variant["price"]
+        discount = latest_discount(variant["discounts"])
+        discounts = [discount] if discount else []
+        discounted_unit_price = unit_price
+        if discount:
+            discounted_unit_price = _apply_discount(unit_price, discount["discount_type"], discount["amount"])
+
+        line_total = discounted_unit_price * quantity
+        line_discount = (unit_price - discounted_unit_price) * quantity
+        items_total += unit_price * quantity
+        product_discount_total += line_discount
+        lines.append(
+            {
+                "product_variant_id": variant_id,
+                "name": variant["name"],
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "discounted_unit_price": discounted_unit_price,
+                "discounts": discounts,
+                "discount_total": line_discount,
+                "line_total": line_total,
+                "stock_number": variant["stock_number"],
+                "is_available": variant["stock_number"] >= quantity,
+            }
+        )
+
+    sub_total = items_total - product_discount_total
+    coupon_discount = Decimal(0)
+    if coupon is not None:
+        coupon_discount = sub_total - _apply_discount(sub_total, coupon.coupon_type, coupon.amount)
+
+    shipping_cost = shipping.price if shipping else Decimal(0)
+    grand_total = sub_total - coupon_discount + shipping_cost + PACKAGING_COST
+    return {
+        "lines": lines,
+        "missing_ids": missing_ids,
+        "items_total": items_total,
+        "product_discount_total": product_discount_total,
+        "coupon_discount": coupon_discount,
+        "discount_total": product_discount_total + coupon_discount,
+        "shipping_cost": shipping_cost,
+        "packaging_cost": PACKAGING_COST,
+        "grand_total": grand_total,
+    }
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from django.db import connection
+
+from core.utils.gate_way import async_verify_payment, get_async_client
+from order_app.settlement import settle_payments, status_from_verify
+
+logger = logging.getLogger(__name__)
+
+# سفارش هایی که کاربر از درگاه برنگشته و هنوز تسویه نشده اند
+UNSETTLED_STATUSES = ("pending", "processing")
+# well below the 10 minute stock reservation of Order.reserved_stock, an order older than that is
+# already cancelled by release_expired_reservations and is never collected
+MIN_AGE = 150
+
+# latest payment with a track id of every unsettled order in the age window
+COLLECT_SQL = """
+    SELECT DISTINCT ON (o.id) o.id, pg.user_id, pg.track_id, u.mobile_phone
+    FROM orders AS o
+    JOIN payment_gateway AS pg ON pg.order_id = o.id
+    JOIN auth_user AS u ON u.id = pg.user_id
+    WHERE o.status = ANY(%(statuses)s)
+        AND o.is_deleted IS NOT TRUE
+        AND o.created_at < now() - make_interval(secs => %(min_age)s)
+        AND o.created_at > now() - make_interval(secs => %(max_age)s)
+        AND pg.track_id IS NOT NULL
+        AND pg.is_deleted IS NOT TRUE
+    ORDER BY o.id, pg.id DESC
+    LIMIT %(limit)s
+"""
+
+
+def collect_unsettled(limit, min_age, max_age):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            COLLECT_SQL,
+            {
+                "statuses": list(UNSETTLED_STATUSES),
+                "min_age": min_age,
+                "max_age": max_age,
+                "limit": limit,
+            },
+        )
+        return [
+            {"order_id": order_id, "user_id": user_id, "track_id": track_id, "mobile_phone": mobile_phone}
+            for order_id, user_id, track_id, mobile_phone in cursor.fetchall()
+        ]
+
+
+async def _verify_all(payments, concurrency):
+    """
+    verify every payment on the pooled async client, at most `concurrency` requests in flight \n
+    a failed verify is stored as None and the order is picked up again on the next run
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def verify(payment):
+        async with semaphore:
+            try:
+                return await async_verify_payment(int(payment["track_id"]))
+            except Exception as e:
+                logger.warning("verify of track id %s failed: %s", payment["track_id"], e)
+                return None
+
+    try:
+        return await asyncio.gather(*(verify(payment) for payment in payments))
+    finally:
+        await get_async_client().aclose()
+
+
+def reconcile_payments(limit=500, concurrency=10, min_age=MIN_AGE, max_age=60 * 60 * 24):
+    """
+    verify unsettled orders whose user never came back from the gateway and settle them
+    with one statement per status \n
+    min_age leaves time for the normal callback and must stay below the reservation window,
+    max_age skips orders that are long gone \n
+    return throughput and the outcome of every verify
+    """
+    started = time.perf_counter()
+    payments = collect_unsettled(limit, min_age, max_age)
+
+    results = asyncio.run(_verify_all(payments, concurrency)) if payments else []
+    verify_elapsed = time.perf_counter() - started
+
+    outcomes = Counter()
+    by_status = {}
+    for payment, result in zip(payments, results):
+        if result is None:
+            outcomes["error"] += 1
+            continue
+        status = status_from_verify(result)
+        if status is None:
+            # rate limit, card or switch errors, try again on the next run
+            outcomes["gateway_error"] += 1
+            continue
+        outcomes[status] += 1
+        by_status.setdefault(status, []).append({**payment, "result": result})
+
+    settled = Counter()
+    events = 0
+    for status, batch in by_status.items():
+        for settlement in settle_payments(status, batch):
+            if settlement.is_settled:
+                settled[status] += 1
+            events += settlement.has_event
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "collected": len(payments),
+        "outcomes": dict(outcomes),
+        "settled": dict(settled),
+        "events": events,
+        "verify_seconds": round(verify_elapsed, 3),
+        "seconds": round(elapsed, 3),
+        "verify_per_second": round(len(payments) / verify_elapsed, 2) if payments and verify_elapsed else 0,
+    }
+    logger.info("payment reconciliation: %s", stats)
+    return stats
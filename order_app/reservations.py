@@ -0,0 +1,107 @@
+from django.db import connection, transaction
+
+from product_app.stock import group_quantities
+
+# سفارش هایی که رزرو انها بعد از انقضا آزاد میشود
+RELEASABLE_STATUSES = ("pending", "processing", "fail_by_user")
+
+RELEASE_EXPIRED_SQL = """
+    WITH expired AS (
+        SELECT r.id, o.status = ANY(%(releasable)s) AS releasable
+        FROM stock_reservation AS r
+        JOIN orders AS o ON o.id = r.order_id
+        WHERE r.status = 'reserved' AND r.expires_at < now()
+        ORDER BY r.expires_at
+        LIMIT %(chunk_size)s
+        FOR UPDATE OF r, o SKIP LOCKED
+    ), marked AS (
+        UPDATE stock_reservation AS r
+        SET status = CASE WHEN e.releasable THEN 'released' ELSE 'committed' END,
+            released_at = now()
+        FROM expired AS e
+        WHERE r.id = e.id AND r.status = 'reserved'
+        RETURNING r.order_id, r.product_variant_id, r.quantity, e.releasable
+    ), restocked AS (
+        UPDATE product_variant AS pv
+        SET stock_number = pv.stock_number + s.qty, updated_at = now()
+        FROM (
+            SELECT product_variant_id, sum(quantity) AS qty
+            FROM marked
+            WHERE releasable
+            GROUP BY product_variant_id
+        ) AS s
+        WHERE pv.id = s.product_variant_id
+        RETURNING pv.id
+    ), cancelled AS (
+        UPDATE orders AS o
+        SET status = 'cancelled', is_reserved = false, reserved_until = NULL, updated_at = now()
+        WHERE o.id IN (SELECT order_id FROM marked WHERE releasable)
+            AND o.status = ANY(%(releasable)s)
+        RETURNING o.id
+    )
+    SELECT
+        (SELECT count(*) FROM marked),
+        (SELECT count(*) FROM restocked),
+        (SELECT count(*) FROM cancelled)
+"""
+
+RELEASE_ORDER_SQL = """
+    WITH marked AS (
+        UPDATE stock_reservation
+        SET status = 'released', released_at = now()
+        WHERE order_id = %s AND status = 'reserved'
+        RETURNING product_variant_id, quantity
+    )
+    UPDATE product_variant AS pv
+    SET stock_number = pv.stock_number + s.qty, updated_at = now()
+    FROM (
+        SELECT product_variant_id, sum(quantity) AS qty
+        FROM marked
+        GROUP BY product_variant_id
+    ) AS s
+    WHERE pv.id = s.product_variant_id
+"""
+
+
+def create_reservations(order_id, lines, expires_at):
+    from order_app.models import StockReservation
+
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(
+                order_id=order_id,
+                product_variant_id=variant_id,
+                quantity=quantity,
+                expires_at=expires_at,
+            )
+            for variant_id, quantity in group_quantities(lines).items()
+        ]
+    )
+
+
+def release_order_reservations(order_id):
+    """
+    give back the open reservations of one order, a second call is a no-op
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(RELEASE_ORDER_SQL, (order_id,))
+        return cursor.rowcount
+
+
+def release_expired(chunk_size=1000):
+    """
+    release expired reservations chunk by chunk, one statement per chunk \n
+    reservations of orders that are no longer releasable (paid, ...) are marked committed
+    """
+    totals = {"reservations": 0, "variants": 0, "orders": 0}
+    params = {"releasable": list(RELEASABLE_STATUSES), "chunk_size": chunk_size}
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(RELEASE_EXPIRED_SQL, params)
+            reservations, variants, orders = cursor.fetchone()
+
+        totals["reservations"] += reservations
+        totals["variants"] += variants
+        totals["orders"] += orders
+        if reservations < chunk_size:
+            return totals
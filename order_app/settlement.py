@@ -0,0 +1,222 @@
+import json
+
+from django.db import connection, transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+from order_app.events import schedule_dispatch
+
+# وضعیت سفارش بعد از پاسخ verify و وضعیت هایی که اجازه تغییر دارند
+PAID = "paid"
+NEEDS_REFUND = "needs_refund"
+TRANSITIONS = {
+    "paid": ("pending", "processing", "fail", "fail_by_user", "paid", "cancelled", NEEDS_REFUND),
+    "processing": ("pending", "processing"),
+    "fail": ("pending", "processing", "fail"),
+    "fail_by_user": ("pending", "processing", "fail_by_user"),
+}
+# پرداخت سفارشی که رزروش منقضی و لغو شده --> needs_refund، موجودی آن آزاد شده است
+REFUND_STATUSES = ("cancelled", NEEDS_REFUND)
+
+# one statement for any number of orders of the same status: find the payment of each order,
+# move the orders, write the verify record of every payment found, commit the stock reservations
+# of paid orders and write the outbox events, return one row per input order with the tracking
+# code, the status before and after the update (null tracking code --> not settled) and the
+# current status of the order (null --> no such order for the user)
+SETTLE_SQL = """
+    WITH input AS (
+        SELECT *
+        FROM unnest(
+            %(order_ids)s::bigint[],
+            %(user_ids)s::bigint[],
+            %(track_ids)s::bigint[],
+            %(results)s::jsonb[],
+            %(mobile_phones)s::text[]
+        ) AS i (order_id, user_id, track_id, result, mobile_phone)
+    ), payment AS (
+        SELECT DISTINCT ON (i.order_id) i.order_id, pg.id
+        FROM input AS i
+        JOIN payment_gateway AS pg ON pg.track_id = i.track_id AND pg.user_id = i.user_id
+        WHERE pg.is_deleted IS NOT TRUE
+        ORDER BY i.order_id, pg.id DESC
+    ), target AS (
+        SELECT o.id, o.status, i.user_id, i.result, i.mobile_phone,
+               CASE WHEN %(paid)s AND o.status = ANY(%(refund_statuses)s)
+                    THEN %(needs_refund)s ELSE %(status)s END AS new_status
+        FROM orders AS o
+        JOIN input AS i ON i.order_id = o.id
+        JOIN auth_profile AS p ON p.id = o.profile_id AND p.user_id = i.user_id
+        WHERE o.status = ANY(%(from_statuses)s)
+            AND (NOT %(require_payment)s OR EXISTS (SELECT 1 FROM payment WHERE payment.order_id = o.id))
+        ORDER BY o.id
+        FOR UPDATE OF o
+    ), settled AS (
+        UPDATE orders AS o
+        SET status = t.new_status,
+            is_complete = o.is_complete OR t.new_status = %(paid_status)s,
+            payment_date = CASE WHEN %(paid)s THEN coalesce(o.payment_date, now()) ELSE o.payment_date END,
+            updated_at = now()
+        FROM target AS t
+        WHERE o.id = t.id
+        RETURNING o.id, o.tracking_code, o.status, t.status AS previous_status, t.user_id, t.mobile_phone
+    ), verified AS (
+        -- the gateway answer is kept even when the order can not move
+        INSERT INTO result_payment_gateway (payment_gateway_id, result, created_at, updated_at)
+        SELECT payment.id, i.result, now(), now()
+        FROM input AS i
+        JOIN payment ON payment.order_id = i.order_id
+        RETURNING id
+    ), committed AS (
+        UPDATE stock_reservation AS r
+        SET status = 'committed', released_at = now()
+        FROM settled AS s
+        WHERE s.status = %(paid_status)s AND r.order_id = s.id AND r.status = 'reserved'
+        RETURNING r.id
+    ), events AS (
+        INSERT INTO order_event (order_id, event_type, payload, created_at)
+        SELECT s.id, CASE WHEN s.status = %(needs_refund)s THEN s.status ELSE %(event_type)s::varchar END,
+               jsonb_build_object(
+                   'user_id', s.user_id,
+                   'mobile_phone', s.mobile_phone,
+                   'tracking_code', s.tracking_code
+               ),
+               now()
+        FROM settled AS s
+        WHERE (%(event_type)s::text IS NOT NULL OR s.status = %(needs_refund)s)
+            AND s.previous_status <> s.status
+        RETURNING order_id
+    )
+    SELECT
+        i.order_id,
+        payment.id,
+        s.tracking_code,
+        s.previous_status,
+        EXISTS (SELECT 1 FROM events AS e WHERE e.order_id = i.order_id),
+        s.status,
+        o.status
+    FROM input AS i
+    LEFT JOIN payment ON payment.order_id = i.order_id
+    LEFT JOIN settled AS s ON s.id = i.order_id
+    LEFT JOIN (
+        orders AS o JOIN auth_profile AS p ON p.id = o.profile_id
+    ) ON o.id = i.order_id AND p.user_id = i.user_id
+    ORDER BY i.order_id
+"""
+
+# پاسخ verify زیبال --> وضعیت سفارش
+def status_from_verify(verify_req):
+    """
+    status 1 or result 201 (already verified) --> paid, -1 --> processing, -2 --> fail,
+    3 or result 202 --> fail_by_user, anything else --> None
+    """
+    status = verify_req.get("status")
+    result = verify_req.get("result")
+    if status == 1 or result == 201:
+        return PAID
+    if status == -1:
+        return "processing"
+    if status == -2:
+        return "fail"
+    if status == 3 or result == 202:
+        return "fail_by_user"
+    return None
+
+
+# وضعیت هایی که رویداد outbox دارند
+EVENT_TYPES = {
+    PAID: "paid",
+    "fail_by_user": "fail_by_user",
+}
+
+
+class Settlement:
+    def __init__(self, row, status):
+        (
+            self.order_id,
+            self.payment_id,
+            self.tracking_code,
+            self.previous_status,
+            self.has_event,
+            settled_status,
+            self.order_status,
+        ) = row
+        # a paid verify on a cancelled order settles as needs_refund
+        self.status = settled_status or status
+
+    @property
+    def is_settled(self):
+        return self.tracking_code is not None
+
+    @property
+    def is_new(self):
+        """
+        the order moved into the status now, not on an earlier verify of the same payment
+        """
+        return self.is_settled and self.previous_status != self.status
+
+    @property
+    def needs_refund(self):
+        return self.is_settled and self.status == NEEDS_REFUND
+
+    @property
+    def is_refused(self):
+        """
+        the order exists but its status does not allow the move
+        """
+        return not self.is_settled and self.order_status is not None
+
+
+def settle_payments(status, payments):
+    """
+    apply the verify results of many orders with the same status in one transaction and one query \n
+    status --> paid, processing, fail, fail_by_user \n
+    payments --> [{"order_id", "user_id", "track_id", "result", "mobile_phone"}, ...], one per order \n
+    paid requires the payment of track_id, a paid order that was cancelled moves to needs_refund,
+    the verify record is written whenever the payment is found, notifications go through the
+    order_event outbox only for orders that moved into the status now \n
+    return a Settlement per order
+    """
+    if not payments:
+        return []
+
+    paid = status == PAID
+    params = {
+        "order_ids": [int(payment["order_id"]) for payment in payments],
+        "user_ids": [payment["user_id"] for payment in payments],
+        "track_ids": [int(payment["track_id"]) for payment in payments],
+        "results": [json.dumps(payment["result"], cls=JSONEncoder) for payment in payments],
+        "mobile_phones": [payment.get("mobile_phone") for payment in payments],
+        "status": status,
+        "from_statuses": list(TRANSITIONS[status]),
+        "paid": paid,
+        "paid_status": PAID,
+        "needs_refund": NEEDS_REFUND,
+        "refund_statuses": list(REFUND_STATUSES),
+        "require_payment": paid,
+        "event_type": EVENT_TYPES.get(status),
+    }
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(SETTLE_SQL, params)
+            settlements = [Settlement(row, status) for row in cursor.fetchall()]
+
+        if any(settlement.has_event for settlement in settlements):
+            schedule_dispatch()
+    return settlements
+
+
+def settle_payment(order_id, user_id, track_id, status, result, mobile_phone=None):
+    """
+    settle_payments for one order
+    """
+    return settle_payments(
+        status,
+        [
+            {
+                "order_id": order_id,
+                "user_id": user_id,
+                "track_id": track_id,
+                "result": result,
+                "mobile_phone": mobile_phone,
+            }
+        ],
+    )[0]
@@ -1,13 +1,17 @@
-from django.db.models import F
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from order_app.models import Order
-
-
-@receiver(post_save, sender=Order)
-def update_product_sales(sender, instance, created, **kwargs):
-    if instance.is_complete:
-        items = instance.order_items.filter(is_active=True)
-        for item in items:
-            item.product_variant.product.total_sale = F('total_sale') + item.quantity
-            item.product_variant.product.save(update_fields=['total_sale'])
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch.dispatcher import receiver
+
+from discount_app.models import ProductDiscount
+from product_app.models import ProductVariant
+from .pricing import invalidate_variant_prices
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def clear_cache_variant_price(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_variant_prices([instance.id]))
+
+
+@receiver([post_save, post_delete], sender=ProductDiscount)
+def clear_cache_variant_discount(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_variant_prices([instance.product_variant_id]))
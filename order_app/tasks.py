@@ -1,8 +1,6 @@
-import asyncio
-from django.utils import timezone
 from celery import shared_task
 from account_app.models import User, PrivateNotification
-from core.utils.sms import send_verify_payment
+from core.utils.sms import send_verify_payment, cancel_verify_payment
 
 
 @shared_task(queue="notifications")
@@ -27,7 +25,8 @@ def create_gateway_payment(order_id, json_data, user_id):
     PaymentGateWay.objects.create(
         order_id=order_id,
         user_id=user_id,
-        payment_gateway=json_data
+        payment_gateway=json_data,
+        track_id=json_data.get("trackId"),
     )
 
 
@@ -44,24 +43,60 @@ def send_notification_to_user_after_complete_order(mobile_phone):
 
 @shared_task(queue="payment")
 def send_sms_after_complete_order(mobile_phone, tracking_code):
-    asyncio.run(send_verify_payment(mobile_phone, tracking_code))
+    send_verify_payment(mobile_phone, tracking_code)
+
+
+@shared_task(queue="payment")
+def send_sms_after_cancel_order(mobile_phone, tracking_code):
+    cancel_verify_payment(mobile_phone, tracking_code)
 
 
 @shared_task(queue='update_order')
-def release_expired_reservations():
-    from order_app.models import Order
+def release_expired_reservations(chunk_size=1000):
+    from order_app.reservations import release_expired
 
-    expired_orders = Order.objects.filter(
-        is_reserved=True,
-        reserved_until__lt=timezone.now(),
-        status__in=['pending', 'processing', 'fail_by_user']
-    )
-    order_updates = []
-    for order in expired_orders:
-        order.release_stock(save=False)
-        order.status = 'cancelled'
-        order.is_reserved = False
-        order.reserved_until = None
-        order_updates.append(order)
-
-    Order.objects.bulk_update(order_updates, ['status', 'is_reserved', 'reserved_until'])
+    return release_expired(chunk_size=chunk_size)
+
+
+@shared_task(queue="notifications")
+def dispatch_order_events(batch_size=100):
+    from order_app.events import dispatch_events
+
+    return dispatch_events(batch_size=batch_size)
+
+
+@shared_task(queue="payment")
+def reconcile_pending_payments(limit=500, concurrency=10, min_age=None, max_age=60 * 60 * 24):
+    """
+    verify pending and processing orders whose callback never arrived, schedule it in beat
+    every minute so an order is checked a few times before its reservation expires
+    """
+    from django.core.cache import cache
+
+    from order_app.reconciliation import MIN_AGE, reconcile_payments
+
+    if min_age is None:
+        min_age = MIN_AGE
+
+    # فقط یک worker همزمان پرداخت ها را بررسی کند
+    if not cache.add("payment:reconcile:lock", 1, timeout=600):
+        return None
+
+    try:
+        return reconcile_payments(limit=limit, concurrency=concurrency, min_age=min_age, max_age=max_age)
+    finally:
+        cache.delete("payment:reconcile:lock")
+
+
+@shared_task(queue="update_order")
+def create_order_partitions(months_ahead=3):
+    """
+    keep monthly partitions ahead of time, schedule it daily in beat
+    """
+    from order_app.partitions import PARTITIONED_TABLES, create_partitions, is_partitioned
+
+    return {
+        table: create_partitions(table, months_ahead=months_ahead)
+        for table in PARTITIONED_TABLES
+        if is_partitioned(table)
+    }
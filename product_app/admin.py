@@ -208,6 +208,7 @@ class ProductVariantAdmin(CoreAdminMixin):
         "price",
         "stock_number",
         "in_person_purchase",
+        "hot_stock",
         "is_active",
         "created_at",
         "updated_at",
@@ -215,7 +216,7 @@ class ProductVariantAdmin(CoreAdminMixin):
     list_editable = ("is_active", "price", "stock_number", "in_person_purchase")
     search_fields = ("name", "id")
     search_help_text = _("برای جست و جو میتوانید از نام ورینت استفاده کنید")
-    list_filter = ("is_active", "created_at", "updated_at")
+    list_filter = ("is_active", "hot_stock", "created_at", "updated_at")
     list_select_related = ("product",)
     list_display_links = ("id", "name", "product_name")
     actions = (
@@ -238,7 +239,7 @@ class ProductVariantAdmin(CoreAdminMixin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if "changelist" in request.resolver_match.url_name:
-            fields = ("product__product_name", "price", "stock_number", "in_person_purchase", "is_active", "created_at", "updated_at", "name")
+            fields = ("product__product_name", "price", "stock_number", "in_person_purchase", "hot_stock", "is_active", "created_at", "updated_at", "name")
             return qs.only(*fields)
         return qs
 
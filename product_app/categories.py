@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from product_app.models import Category, Product
+
+TREE_VERSION_KEY = "category_tree:version"
+TREE_KEY = "category_tree:{version}"
+TREE_TIMEOUT = 60 * 60 * 24
+
+
+def in_category_subtree(queryset, category_id, lookup="category"):
+    """
+    rows of the category and of every descendant, treebeard keeps the path of a descendant
+    prefixed with the path of its ancestors \n
+    the path is read first so the join uses a constant `path LIKE 'prefix%'`, django created
+    a varchar_pattern_ops index (category_path_..._like) next to the unique index of path
+    """
+    path = Category.objects.filter(pk=category_id).values_list("path", flat=True).first()
+    if path is None:
+        return queryset.none()
+    return queryset.filter(**{f"{lookup}__path__startswith": path})
+
+
+def build_category_tree():
+    """
+    nested tree of the active categories, built from one path ordered query and one grouped
+    count of active, not deleted products \n
+    product_count --> products of the category itself, total_product_count --> with subtree \n
+    a category under an inactive parent is left out with its parent
+    """
+    categories = Category.objects.filter(
+        is_active=True
+    ).select_related("category_image").only(
+        "id",
+        "path",
+        "depth",
+        "category_name",
+        "category_slug",
+        "category_image__image",
+        "category_image__wp_image_url",
+    ).order_by("path")
+    counts = dict(
+        Product.objects.filter(
+            is_active=True,
+            category__isnull=False
+        ).exclude(is_deleted=True).order_by().values_list("category_id").annotate(total=Count("id"))
+    )
+
+    # a parent path comes before its children in path order, one pass links every node
+    steplen = Category.steplen
+    nodes, roots = {}, []
+    for category in categories:
+        node = {
+            "id": category.id,
+            "category_name": category.category_name,
+            "category_slug": category.category_slug,
+            "category_url": category.get_category_image_url,
+            "depth": category.depth,
+            "product_count": counts.get(category.id, 0),
+            "total_product_count": counts.get(category.id, 0),
+            "children": [],
+        }
+        if category.depth == 1:
+            roots.append(node)
+        else:
+            parent = nodes.get(category.path[:-steplen])
+            if parent is None:
+                continue
+            parent["children"].append(node)
+        nodes[category.path] = node
+
+    # children come after their parent, walking backwards adds every subtree to its parent once
+    for path in reversed(list(nodes)):
+        parent = nodes.get(path[:-steplen])
+        if parent is not None:
+            parent["total_product_count"] += nodes[path]["total_product_count"]
+    return roots
+
+
+def bump_tree_version():
+    cache.add(TREE_VERSION_KEY, 0, timeout=None)
+    cache.incr(TREE_VERSION_KEY)
+
+
+def bump_tree_on_commit():
+    """
+    bump after commit, a tree built before the commit is never cached under the new version
+    """
+    transaction.on_commit(bump_tree_version)
+
+
+def cached_category_tree():
+    version = cache.get(TREE_VERSION_KEY) or 0
+    key = TREE_KEY.format(version=version)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(key, tree, TREE_TIMEOUT)
+    return tree
@@ -0,0 +1,120 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# مرز بازه های قیمت (بعد از تخفیف) به تومان
+PRICE_BUCKETS = (0, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000)
+FACETS_TIMEOUT = 60 * 5
+VERSION_KEY = "facets:version"
+FACET_LISTS = {"brand": "brands", "category": "categories", "tag": "tags"}
+
+# every facet from one materialized pass over the filtered listing rows, GROUPING(brand,
+# category, bucket) tells the grouping sets apart: 3 brand, 5 category, 6 price bucket, 7 total
+FACETS_SQL = """
+    WITH filtered AS MATERIALIZED (
+        SELECT f.product_id, f.brand_id, f.category_id, width_bucket(f.effective_price, %s::numeric[]) AS bucket
+        FROM ({listing}) AS f
+    ), grouped AS (
+        SELECT brand_id, category_id, bucket, GROUPING(brand_id, category_id, bucket) AS set_id, count(*) AS total
+        FROM filtered
+        GROUP BY GROUPING SETS ((brand_id), (category_id), (bucket), ())
+    )
+    SELECT 'brand', g.brand_id, b.brand_name, g.total
+    FROM grouped AS g
+    JOIN product_brand AS b ON b.id = g.brand_id
+    WHERE g.set_id = 3
+    UNION ALL
+    SELECT 'category', g.category_id, c.category_name, g.total
+    FROM grouped AS g
+    JOIN category AS c ON c.id = g.category_id
+    WHERE g.set_id = 5
+    UNION ALL
+    SELECT 'price', g.bucket, NULL, g.total
+    FROM grouped AS g
+    WHERE g.set_id = 6
+    UNION ALL
+    SELECT 'total', NULL, NULL, g.total
+    FROM grouped AS g
+    WHERE g.set_id = 7
+    UNION ALL
+    SELECT 'tag', t.id, t.tag_name, count(*)
+    FROM filtered AS f
+    JOIN product_tags AS pt ON pt.product_id = f.product_id
+    JOIN tag AS t ON t.id = pt.tag_id
+    WHERE t.is_active AND t.is_deleted IS NOT TRUE
+    GROUP BY t.id, t.tag_name
+"""
+
+
+def price_buckets():
+    return tuple(getattr(settings, "PRODUCT_FACET_PRICE_BUCKETS", PRICE_BUCKETS))
+
+
+def compute_facets(queryset):
+    """
+    queryset --> filtered ProductListing queryset \n
+    return number of variants per brand, category, tag and price bucket in one query
+    """
+    buckets = price_buckets()
+    listing, params = queryset.order_by().values(
+        "product_id", "brand_id", "category_id", "effective_price"
+    ).query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(FACETS_SQL.format(listing=listing), [list(buckets), *params])
+        rows = cursor.fetchall()
+
+    facets = {"total": 0, "brands": [], "categories": [], "tags": [], "prices": []}
+    for facet, key, name, total in rows:
+        if facet == "total":
+            facets["total"] = total
+        elif facet == "price":
+            # width_bucket --> 0 below the first bound, len(buckets) above the last one
+            facets["prices"].append({
+                "min_price": buckets[key - 1] if key > 0 else None,
+                "max_price": buckets[key] if key < len(buckets) else None,
+                "count": total,
+            })
+        else:
+            facets[FACET_LISTS[facet]].append({"id": key, "name": name, "count": total})
+
+    for facet in FACET_LISTS.values():
+        facets[facet].sort(key=lambda item: (-item["count"], item["id"]))
+    facets["prices"].sort(key=lambda item: -1 if item["min_price"] is None else item["min_price"])
+    return facets
+
+
+def filter_signature(params):
+    """
+    same filters --> same key, whatever the order or spelling of the query string
+    """
+    normalized = sorted((name, value) for name, value in params.items() if value not in (None, ""))
+    return hashlib.sha1(json.dumps(normalized, default=str, ensure_ascii=False).encode()).hexdigest()
+
+
+def bump_version():
+    # cached facets of every filter are dropped at once when the listing changes
+    cache.add(VERSION_KEY, 0, timeout=None)
+    cache.incr(VERSION_KEY)
+
+
+def bump_version_on_commit():
+    """
+    tags are read by the facets query but are not in the listing, their changes bump after commit
+    """
+    transaction.on_commit(bump_version)
+
+
+def cached_facets(signature, queryset):
+    version = cache.get(VERSION_KEY) or 0
+    key = f"facets:{version}:{signature}"
+    cached = cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    facets = compute_facets(queryset)
+    cache.set(key, json.dumps(facets), FACETS_TIMEOUT)
+    return facets
@@ -0,0 +1,246 @@
+from django.db import connection, transaction
+from django.db.models import Q
+
+# ستون های جدول product_listing به جز refreshed_at
+COLUMNS = (
+    "variant_id",
+    "product_id",
+    "category_id",
+    "brand_id",
+    "product_name",
+    "product_slug",
+    "description_slug",
+    "brand_name",
+    "variant_name",
+    "sku",
+    "in_person_purchase",
+    "price",
+    "effective_price",
+    "discount_type",
+    "discount_amount",
+    "discount_end",
+    "stock_number",
+    "image_name",
+    "image_url",
+    "image_alt",
+    "image_order",
+    "image_updated_at",
+    "created_at",
+    "updated_at",
+)
+
+# one row per active variant with its latest valid discount and the first active image of
+# its product, same rules as the v2 home page queryset
+SOURCE_SQL = """
+    SELECT
+        pv.id AS variant_id,
+        p.id AS product_id,
+        p.category_id,
+        p.product_brand_id AS brand_id,
+        p.product_name,
+        p.product_slug,
+        p.description_slug,
+        b.brand_name,
+        pv.name AS variant_name,
+        pv.sku,
+        pv.in_person_purchase,
+        pv.price,
+        CASE
+            WHEN d.amount IS NULL THEN pv.price
+            WHEN d.discount_type = 'percent' THEN greatest(pv.price - pv.price * d.amount / 100, 0)
+            ELSE greatest(pv.price - d.amount, 0)
+        END AS effective_price,
+        d.discount_type,
+        d.raw_amount AS discount_amount,
+        d.end_date AS discount_end,
+        pv.stock_number,
+        nullif(img.image, '') AS image_name,
+        img.wp_image_url AS image_url,
+        img.alt_text_image AS image_alt,
+        img."order" AS image_order,
+        img.updated_at AS image_updated_at,
+        pv.created_at,
+        pv.updated_at
+    FROM product_variant AS pv
+    JOIN product AS p ON p.id = pv.product_id
+    LEFT JOIN product_brand AS b ON b.id = p.product_brand_id
+    LEFT JOIN LATERAL (
+        SELECT pd.discount_type, pd.amount AS raw_amount, pd.end_date,
+               CASE WHEN pd.amount ~ '^[0-9]+(\\.[0-9]+)?$' THEN pd.amount::numeric END AS amount
+        FROM product_discount AS pd
+        WHERE pd.product_variant_id = pv.id
+            AND pd.is_active AND pd.start_date <= now() AND pd.end_date >= now()
+        ORDER BY pd.id DESC
+        LIMIT 1
+    ) AS d ON true
+    LEFT JOIN LATERAL (
+        SELECT ci.image, ci.wp_image_url, pi.alt_text_image, pi."order", pi.updated_at
+        FROM product_image AS pi
+        JOIN core_app_image AS ci ON ci.id = pi.image_id
+        WHERE pi.product_id = p.id AND pi.is_active AND pi.is_deleted IS NOT TRUE
+        ORDER BY pi."order", pi.id
+        LIMIT 1
+    ) AS img ON true
+    WHERE pv.is_active AND pv.is_deleted IS NOT TRUE
+"""
+
+# upsert the rows in scope, rows that did not change are not rewritten, rows in scope that
+# are no longer in the source are deleted
+REFRESH_SQL = """
+    WITH source AS (
+        {source} {scope}
+    ), upserted AS (
+        INSERT INTO product_listing ({columns}, refreshed_at)
+        SELECT {columns}, now() FROM source
+        ON CONFLICT (variant_id) DO UPDATE
+        SET {updates}, refreshed_at = now()
+        WHERE ({current}) IS DISTINCT FROM ({excluded})
+        RETURNING variant_id
+    ), removed AS (
+        DELETE FROM product_listing AS l
+        WHERE {listing_scope}
+            NOT EXISTS (SELECT 1 FROM source AS s WHERE s.variant_id = l.variant_id)
+        RETURNING variant_id
+    )
+    SELECT (SELECT count(*) FROM upserted), (SELECT count(*) FROM removed)
+"""
+
+SCOPES = (
+    # (argument, source column, listing column)
+    ("variant_ids", "pv.id", "l.variant_id"),
+    ("product_ids", "p.id", "l.product_id"),
+    ("brand_ids", "p.product_brand_id", "l.brand_id"),
+)
+
+
+def refresh_listing(variant_ids=None, product_ids=None, brand_ids=None):
+    """
+    rebuild the listing rows of the given variants, products or brands in one statement,
+    every row when nothing is given \n
+    return (upserted, removed)
+    """
+    given = {"variant_ids": variant_ids, "product_ids": product_ids, "brand_ids": brand_ids}
+    source_filters, listing_filters, params = [], [], []
+    for argument, source_column, listing_column in SCOPES:
+        ids = given[argument]
+        if ids is None:
+            continue
+        source_filters.append(f"{source_column} = ANY(%s)")
+        listing_filters.append(f"{listing_column} = ANY(%s)")
+        params.append([int(pk) for pk in ids if pk is not None])
+
+    scope, listing_scope = "", ""
+    if source_filters:
+        scope = f"AND ({' OR '.join(source_filters)})"
+        listing_scope = f"({' OR '.join(listing_filters)}) AND"
+
+    sql = REFRESH_SQL.format(
+        source=SOURCE_SQL,
+        scope=scope,
+        listing_scope=listing_scope,
+        columns=", ".join(COLUMNS),
+        updates=", ".join(f"{column} = EXCLUDED.{column}" for column in COLUMNS[1:]),
+        current=", ".join(f"product_listing.{column}" for column in COLUMNS[1:]),
+        excluded=", ".join(f"EXCLUDED.{column}" for column in COLUMNS[1:]),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + params)
+        upserted, removed = cursor.fetchone()
+
+    if upserted or removed:
+        from product_app.facets import bump_version
+
+        bump_version()
+    return upserted, removed
+
+
+# min and max price, cheapest price after discount and discount flag of every product in scope,
+# read from the listing source so both agree on active variants and the valid discount
+PRICE_BOUNDS_SQL = """
+    WITH source AS (
+        {source} {scope}
+    ), bounds AS (
+        SELECT
+            p.id,
+            min(s.price) AS min_price,
+            max(s.price) AS max_price,
+            min(s.effective_price) AS min_effective_price,
+            coalesce(bool_or(s.discount_end IS NOT NULL), false) AS has_active_discount
+        FROM product AS p
+        LEFT JOIN source AS s ON s.product_id = p.id
+        {product_scope}
+        GROUP BY p.id
+    )
+    UPDATE product AS p
+    SET min_price = b.min_price,
+        max_price = b.max_price,
+        min_effective_price = b.min_effective_price,
+        has_active_discount = b.has_active_discount
+    FROM bounds AS b
+    WHERE p.id = b.id
+        AND (p.min_price, p.max_price, p.min_effective_price, p.has_active_discount)
+            IS DISTINCT FROM (b.min_price, b.max_price, b.min_effective_price, b.has_active_discount)
+"""
+
+
+def refresh_price_bounds(product_ids=None, variant_ids=None):
+    """
+    rebuild min_price, max_price, min_effective_price and has_active_discount of the given
+    products (or the products of the given variants), every product when nothing is given \n
+    return number of updated products
+    """
+    scope, product_scope, params = "", "", []
+    if product_ids is not None or variant_ids is not None:
+        if product_ids is not None:
+            products = "SELECT unnest(%s::bigint[])"
+            params = [[int(pk) for pk in product_ids if pk is not None]]
+        else:
+            products = "SELECT product_id FROM product_variant WHERE id = ANY(%s)"
+            params = [[int(pk) for pk in variant_ids if pk is not None]]
+        scope = f"AND p.id IN ({products})"
+        product_scope = f"WHERE p.id IN ({products})"
+
+    sql = PRICE_BOUNDS_SQL.format(source=SOURCE_SQL, scope=scope, product_scope=product_scope)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + params)
+        return cursor.rowcount
+
+
+def refresh_discount_windows(since, until):
+    """
+    refresh listing rows and price bounds of variants whose discount started or ended in
+    (since, until], return their ids
+    """
+    from discount_app.models import ProductDiscount
+
+    variant_ids = list(
+        ProductDiscount.objects.filter(
+            Q(start_date__gt=since, start_date__lte=until) | Q(end_date__gte=since, end_date__lt=until)
+        ).values_list("product_variant_id", flat=True).distinct()
+    )
+    if variant_ids:
+        with transaction.atomic():
+            refresh_listing(variant_ids=variant_ids)
+            refresh_price_bounds(variant_ids=variant_ids)
+    return variant_ids
+
+
+def refresh_on_commit(**scope):
+    """
+    refresh after the change is committed, the listing never sees rolled back data
+    """
+    transaction.on_commit(lambda: refresh_listing(**scope))
+
+
+def refresh_bounds_on_commit(**scope):
+    transaction.on_commit(lambda: refresh_price_bounds(**scope))
+
+
+def rebuild_listing():
+    """
+    empty the table and fill it again in one transaction, readers see the old rows until commit
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM product_listing")
+        return refresh_listing()
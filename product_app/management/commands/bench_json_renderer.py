@@ -0,0 +1,87 @@
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.renderers import JSONRenderer
+
+from apis.v1.product_app.serializers import serialize_seo_product
+from apis.v1.product_app.views import SeoProductViewSet
+from apis.v1.third_party_app.serializers import serialize_torob
+from apis.v1.third_party_app.views import TorobProductView
+from apis.v2.product.serializers import serialize_listing
+from apis.v2.product.views import ProductListHomePageView
+from core.utils.renderers import FastJSONRenderer, orjson
+
+
+def edge_cases():
+    # values the drf encoder converts, the output has to stay byte for byte the same
+    now = timezone.now()
+    return [
+        {
+            "decimal": Decimal("1250000.500"),
+            "datetime": now,
+            "naive": now.replace(tzinfo=None),
+            "date": now.date(),
+            "time": now.time(),
+            "duration": timedelta(days=1, seconds=5),
+            "uuid": uuid.uuid4(),
+            "lazy": _("خرید به صورت حضوری"),
+            "persian": "گوشی «سامسونگ»     \"quoted\" \\ \n\t",
+            "int_keys": {1: "a", 2: "b"},
+            "tuple": (1, 2, 3),
+            "set": {1},
+            "nested": [None, True, False, 0, -1, 2 ** 62, "", []],
+        }
+    ]
+
+
+class Command(BaseCommand):
+    help = "check FastJSONRenderer writes the same bytes as JSONRenderer and compare their throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100, help="rows per payload, torob pages have 100")
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def payloads(self, rows):
+        listing = ProductListHomePageView().get_queryset().order_by("-variant_id")[:rows]
+        torob = TorobProductView().get_queryset().order_by("id")[:rows]
+        seo = SeoProductViewSet().get_queryset()[:rows]
+        return {
+            "edge cases": edge_cases(),
+            "v2 listing": {"count": rows, "next": None, "previous": None,
+                           "results": [serialize_listing(row) for row in listing]},
+            "torob": {"api_version": "torob_api_v3", "products": [serialize_torob(row) for row in torob]},
+            "seo product": [serialize_seo_product(row) for row in seo],
+        }
+
+    def rate(self, renderer, data, repeat):
+        started = time.perf_counter()
+        for _i in range(repeat):
+            output = renderer.render(data, "application/json")
+        return repeat / (time.perf_counter() - started), len(output)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson is not installed, FastJSONRenderer falls back to JSONRenderer")
+
+        stdlib, fast = JSONRenderer(), FastJSONRenderer()
+        failed = False
+        for name, data in self.payloads(options["rows"]).items():
+            expected = stdlib.render(data, "application/json")
+            same = fast.render(data, "application/json") == expected
+            indented = fast.render(data, "application/json; indent=2") == stdlib.render(data, "application/json; indent=2")
+            failed |= not (same and indented)
+
+            stdlib_rate, size = self.rate(stdlib, data, options["repeat"])
+            fast_rate, _size = self.rate(fast, data, options["repeat"])
+            self.stdout.write(
+                f"{name} ({size:,} bytes): json={stdlib_rate:,.0f}/s orjson={fast_rate:,.0f}/s "
+                f"speedup={fast_rate / stdlib_rate:.1f}x same bytes={same} indent={indented}"
+            )
+
+        if failed:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer")
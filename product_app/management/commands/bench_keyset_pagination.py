@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.utils.pagination import KeysetPagination, TwentyPageNumberPagination
+from product_app.models import ProductVariant
+
+ORDERINGS = ("id", "price", "updated_at")
+
+
+class BenchView:
+    ordering_fields = ORDERINGS
+    keyset_default_ordering = "id"
+
+
+class Command(BaseCommand):
+    help = "compare latency of page 1 and a deep page of active variants, OFFSET against keyset"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page", type=int, default=5000, help="deep page number")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=20, help="runs of every measurement")
+
+    def request(self, **params):
+        return Request(APIRequestFactory().get("/bench/", params))
+
+    def timed(self, repeat, paginate):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            paginate()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.fmean(timings), timings[max(int(len(timings) * 0.95) - 1, 0)]
+
+    def offset_page(self, queryset, ordering, page, page_size):
+        paginator = TwentyPageNumberPagination()
+        paginator.page_size = page_size
+        return lambda: paginator.paginate_queryset(queryset.order_by(ordering, "id"), self.request(page=page))
+
+    def keyset_page(self, queryset, ordering, page, page_size):
+        paginator = KeysetPagination()
+        params = {"ordering": ordering, "page_size": page_size}
+        if page > 1:
+            # the row before the page, found once with OFFSET and not timed
+            boundary = queryset.order_by(ordering, "id")[(page - 1) * page_size - 1]
+            paginator.paginate_queryset(queryset, self.request(**params), view=BenchView)
+            params["cursor"] = paginator.make_cursor(boundary, "n")
+        return lambda: paginator.paginate_queryset(queryset, self.request(**params), view=BenchView)
+
+    def handle(self, *args, **options):
+        queryset = ProductVariant.objects.filter(is_active=True)
+        page_size = options["page_size"]
+        total = queryset.count()
+        if total == 0:
+            raise CommandError("no active variant to paginate")
+
+        page = min(options["page"], (total + page_size - 1) // page_size)
+        if page < options["page"]:
+            self.stdout.write(self.style.WARNING(f"{total} active variants, deep page clamped to {page}"))
+
+        for ordering in ORDERINGS:
+            for number in (1, page):
+                offset = self.timed(options["repeat"], self.offset_page(queryset, ordering, number, page_size))
+                keyset = self.timed(options["repeat"], self.keyset_page(queryset, ordering, number, page_size))
+                self.stdout.write(
+                    f"ordering={ordering} page={number}: "
+                    f"offset avg={offset[0]:.1f}ms p95={offset[1]:.1f}ms / "
+                    f"keyset avg={keyset[0]:.1f}ms p95={keyset[1]:.1f}ms"
+                )
@@ -0,0 +1,108 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from product_app.facets import PRICE_BUCKETS
+
+FILL_SQL = """
+    INSERT INTO bench_facet_listing (variant_id, product_id, brand_id, category_id, effective_price)
+    SELECT g, g / 3, 1 + (random() * %(brands)s)::int, 1 + (random() * %(categories)s)::int,
+           (random() * 60000000)::numeric(12, 3)
+    FROM generate_series(1, %(rows)s) AS g
+"""
+TAGS_SQL = """
+    INSERT INTO bench_facet_tags (product_id, tag_id)
+    SELECT DISTINCT p, 1 + (random() * %(tags)s)::int
+    FROM generate_series(0, %(rows)s / 3) AS p, generate_series(1, 2)
+"""
+# the storefront filter under test, one brand is excluded so the rows are a large subset
+FILTER = "brand_id <> 1"
+
+# one query per facet, as the listing filter would need without the endpoint
+SEPARATE_SQL = (
+    f"SELECT brand_id, count(*) FROM bench_facet_listing WHERE {FILTER} GROUP BY brand_id",
+    f"SELECT category_id, count(*) FROM bench_facet_listing WHERE {FILTER} GROUP BY category_id",
+    f"SELECT width_bucket(effective_price, %s::numeric[]), count(*) FROM bench_facet_listing WHERE {FILTER} GROUP BY 1",
+    f"""
+    SELECT t.tag_id, count(*) FROM bench_facet_listing AS l
+    JOIN bench_facet_tags AS t ON t.product_id = l.product_id
+    WHERE {FILTER} GROUP BY t.tag_id
+    """,
+    f"SELECT count(*) FROM bench_facet_listing WHERE {FILTER}",
+)
+# same shape as product_app.facets.FACETS_SQL without the name joins
+ONE_PASS_SQL = f"""
+    WITH filtered AS MATERIALIZED (
+        SELECT product_id, brand_id, category_id, width_bucket(effective_price, %s::numeric[]) AS bucket
+        FROM bench_facet_listing
+        WHERE {FILTER}
+    ), grouped AS (
+        SELECT brand_id, category_id, bucket, GROUPING(brand_id, category_id, bucket) AS set_id, count(*) AS total
+        FROM filtered
+        GROUP BY GROUPING SETS ((brand_id), (category_id), (bucket), ())
+    )
+    SELECT set_id, coalesce(brand_id, category_id, bucket), total FROM grouped
+    UNION ALL
+    SELECT 8, t.tag_id, count(*)
+    FROM filtered AS f
+    JOIN bench_facet_tags AS t ON t.product_id = f.product_id
+    GROUP BY t.tag_id
+"""
+
+
+class Command(BaseCommand):
+    help = "compare one query per facet and the one pass facets query on a generated listing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500_000, help="number of variants")
+        parser.add_argument("--brands", type=int, default=300)
+        parser.add_argument("--categories", type=int, default=200)
+        parser.add_argument("--tags", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def setup(self, cursor, options):
+        cursor.execute(
+            """
+            CREATE TABLE bench_facet_listing (
+                variant_id bigint PRIMARY KEY,
+                product_id bigint NOT NULL,
+                brand_id bigint,
+                category_id bigint,
+                effective_price numeric(12, 3) NOT NULL
+            )
+            """
+        )
+        cursor.execute("CREATE TABLE bench_facet_tags (product_id bigint NOT NULL, tag_id bigint NOT NULL)")
+        cursor.execute(FILL_SQL, options)
+        cursor.execute(TAGS_SQL, options)
+        cursor.execute("CREATE INDEX bench_facet_tags_product ON bench_facet_tags (product_id)")
+        cursor.execute("ANALYZE bench_facet_listing")
+        cursor.execute("ANALYZE bench_facet_tags")
+
+    def timed(self, cursor, queries, repeat):
+        buckets = list(PRICE_BUCKETS)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for sql in queries:
+                cursor.execute(sql, [buckets] if "%s" in sql else [])
+                cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.fmean(timings), timings[max(int(len(timings) * 0.95) - 1, 0)]
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            self.stdout.write(f"creating {options['rows']} variants ...")
+            try:
+                self.setup(cursor, options)
+                separate = self.timed(cursor, SEPARATE_SQL, options["repeat"])
+                one_pass = self.timed(cursor, (ONE_PASS_SQL,), options["repeat"])
+            finally:
+                cursor.execute("DROP TABLE IF EXISTS bench_facet_listing, bench_facet_tags")
+
+        self.stdout.write(f"one query per facet: avg={separate[0]:.1f}ms p95={separate[1]:.1f}ms")
+        self.stdout.write(f"one pass: avg={one_pass[0]:.1f}ms p95={one_pass[1]:.1f}ms")
+        self.stdout.write(self.style.SUCCESS(f"speedup (avg): {separate[0] / one_pass[0]:.1f}x"))
@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.utils.normalize_number import normalize_text
+from product_app.search import SEARCH_CONFIG, prefix_query
+
+WORDS = (
+    "گوشی", "موبایل", "سامسونگ", "شیائومی", "اپل", "هدفون", "بی‌سیم", "کابل", "شارژر", "لپ‌تاپ",
+    "ایسوس", "لنوو", "کیبورد", "ماوس", "گیمینگ", "مانیتور", "اسپیکر", "بلوتوث", "پاوربانک", "قاب",
+    "محافظ", "صفحه", "ساعت", "هوشمند", "تبلت", "دوربین", "فلش", "مموری", "هارد", "اکسترنال",
+)
+QUERIES = ("گوشی سامسونگ", "هدفون بی‌سیم", "شارژر", "ساعت هوشمند", "کیبورد گیمینگ", "SKU-12345", "سامسنگ")
+
+# old search: contains (LIKE) on the name, no index can serve it
+OLD_SQL = """
+    SELECT id FROM bench_search
+    WHERE name LIKE %s
+    ORDER BY id DESC
+    LIMIT 20
+"""
+# the same conditions and rank as product_app.search.search_products
+NEW_SQL = f"""
+    SELECT id,
+           ts_rank(search_vector, to_tsquery('{SEARCH_CONFIG}', %(query)s))
+               + word_similarity(%(text)s, search_text) AS search_rank
+    FROM bench_search
+    WHERE search_vector @@ to_tsquery('{SEARCH_CONFIG}', %(query)s) OR %(text)s <%% search_text
+    ORDER BY search_rank DESC, id DESC
+    LIMIT 20
+"""
+
+
+class Command(BaseCommand):
+    help = "compare LIKE search and full text / trigram search on a generated table of variants"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500_000)
+        parser.add_argument("--repeat", type=int, default=10, help="runs of every query")
+
+    def setup(self, cursor, rows):
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(
+            """
+            CREATE TABLE bench_search (
+                id bigint PRIMARY KEY,
+                name text NOT NULL,
+                search_text text NOT NULL,
+                search_vector tsvector NOT NULL
+            )
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO bench_search (id, name, search_text, search_vector)
+            SELECT g, s.name, lower(s.name), to_tsvector('{SEARCH_CONFIG}', lower(s.name))
+            FROM generate_series(1, %(rows)s) AS g
+            CROSS JOIN LATERAL (
+                SELECT concat_ws(' ',
+                    (%(words)s::text[])[1 + (random() * (cardinality(%(words)s::text[]) - 1))::int],
+                    (%(words)s::text[])[1 + (random() * (cardinality(%(words)s::text[]) - 1))::int],
+                    (%(words)s::text[])[1 + (random() * (cardinality(%(words)s::text[]) - 1))::int],
+                    'SKU-' || g
+                ) AS name
+            ) AS s
+            """,
+            {"rows": rows, "words": [normalize_text(word) for word in WORDS]},
+        )
+        cursor.execute("CREATE INDEX bench_search_vector ON bench_search USING gin (search_vector)")
+        cursor.execute("CREATE INDEX bench_search_trgm ON bench_search USING gin (search_text gin_trgm_ops)")
+        cursor.execute("ANALYZE bench_search")
+
+    def timed(self, cursor, sql, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.fmean(timings), timings[max(int(len(timings) * 0.95) - 1, 0)]
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            self.stdout.write(f"creating {options['rows']} rows ...")
+            try:
+                self.setup(cursor, options["rows"])
+                for text in random.sample(QUERIES, len(QUERIES)):
+                    old = self.timed(cursor, OLD_SQL, (f"%{text}%",), options["repeat"])
+                    normalized = normalize_text(text)
+                    new = self.timed(
+                        cursor, NEW_SQL, {"query": prefix_query(normalized), "text": normalized}, options["repeat"]
+                    )
+                    self.stdout.write(
+                        f"{text}: like avg={old[0]:.1f}ms p95={old[1]:.1f}ms / "
+                        f"search avg={new[0]:.1f}ms p95={new[1]:.1f}ms"
+                    )
+            finally:
+                cursor.execute("DROP TABLE IF EXISTS bench_search")
@@ -0,0 +1,74 @@
+import time
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.v1.product_app.serializers import SeoProductSerializer, serialize_seo_product
+from apis.v1.product_app.views import SeoProductViewSet
+from apis.v1.third_party_app.serializers import TrobSerializer, serialize_torob
+from apis.v1.third_party_app.views import TorobProductView
+from apis.v2.product.serializers import ProductListingSerializer, serialize_listing
+from apis.v2.product.views import ProductListHomePageView
+
+# (name, queryset of the endpoint, drf serializer, compiled function)
+ENDPOINTS = (
+    ("v2 listing", lambda: ProductListHomePageView().get_queryset().order_by("-variant_id"),
+     ProductListingSerializer, serialize_listing),
+    ("torob", lambda: TorobProductView().get_queryset().order_by("id"), TrobSerializer, serialize_torob),
+    ("seo product", lambda: SeoProductViewSet().get_queryset(), SeoProductSerializer, serialize_seo_product),
+)
+
+
+def serialize_drf(serializer_class, rows):
+    return serializer_class(rows, many=True).data
+
+
+def serialize_compiled(function, rows):
+    return [function(row) for row in rows]
+
+
+class Command(BaseCommand):
+    help = "rows per second of the drf serializers and the compiled functions of the hot endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000, help="rows loaded from every endpoint")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def rate(self, serialize, rows, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serialize(rows)
+            best = min(best, time.perf_counter() - started)
+        return len(rows) / best if best else float("inf")
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset, serializer_class, function in ENDPOINTS:
+            # rows and prefetches are loaded once, only serialization is timed
+            try:
+                rows = list(queryset()[:options["rows"]])
+            except Exception as exc:
+                # a broken endpoint queryset is reported, the other endpoints are still measured
+                self.stdout.write(self.style.ERROR(f"{name}: loading rows failed: {exc!r}"))
+                failed.append(name)
+                continue
+            if not rows:
+                self.stdout.write(self.style.WARNING(f"{name}: no rows"))
+                continue
+
+            drf_data = serialize_drf(serializer_class, rows)
+            compiled_data = serialize_compiled(function, rows)
+            same = [dict(item) for item in drf_data] == compiled_data
+
+            drf = self.rate(partial(serialize_drf, serializer_class), rows, options["repeat"])
+            compiled = self.rate(partial(serialize_compiled, function), rows, options["repeat"])
+            self.stdout.write(
+                f"{name} ({len(rows)} rows): drf={drf:,.0f} rows/s compiled={compiled:,.0f} rows/s "
+                f"speedup={compiled / drf:.1f}x same output={same}"
+            )
+            if not same:
+                failed.append(name)
+
+        if failed:
+            raise CommandError(f"failed endpoints: {', '.join(failed)}")
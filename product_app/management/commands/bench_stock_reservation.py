@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from product_app.models import ProductVariant
+from product_app.stock import (
+    flush_deltas,
+    hot_stock_enabled,
+    reconcile_counters,
+    reserve_stock,
+    sync_hot_variants,
+)
+
+
+class Command(BaseCommand):
+    help = "benchmark parallel checkouts against one hot variant and check stock is never oversold"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--variant", type=int, required=True, help="id of the variant under test")
+        parser.add_argument("--stock", type=int, default=500, help="stock_number at the start of the run")
+        parser.add_argument("--checkouts", type=int, default=2000, help="number of checkouts to run")
+        parser.add_argument("--workers", type=int, default=16, help="parallel threads")
+        parser.add_argument("--quantity", type=int, default=1, help="quantity of every checkout")
+        parser.add_argument(
+            "--mode",
+            choices=("set", "lock", "redis"),
+            default="set",
+            help="set --> guarded update / lock --> select_for_update and save (old path) / "
+                 "redis --> hot_stock counter flushed to db at the end",
+        )
+
+    def checkout_set(self, variant_id, quantity):
+        try:
+            with transaction.atomic():
+                failed_ids = reserve_stock({variant_id: quantity})
+                if failed_ids:
+                    transaction.set_rollback(True)
+                    return False
+                return True
+        finally:
+            connection.close()
+
+    def checkout_lock(self, variant_id, quantity):
+        try:
+            with transaction.atomic():
+                variant = ProductVariant.objects.select_for_update().get(id=variant_id)
+                if variant.stock_number < quantity:
+                    return False
+                variant.stock_number -= quantity
+                variant.save(update_fields=("stock_number",))
+                return True
+        finally:
+            connection.close()
+
+    def hot_ids(self):
+        return list(ProductVariant.objects.filter(hot_stock=True, is_active=True).values_list("id", flat=True))
+
+    def handle(self, *args, **options):
+        variant_id = options["variant"]
+        quantity = options["quantity"]
+        start_stock = options["stock"]
+
+        variant = ProductVariant.objects.filter(id=variant_id).only("stock_number", "hot_stock").first()
+        if variant is None:
+            raise CommandError(f"variant {variant_id} not found")
+        original_stock = variant.stock_number
+
+        use_redis = options["mode"] == "redis"
+        if use_redis and not hot_stock_enabled():
+            raise CommandError("set STOCK_REDIS_BACKEND=True to benchmark the redis backend")
+
+        ProductVariant.objects.filter(id=variant_id).update(stock_number=start_stock, hot_stock=use_redis)
+        if use_redis:
+            flush_deltas()
+            sync_hot_variants(self.hot_ids())
+            reconcile_counters([variant_id])
+        checkout = self.checkout_lock if options["mode"] == "lock" else self.checkout_set
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                results = list(
+                    executor.map(
+                        lambda _: checkout(variant_id, quantity),
+                        range(options["checkouts"]),
+                    )
+                )
+            if use_redis:
+                flush_deltas()
+            elapsed = time.perf_counter() - started
+
+            final_stock = ProductVariant.objects.filter(id=variant_id).values_list(
+                "stock_number", flat=True
+            )[0]
+        finally:
+            ProductVariant.objects.filter(id=variant_id).update(
+                stock_number=original_stock, hot_stock=variant.hot_stock
+            )
+            if use_redis:
+                flush_deltas()
+                sync_hot_variants(self.hot_ids())
+                if variant.hot_stock:
+                    reconcile_counters([variant_id])
+
+        succeeded = sum(results)
+        expected_stock = start_stock - succeeded * quantity
+        expected_success = min(options["checkouts"], start_stock // quantity)
+
+        self.stdout.write(f"mode: {options['mode']}")
+        self.stdout.write(f"checkouts: {len(results)} in {elapsed:.3f}s ({len(results) / elapsed:.1f}/s)")
+        self.stdout.write(f"succeeded: {succeeded} / expected: {expected_success}")
+        self.stdout.write(f"final stock: {final_stock} / expected: {expected_stock}")
+
+        if final_stock < 0 or final_stock != expected_stock or succeeded != expected_success:
+            raise CommandError("stock oversold or lost updates detected")
+        self.stdout.write(self.style.SUCCESS("stock never oversold"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from product_app.listing import rebuild_listing, refresh_listing, refresh_price_bounds
+
+
+class Command(BaseCommand):
+    help = "recreate product_listing and the product price bounds from variants, products, discounts and images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--refresh", action="store_true", help="upsert changed rows only, without emptying the table")
+
+    def handle(self, *args, **options):
+        upserted, removed = refresh_listing() if options["refresh"] else rebuild_listing()
+        self.stdout.write(self.style.SUCCESS(f"product_listing: {upserted} rows written, {removed} rows removed"))
+        bounds = refresh_price_bounds()
+        self.stdout.write(self.style.SUCCESS(f"price bounds: {bounds} products updated"))
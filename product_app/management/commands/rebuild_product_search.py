@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from product_app.search import refresh_search
+
+
+class Command(BaseCommand):
+    help = "fill search_text and search_vector of every product"
+
+    def handle(self, *args, **options):
+        updated = refresh_search()
+        self.stdout.write(self.style.SUCCESS(f"{updated} products updated"))
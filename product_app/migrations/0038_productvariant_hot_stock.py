@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_app', '0037_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productvariant',
+            name='hot_stock',
+            field=models.BooleanField(db_default=False, default=False, help_text='موجودی این کالا در ردیس نگه داری و به صورت دسته ای در دیتابیس ذخیره میشود', verbose_name='موجودی در ردیس'),
+        ),
+    ]
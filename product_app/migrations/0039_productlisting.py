@@ -0,0 +1,54 @@
+# Generated by Django 6.0.6 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_app', '0038_productvariant_hot_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('variant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='product_app.productvariant')),
+                ('product_id', models.BigIntegerField()),
+                ('category_id', models.BigIntegerField(blank=True, null=True)),
+                ('brand_id', models.BigIntegerField(blank=True, null=True)),
+                ('product_name', models.CharField(max_length=400)),
+                ('product_slug', models.CharField(blank=True, max_length=500, null=True)),
+                ('description_slug', models.TextField(blank=True, null=True)),
+                ('brand_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('variant_name', models.CharField(max_length=255)),
+                ('sku', models.CharField(blank=True, max_length=50, null=True)),
+                ('in_person_purchase', models.BooleanField(default=False)),
+                ('price', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('effective_price', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('discount_type', models.CharField(blank=True, max_length=7, null=True)),
+                ('discount_amount', models.CharField(blank=True, max_length=15, null=True)),
+                ('discount_end', models.DateTimeField(blank=True, null=True)),
+                ('stock_number', models.PositiveIntegerField(default=0)),
+                ('image_name', models.CharField(blank=True, help_text='نام فایل تصویر در استوریج', max_length=500, null=True)),
+                ('image_url', models.CharField(blank=True, help_text='آدرس تصویر وردپرس', max_length=500, null=True)),
+                ('image_alt', models.CharField(blank=True, max_length=255, null=True)),
+                ('image_order', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('image_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'product_listing',
+                'ordering': ('-variant_id',),
+                'indexes': [
+                    models.Index(fields=['category_id', '-variant_id'], name='listing_category_idx'),
+                    models.Index(fields=['brand_id', '-variant_id'], name='listing_brand_idx'),
+                    models.Index(fields=['effective_price'], name='listing_effective_price_idx'),
+                    models.Index(fields=['price'], name='listing_price_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.6 on 2026-10-18 16:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built concurrently so product_variant stays writable
+    atomic = False
+
+    dependencies = [
+        ('product_app', '0039_productlisting'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='productvariant',
+            index=models.Index(fields=['price', 'id'], name='variant_price_keyset_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='productvariant',
+            index=models.Index(fields=['updated_at', 'id'], name='variant_updated_keyset_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='productlisting',
+            name='listing_price_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='productlisting',
+            index=models.Index(fields=['price', 'variant_id'], name='listing_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='productlisting',
+            index=models.Index(fields=['updated_at', 'variant_id'], name='listing_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.6 on 2026-10-18 17:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built concurrently so product stays writable
+    atomic = False
+
+    dependencies = [
+        ('product_app', '0041_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_effective_price',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='has_active_discount',
+            field=models.BooleanField(db_default=False, default=False, editable=False),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['min_price'], include=['max_price'], name='product_min_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['max_price'], include=['min_price'], name='product_max_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['min_effective_price'], name='product_min_effective_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('has_active_discount', True)), fields=['-id'], name='product_discount_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.text import slugify
 from django_ckeditor_5.fields import CKEditor5Field
@@ -24,6 +26,13 @@ class Category(MP_Node, CreateMixin, UpdateMixin, ActiveMixin):
     def get_category_image_url(self):
         return self.category_image.get_image_url if self.category_image else None
 
+    def move(self, target, pos=None):
+        # treebeard moves the subtree with raw sql and sends no signal
+        from product_app.categories import bump_tree_on_commit
+
+        super().move(target, pos)
+        bump_tree_on_commit()
+
     class Meta:
         ordering = ('id',)
         db_table = 'category'
@@ -164,6 +173,20 @@ class Product(CreateMixin, UpdateMixin, SoftDeleteMixin):
     #     help_text=_("BA Salam ID")
     # )
     # in_person_purchase = models.BooleanField(_("خرید به صورت حضوری"), default=False)
+    # written by product_app.search
+    search_text = models.TextField(blank=True, null=True, editable=False)
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
+    # written by product_app.listing, active variants and their valid discount
+    min_price = models.DecimalField(max_digits=12, decimal_places=3, blank=True, null=True, editable=False)
+    max_price = models.DecimalField(max_digits=12, decimal_places=3, blank=True, null=True, editable=False)
+    min_effective_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    has_active_discount = models.BooleanField(default=False, db_default=False, editable=False)
 
     def save(self, *args, **kwargs):
         self.product_slug = slugify(self.product_name, allow_unicode=True)
@@ -173,6 +196,19 @@ class Product(CreateMixin, UpdateMixin, SoftDeleteMixin):
     class Meta:
         ordering = ('id',)
         db_table = "product"
+        indexes = (
+            GinIndex(fields=("search_vector",), name="product_search_vector_idx"),
+            GinIndex(fields=("search_text",), opclasses=("gin_trgm_ops",), name="product_search_trgm_idx"),
+            # covering, the price range filter reads both bounds from the index
+            models.Index(fields=("min_price",), include=("max_price",), name="product_min_price_idx"),
+            models.Index(fields=("max_price",), include=("min_price",), name="product_max_price_idx"),
+            models.Index(fields=("min_effective_price",), name="product_min_effective_idx"),
+            models.Index(
+                fields=("-id",),
+                condition=models.Q(has_active_discount=True),
+                name="product_discount_idx"
+            ),
+        )
 
 
 class ProductVariant(CreateMixin, UpdateMixin, SoftDeleteMixin):
@@ -195,6 +231,12 @@ class ProductVariant(CreateMixin, UpdateMixin, SoftDeleteMixin):
         help_text=_("BA Salam ID")
     )
     in_person_purchase = models.BooleanField(_("خرید به صورت حضوری"), default=False)
+    hot_stock = models.BooleanField(
+        _("موجودی در ردیس"),
+        default=False,
+        db_default=False,
+        help_text=_("موجودی این کالا در ردیس نگه داری و به صورت دسته ای در دیتابیس ذخیره میشود")
+    )
 
     @cached_property
     def is_available(self):
@@ -203,6 +245,11 @@ class ProductVariant(CreateMixin, UpdateMixin, SoftDeleteMixin):
     class Meta:
         ordering = ('id',)
         db_table = "product_variant"
+        indexes = (
+            # keyset pagination, (field, id) of the last row seeks the next page
+            models.Index(fields=("price", "id"), name="variant_price_keyset_idx"),
+            models.Index(fields=("updated_at", "id"), name="variant_updated_keyset_idx"),
+        )
 
 
 class ProductComment(MP_Node, CreateMixin, UpdateMixin, ActiveMixin):
@@ -243,3 +290,51 @@ class FavoriteProduct(CreateMixin, UpdateMixin, SoftDeleteMixin):
     class Meta:
         ordering = ('id',)
         db_table = "favorite_product"
+
+
+class ProductListing(models.Model):
+    """
+    read model of the home page listing, one row per active variant \n
+    written only by product_app.listing (signals, periodic refresh and rebuild command)
+    """
+    variant = models.OneToOneField(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="listing",
+    )
+    product_id = models.BigIntegerField()
+    category_id = models.BigIntegerField(blank=True, null=True)
+    brand_id = models.BigIntegerField(blank=True, null=True)
+    product_name = models.CharField(max_length=400)
+    product_slug = models.CharField(max_length=500, blank=True, null=True)
+    description_slug = models.TextField(blank=True, null=True)
+    brand_name = models.CharField(max_length=255, blank=True, null=True)
+    variant_name = models.CharField(max_length=255)
+    sku = models.CharField(max_length=50, blank=True, null=True)
+    in_person_purchase = models.BooleanField(default=False)
+    price = models.DecimalField(max_digits=12, decimal_places=3)
+    effective_price = models.DecimalField(max_digits=12, decimal_places=3)
+    discount_type = models.CharField(max_length=7, blank=True, null=True)
+    discount_amount = models.CharField(max_length=15, blank=True, null=True)
+    discount_end = models.DateTimeField(blank=True, null=True)
+    stock_number = models.PositiveIntegerField(default=0)
+    image_name = models.CharField(max_length=500, blank=True, null=True, help_text=_("نام فایل تصویر در استوریج"))
+    image_url = models.CharField(max_length=500, blank=True, null=True, help_text=_("آدرس تصویر وردپرس"))
+    image_alt = models.CharField(max_length=255, blank=True, null=True)
+    image_order = models.PositiveSmallIntegerField(blank=True, null=True)
+    image_updated_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ("-variant_id",)
+        db_table = "product_listing"
+        indexes = (
+            models.Index(fields=("category_id", "-variant_id"), name="listing_category_idx"),
+            models.Index(fields=("brand_id", "-variant_id"), name="listing_brand_idx"),
+            models.Index(fields=("effective_price",), name="listing_effective_price_idx"),
+            models.Index(fields=("price", "variant_id"), name="listing_price_idx"),
+            models.Index(fields=("updated_at", "variant_id"), name="listing_updated_idx"),
+        )
@@ -0,0 +1,102 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import F, Q, Value, FloatField
+
+from core.utils.normalize_number import normalize_text, TRANSLATE_FROM, TRANSLATE_TO
+
+# postgres has no persian dictionary, words are indexed as they are after normalize_text
+SEARCH_CONFIG = "simple"
+
+# search_text --> normalized name, skus, brand, category and tags for the trigram index
+# search_vector --> the same words weighted name/sku A, brand/category B, tags C
+REFRESH_SQL = """
+    WITH source AS (
+        SELECT
+            p.id,
+            lower(translate(p.product_name, %(from)s, %(to)s)) AS name,
+            lower(translate(concat_ws(' ', p.sku, v.skus), %(from)s, %(to)s)) AS skus,
+            lower(translate(coalesce(b.brand_name, ''), %(from)s, %(to)s)) AS brand,
+            lower(translate(coalesce(c.category_name, ''), %(from)s, %(to)s)) AS category,
+            lower(translate(coalesce(t.tags, ''), %(from)s, %(to)s)) AS tags
+        FROM product AS p
+        LEFT JOIN product_brand AS b ON b.id = p.product_brand_id
+        LEFT JOIN category AS c ON c.id = p.category_id
+        LEFT JOIN LATERAL (
+            SELECT string_agg(pv.sku, ' ') AS skus
+            FROM product_variant AS pv
+            WHERE pv.product_id = p.id AND pv.sku IS NOT NULL AND pv.is_deleted IS NOT TRUE
+        ) AS v ON true
+        LEFT JOIN LATERAL (
+            SELECT string_agg(tg.tag_name, ' ') AS tags
+            FROM product_tags AS pt
+            JOIN tag AS tg ON tg.id = pt.tag_id
+            WHERE pt.product_id = p.id AND tg.is_deleted IS NOT TRUE
+        ) AS t ON true
+        {scope}
+    ), documents AS (
+        SELECT
+            id,
+            concat_ws(' ', name, skus, brand, category, tags) AS search_text,
+            setweight(to_tsvector('{config}', name), 'A')
+                || setweight(to_tsvector('{config}', skus), 'A')
+                || setweight(to_tsvector('{config}', brand), 'B')
+                || setweight(to_tsvector('{config}', category), 'B')
+                || setweight(to_tsvector('{config}', tags), 'C') AS search_vector
+        FROM source
+    )
+    UPDATE product AS p
+    SET search_text = d.search_text, search_vector = d.search_vector
+    FROM documents AS d
+    WHERE p.id = d.id
+        AND (p.search_text IS DISTINCT FROM d.search_text OR p.search_vector IS DISTINCT FROM d.search_vector)
+"""
+
+
+def refresh_search(product_ids=None):
+    """
+    rebuild search_text and search_vector of the given products, every product when nothing
+    is given, return number of updated rows
+    """
+    params = {"from": TRANSLATE_FROM, "to": TRANSLATE_TO}
+    scope = ""
+    if product_ids is not None:
+        scope = "WHERE p.id = ANY(%(ids)s)"
+        params["ids"] = [int(pk) for pk in product_ids if pk is not None]
+
+    with connection.cursor() as cursor:
+        cursor.execute(REFRESH_SQL.format(scope=scope, config=SEARCH_CONFIG), params)
+        return cursor.rowcount
+
+
+def refresh_search_on_commit(product_ids):
+    if product_ids:
+        transaction.on_commit(lambda: refresh_search(product_ids))
+
+
+def prefix_query(text):
+    """
+    normalized words of text as a tsquery where every word is a prefix, "گوشی سام" --> گوشی:* & سام:*
+    """
+    words = re.findall(r"\w+", normalize_text(text))
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def search_products(queryset, text):
+    """
+    filter queryset to rows matching text and annotate search_rank, full text prefix match on
+    search_vector or trigram word similarity (pg_trgm.word_similarity_threshold) on search_text
+    for typos and part of a sku
+    """
+    text = normalize_text(text)
+    raw = prefix_query(text)
+    if not raw:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    query = SearchQuery(raw, config=SEARCH_CONFIG, search_type="raw")
+    return queryset.filter(
+        Q(search_vector=query) | Q(search_text__trigram_word_similar=text)
+    ).annotate(
+        search_rank=SearchRank(F("search_vector"), query) + TrigramWordSimilarity(text, "search_text"),
+    )
@@ -1,9 +1,14 @@
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, m2m_changed
 from django.dispatch.dispatcher import receiver
 from django.core.cache import caches
 
 from apis.v1.utils.cache_mixin import CacheMixin
+from discount_app.models import ProductDiscount
 from . import models
+from .categories import bump_tree_on_commit
+from .facets import bump_version_on_commit
+from .listing import refresh_on_commit, refresh_bounds_on_commit
+from .search import refresh_search_on_commit
 
 
 cache_instance = CacheMixin()
@@ -45,3 +50,85 @@ def clear_cache_list_seo_product_name(sender, **kwargs):
 def clear_cache_list_attribute_name(sender, **kwargs):
     key = "product_attribute_cache"
     cache_instance.delete_cache(key)
+
+
+@receiver([post_save, post_delete], sender=models.Tag)
+def bump_facets_tag(sender, **kwargs):
+    bump_version_on_commit()
+
+
+# نگه داری جدول product_listing
+@receiver([post_save, post_delete], sender=models.ProductVariant)
+def refresh_listing_variant(sender, instance, **kwargs):
+    refresh_on_commit(variant_ids=[instance.id])
+    refresh_bounds_on_commit(product_ids=[instance.product_id])
+
+
+@receiver([post_save, post_delete], sender=models.Product)
+def refresh_listing_product(sender, instance, **kwargs):
+    refresh_on_commit(product_ids=[instance.id])
+
+
+@receiver(post_save, sender=models.Product)
+def refresh_bounds_product(sender, instance, **kwargs):
+    # save() writes the bounds loaded with the instance, they are read again after commit
+    refresh_bounds_on_commit(product_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=models.ProductImages)
+def refresh_listing_product_image(sender, instance, **kwargs):
+    refresh_on_commit(product_ids=[instance.product_id])
+
+
+@receiver([post_save, post_delete], sender=models.ProductBrand)
+def refresh_listing_brand(sender, instance, **kwargs):
+    refresh_on_commit(brand_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=ProductDiscount)
+def refresh_listing_discount(sender, instance, **kwargs):
+    refresh_on_commit(variant_ids=[instance.product_variant_id])
+    refresh_bounds_on_commit(variant_ids=[instance.product_variant_id])
+
+
+# نگه داری ستون های جستجوی محصول
+@receiver(post_save, sender=models.Product)
+def refresh_search_product(sender, instance, **kwargs):
+    refresh_search_on_commit([instance.id])
+
+
+@receiver([post_save, post_delete], sender=models.ProductVariant)
+def refresh_search_variant(sender, instance, **kwargs):
+    refresh_search_on_commit([instance.product_id])
+
+
+@receiver(m2m_changed, sender=models.Product.tags.through)
+def refresh_search_product_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        refresh_search_on_commit([instance.id])
+    elif pk_set:
+        refresh_search_on_commit(list(pk_set))
+
+
+@receiver(post_save, sender=models.Tag)
+def refresh_search_tag(sender, instance, **kwargs):
+    refresh_search_on_commit(list(instance.product_tags.values_list("id", flat=True)))
+
+
+@receiver(post_save, sender=models.Category)
+def refresh_search_category(sender, instance, **kwargs):
+    refresh_search_on_commit(list(instance.products.values_list("id", flat=True)))
+
+
+@receiver(post_save, sender=models.ProductBrand)
+def refresh_search_brand(sender, instance, **kwargs):
+    refresh_search_on_commit(list(instance.product_brands.values_list("id", flat=True)))
+
+
+@receiver([post_delete, post_save], sender=models.Category)
+@receiver([post_delete, post_save], sender=models.Product)
+def bump_category_tree(sender, **kwargs):
+    # product counts of the tree change with a product too
+    bump_tree_on_commit()
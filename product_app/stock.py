@@ -0,0 +1,474 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection, transaction
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# کلید های ردیس برای موجودی کالا های پرفروش
+HOT_SET_KEY = "stock:hot"
+DELTA_KEY = "stock:delta"
+COUNTER_KEY = "stock:variant:{}"
+# token --> {"t": time, "v": {variant_id: quantity}}, counters decremented by a checkout that has
+# not committed yet, their delta is written only after commit
+HOLDS_KEY = "stock:holds"
+# a hold older than this belongs to a checkout that never finished (killed worker), reconcile
+# drops it and the counter goes back to db + deltas
+HOLD_TTL = 15 * 60
+
+# KEYS --> counter keys + holds key, ARGV --> quantities, variant ids, hold token, now \n
+# a missing counter means the variant is not hot and is skipped, nothing is
+# decremented unless every hot line has enough stock
+RESERVE_SCRIPT = """
+local n = #KEYS - 1
+local hot = {}
+local failed = {}
+for i = 1, n do
+    local current = redis.call('GET', KEYS[i])
+    if current then
+        table.insert(hot, i)
+        if tonumber(current) < tonumber(ARGV[i]) then
+            table.insert(failed, ARGV[n + i])
+        end
+    end
+end
+if #failed > 0 then
+    return {{}, failed}
+end
+local reserved = {}
+local held = {}
+for _, i in ipairs(hot) do
+    redis.call('DECRBY', KEYS[i], ARGV[i])
+    held[ARGV[n + i]] = tonumber(ARGV[i])
+    table.insert(reserved, ARGV[n + i])
+end
+if #reserved > 0 then
+    redis.call('HSET', KEYS[n + 1], ARGV[2 * n + 1], cjson.encode({t = tonumber(ARGV[2 * n + 2]), v = held}))
+end
+return {reserved, {}}
+"""
+
+# KEYS --> counter keys + holds key + delta key, ARGV --> quantities, variant ids, hold token \n
+# after commit: the hold becomes a delta, a hold dropped by reconcile is decremented again
+CONFIRM_SCRIPT = """
+local n = #KEYS - 2
+local held = redis.call('HDEL', KEYS[n + 1], ARGV[2 * n + 1]) == 1
+for i = 1, n do
+    if not held and redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('DECRBY', KEYS[i], ARGV[i])
+    end
+    redis.call('HINCRBY', KEYS[n + 2], ARGV[n + i], -tonumber(ARGV[i]))
+end
+return 1
+"""
+
+# KEYS --> counter keys + holds key, ARGV --> quantities, variant ids, hold token \n
+# the checkout did not commit, give the held stock back once
+RELEASE_HOLD_SCRIPT = """
+local n = #KEYS - 1
+if redis.call('HDEL', KEYS[n + 1], ARGV[2 * n + 1]) == 0 then
+    return 0
+end
+for i = 1, n do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[i])
+    end
+end
+return 1
+"""
+
+# KEYS --> counter keys + delta key, ARGV --> quantities then variant ids
+RELEASE_SCRIPT = """
+local n = #KEYS - 1
+local released = {}
+for i = 1, n do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[i])
+        redis.call('HINCRBY', KEYS[n + 1], ARGV[n + i], ARGV[i])
+        table.insert(released, ARGV[n + i])
+    end
+end
+return released
+"""
+
+# take every pending delta and clear the hash in one step
+TAKE_DELTAS_SCRIPT = """
+local deltas = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return deltas
+"""
+
+# KEYS --> counter keys + delta key + holds key, ARGV --> stock_number in db, variant ids, now,
+# hold ttl \n
+# counter = db + deltas not flushed yet - live holds, stale holds are dropped,
+# return ids whose counter had drifted
+RECONCILE_SCRIPT = """
+local n = #KEYS - 2
+local now = tonumber(ARGV[2 * n + 1])
+local ttl = tonumber(ARGV[2 * n + 2])
+local held = {}
+local holds = redis.call('HGETALL', KEYS[n + 2])
+for j = 1, #holds, 2 do
+    local hold = cjson.decode(holds[j + 1])
+    if hold.t < now - ttl then
+        redis.call('HDEL', KEYS[n + 2], holds[j])
+    else
+        for variant_id, quantity in pairs(hold.v) do
+            held[variant_id] = (held[variant_id] or 0) + quantity
+        end
+    end
+end
+local drifted = {}
+for i = 1, n do
+    local pending = tonumber(redis.call('HGET', KEYS[n + 1], ARGV[n + i]) or '0')
+    local expected = tonumber(ARGV[i]) + pending - (held[ARGV[n + i]] or 0)
+    local current = redis.call('GET', KEYS[i])
+    if not current or tonumber(current) ~= expected then
+        redis.call('SET', KEYS[i], expected)
+        table.insert(drifted, ARGV[n + i])
+    end
+end
+return drifted
+"""
+
+
+def group_quantities(lines):
+    """
+    lines --> {variant_id: quantity} or [{"product_variant_id": 1, "quantity": 2}, ...]
+    """
+    if isinstance(lines, dict):
+        return {int(k): int(v) for k, v in lines.items() if v}
+
+    quantities = {}
+    for line in lines:
+        variant_id = int(line["product_variant_id"])
+        quantities[variant_id] = quantities.get(variant_id, 0) + int(line["quantity"])
+    return quantities
+
+
+def _values_list(quantities):
+    placeholders = ", ".join(["(%s::bigint, %s::integer)"] * len(quantities))
+    params = [value for pair in quantities.items() for value in pair]
+    return placeholders, params
+
+
+def hot_stock_enabled():
+    return getattr(settings, "STOCK_REDIS_BACKEND", False)
+
+
+def _redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection(getattr(settings, "STOCK_REDIS_ALIAS", "default"))
+
+
+def _script_args(quantities, extra_keys=()):
+    ids = list(quantities)
+    keys = [COUNTER_KEY.format(variant_id) for variant_id in ids] + list(extra_keys)
+    args = [quantities[variant_id] for variant_id in ids] + ids
+    return keys, args
+
+
+def get_stock_levels(levels):
+    """
+    levels --> {variant_id: stock_number in db} \n
+    replace stock_number of hot variants with the live counter in redis,
+    one MGET for all ids
+    """
+    if not levels or not hot_stock_enabled():
+        return levels
+
+    ids = list(levels)
+    try:
+        counters = _redis().mget([COUNTER_KEY.format(variant_id) for variant_id in ids])
+    except RedisError:
+        logger.warning("redis unavailable, read stock from db")
+        return levels
+
+    live = dict(levels)
+    for variant_id, counter in zip(ids, counters):
+        if counter is not None:
+            live[variant_id] = max(int(counter), 0)
+    return live
+
+
+def overlay_live_stock(variants):
+    """
+    set stock_number of hot variant objects from redis
+    """
+    variants = [variant for variant in variants if variant is not None]
+    levels = get_stock_levels({variant.id: variant.stock_number for variant in variants})
+    for variant in variants:
+        variant.stock_number = levels[variant.id]
+        variant.__dict__.pop("is_available", None)  # cached_property
+    return variants
+
+
+# holds taken inside hot_stock_guard, given back when its transaction does not commit
+_guarded_holds = ContextVar("guarded_holds", default=None)
+
+
+@contextmanager
+def hot_stock_guard():
+    """
+    wrap the checkout transaction --> with hot_stock_guard(), transaction.atomic(): \n
+    redis is not part of the transaction, hot stock held inside it is given back when the
+    transaction rolls back, a committed hold was already turned into a delta and is skipped \n
+    without the guard a rolled back hold is dropped by reconcile after HOLD_TTL
+    """
+    holds = []
+    token = _guarded_holds.set(holds)
+    try:
+        yield
+    finally:
+        _guarded_holds.reset(token)
+        for hold_token, hot in holds:
+            _release_hold(hold_token, hot)
+
+
+def _reserve_hot(quantities):
+    """
+    return (reserved hot quantities, failed ids, hold token), empty reserved when redis is down
+    """
+    if not hot_stock_enabled():
+        return {}, [], None
+
+    hold_token = uuid.uuid4().hex
+    keys, args = _script_args(quantities, extra_keys=(HOLDS_KEY,))
+    conn = _redis()
+    try:
+        reserved, failed = conn.register_script(RESERVE_SCRIPT)(
+            keys=keys, args=args + [hold_token, int(time.time())], client=conn
+        )
+    except RedisError:
+        logger.warning("redis unavailable, reserve hot stock in db")
+        return {}, [], None
+
+    reserved = {int(variant_id): quantities[int(variant_id)] for variant_id in reserved}
+    return reserved, [int(variant_id) for variant_id in failed], hold_token
+
+
+def _confirm_hold(hold_token, hot):
+    keys, args = _script_args(hot, extra_keys=(HOLDS_KEY, DELTA_KEY))
+    conn = _redis()
+    try:
+        conn.register_script(CONFIRM_SCRIPT)(keys=keys, args=args + [hold_token], client=conn)
+    except RedisError:
+        # the reservation is committed, write it to db directly so it is not lost with the hold
+        logger.warning("redis unavailable, write committed hot stock to db")
+        _add_stock_db({variant_id: -quantity for variant_id, quantity in hot.items()})
+
+
+def _release_hold(hold_token, hot):
+    keys, args = _script_args(hot, extra_keys=(HOLDS_KEY,))
+    conn = _redis()
+    try:
+        conn.register_script(RELEASE_HOLD_SCRIPT)(keys=keys, args=args + [hold_token], client=conn)
+    except RedisError:
+        logger.warning("redis unavailable, hold %s is dropped by reconcile", hold_token)
+
+
+def _hot_ids(quantities):
+    if not hot_stock_enabled():
+        return set()
+
+    ids = list(quantities)
+    try:
+        counters = _redis().mget([COUNTER_KEY.format(variant_id) for variant_id in ids])
+    except RedisError:
+        logger.warning("redis unavailable, release hot stock in db")
+        return set()
+    return {variant_id for variant_id, counter in zip(ids, counters) if counter is not None}
+
+
+def _release_hot(quantities):
+    """
+    run after commit, lines whose counter is gone (or redis is down) go back to db directly
+    """
+    keys, args = _script_args(quantities, extra_keys=(DELTA_KEY,))
+    conn = _redis()
+    try:
+        released = conn.register_script(RELEASE_SCRIPT)(keys=keys, args=args, client=conn)
+        released = {int(variant_id) for variant_id in released}
+    except RedisError:
+        logger.warning("redis unavailable, release hot stock in db")
+        released = set()
+
+    missed = {k: v for k, v in quantities.items() if k not in released}
+    if missed:
+        _add_stock_db(missed)
+
+
+def reserve_stock(lines):
+    """
+    decrement stock_number of every line in one guarded statement \n
+    hot variants are held on their redis counter, the hold becomes a delta written back by
+    flush_hot_stock only after commit, run the checkout in hot_stock_guard to give the hold back
+    when the transaction rolls back \n
+    return list of variant ids that do not have enough stock, the caller must
+    roll back the transaction when the list is not empty
+    """
+    quantities = group_quantities(lines)
+    if not quantities:
+        return []
+
+    hot, failed_ids, hold_token = _reserve_hot(quantities)
+    if failed_ids:
+        return failed_ids
+
+    cold = {k: v for k, v in quantities.items() if k not in hot}
+    try:
+        failed_ids = _reserve_db(cold) if cold else []
+    except Exception:
+        if hot:
+            _release_hold(hold_token, hot)
+        raise
+    if failed_ids:
+        if hot:
+            _release_hold(hold_token, hot)
+        return failed_ids
+
+    if hot:
+        holds = _guarded_holds.get()
+        if holds is not None:
+            holds.append((hold_token, hot))
+        transaction.on_commit(lambda: _confirm_hold(hold_token, hot))
+    return failed_ids
+
+
+def _reserve_db(quantities):
+    placeholders, params = _values_list(quantities)
+    sql = f"""
+        UPDATE product_variant AS pv
+        SET stock_number = pv.stock_number - v.qty, updated_at = now()
+        FROM (VALUES {placeholders}) AS v(id, qty)
+        WHERE pv.id = v.id AND pv.stock_number >= v.qty
+        RETURNING pv.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        reserved = {row[0] for row in cursor.fetchall()}
+    return [variant_id for variant_id in quantities if variant_id not in reserved]
+
+
+def release_stock(lines):
+    """
+    give stock of every line back in one statement \n
+    hot counters are incremented only after commit, a rolled back release never shows stock
+    """
+    quantities = group_quantities(lines)
+    if not quantities:
+        return 0
+
+    hot_ids = _hot_ids(quantities)
+    hot = {k: v for k, v in quantities.items() if k in hot_ids}
+    if hot:
+        transaction.on_commit(lambda: _release_hot(hot))
+    cold = {k: v for k, v in quantities.items() if k not in hot}
+    if not cold:
+        return len(hot)
+
+    placeholders, params = _values_list(cold)
+    sql = f"""
+        UPDATE product_variant AS pv
+        SET stock_number = pv.stock_number + v.qty, updated_at = now()
+        FROM (VALUES {placeholders}) AS v(id, qty)
+        WHERE pv.id = v.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount + len(hot)
+
+
+def sync_hot_variants(hot_ids):
+    """
+    hot_ids --> ids flagged hot_stock in db \n
+    seed counters of newly flagged variants and drop the ones that are not hot anymore,
+    pending deltas must be flushed before calling it
+    """
+    from product_app.models import ProductVariant
+
+    conn = _redis()
+    current = {int(variant_id) for variant_id in conn.smembers(HOT_SET_KEY)}
+    added = set(hot_ids) - current
+    removed = current - set(hot_ids)
+
+    if added:
+        levels = ProductVariant.objects.filter(id__in=added).values_list("id", "stock_number")
+        pipe = conn.pipeline()
+        for variant_id, stock_number in levels:
+            pipe.set(COUNTER_KEY.format(variant_id), stock_number, nx=True)
+            pipe.sadd(HOT_SET_KEY, variant_id)
+        pipe.execute()
+
+    if removed:
+        pipe = conn.pipeline()
+        for variant_id in removed:
+            pipe.delete(COUNTER_KEY.format(variant_id))
+            pipe.srem(HOT_SET_KEY, variant_id)
+        pipe.execute()
+    return added, removed
+
+
+def _add_stock_db(deltas):
+    placeholders, params = _values_list(deltas)
+    sql = f"""
+        UPDATE product_variant AS pv
+        SET stock_number = GREATEST(pv.stock_number + v.qty, 0), updated_at = now()
+        FROM (VALUES {placeholders}) AS v(id, qty)
+        WHERE pv.id = v.id
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def flush_deltas(batch_size=500):
+    """
+    write pending redis deltas back to product_variant in batches of one statement,
+    the deltas are put back when the write fails
+    """
+    conn = _redis()
+    raw = conn.register_script(TAKE_DELTAS_SCRIPT)(keys=[DELTA_KEY], client=conn)
+    deltas = {int(raw[i]): int(raw[i + 1]) for i in range(0, len(raw), 2)}
+    deltas = {k: v for k, v in deltas.items() if v}
+
+    ids = list(deltas)
+    flushed = 0
+    for start in range(0, len(ids), batch_size):
+        chunk = {variant_id: deltas[variant_id] for variant_id in ids[start:start + batch_size]}
+        try:
+            _add_stock_db(chunk)
+        except Exception:
+            pending = {variant_id: deltas[variant_id] for variant_id in ids[start:]}
+            pipe = conn.pipeline()
+            for variant_id, delta in pending.items():
+                pipe.hincrby(DELTA_KEY, variant_id, delta)
+            pipe.execute()
+            raise
+        flushed += len(chunk)
+    return flushed
+
+
+def reconcile_counters(hot_ids):
+    """
+    set every hot counter to stock_number in db plus the deltas that are not flushed yet minus
+    the live holds, holds older than HOLD_TTL are dropped \n
+    return ids whose counter had drifted
+    """
+    from product_app.models import ProductVariant
+
+    levels = dict(ProductVariant.objects.filter(id__in=hot_ids).values_list("id", "stock_number"))
+    if not levels:
+        return []
+
+    conn = _redis()
+    keys, args = _script_args(levels, extra_keys=(DELTA_KEY, HOLDS_KEY))
+    drifted = conn.register_script(RECONCILE_SCRIPT)(
+        keys=keys, args=args + [int(time.time()), HOLD_TTL], client=conn
+    )
+    return [int(variant_id) for variant_id in drifted]
@@ -24,3 +24,72 @@ def create_comment_notification_admin(category_id, product_id, comment_id):
 @shared_task(serializer='pickle')
 def update_product_id_ba_salam(product, image_id_ba_salam):
     product.update(product_id_ba_salam=image_id_ba_salam)
+
+
+@shared_task(queue='update_order')
+def flush_hot_stock(batch_size=500):
+    """
+    write redis stock deltas of hot variants back to db, sync the hot set and fix drifted counters
+    """
+    from django.core.cache import cache
+
+    from product_app.models import ProductVariant
+    from product_app.stock import flush_deltas, hot_stock_enabled, reconcile_counters, sync_hot_variants
+
+    if not hot_stock_enabled():
+        return None
+
+    # فقط یک worker همزمان موجودی را flush کند
+    if not cache.add("stock:flush:lock", 1, timeout=300):
+        return None
+
+    try:
+        flushed = flush_deltas(batch_size=batch_size)
+        hot_ids = list(ProductVariant.objects.filter(hot_stock=True, is_active=True).values_list("id", flat=True))
+        added, removed = sync_hot_variants(hot_ids)
+        drifted = reconcile_counters(hot_ids)
+    finally:
+        cache.delete("stock:flush:lock")
+
+    return {"flushed": flushed, "added": len(added), "removed": len(removed), "drifted": len(drifted)}
+
+
+@shared_task(queue='update_order')
+def refresh_product_listing():
+    """
+    full refresh of product_listing and product price bounds, picks up bulk updates that send
+    no signal, schedule it every few minutes in beat
+    """
+    from product_app.listing import refresh_listing, refresh_price_bounds
+
+    upserted, removed = refresh_listing()
+    bounds = refresh_price_bounds()
+    return {"upserted": upserted, "removed": removed, "bounds": bounds}
+
+
+@shared_task(queue='update_order')
+def refresh_discount_windows():
+    """
+    refresh the variants whose discount started or ended since the last run, schedule it every
+    minute in beat so prices follow start_date and end_date
+    """
+    from datetime import datetime, timedelta
+
+    from django.core.cache import cache
+    from django.utils import timezone
+
+    from product_app.listing import refresh_discount_windows as refresh_windows
+
+    if not cache.add("discount:windows:lock", 1, timeout=300):
+        return None
+
+    try:
+        until = timezone.now()
+        last_run = cache.get("discount:windows:last_run")
+        since = datetime.fromisoformat(last_run) if last_run else until - timedelta(hours=1)
+        variant_ids = refresh_windows(since, until)
+        cache.set("discount:windows:last_run", until.isoformat(), timeout=None)
+    finally:
+        cache.delete("discount:windows:lock")
+
+    return {"variants": len(variant_ids)}
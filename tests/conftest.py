@@ -0,0 +1,89 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+
+@pytest.fixture
+def user(db):
+    from account_app.models import User
+
+    return User.objects.create(mobile_phone="09120000001", username="buyer", email="buyer@example.com")
+
+
+@pytest.fixture
+def profile(user):
+    from account_app.models import Profile
+
+    return Profile.objects.get_or_create(user=user)[0]
+
+
+@pytest.fixture
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def category(db):
+    from product_app.models import Category
+
+    return Category.add_root(category_name="ابزار")
+
+
+@pytest.fixture
+def make_variant(category):
+    from product_app.models import Product, ProductVariant
+
+    def make(name="variant", price=Decimal("100000"), stock=10):
+        product = Product.objects.create(product_name=name, product_slug=name, category=category)
+        return ProductVariant.objects.create(product=product, name=name, price=price, stock_number=stock)
+    return make
+
+
+@pytest.fixture
+def variant(make_variant):
+    return make_variant()
+
+
+@pytest.fixture
+def make_order(user, profile, variant):
+    """
+    order of the user with one reserved line, track_id --> a payment of the gateway
+    """
+    from account_app.models import State, City, UserAddress
+    from order_app.models import (
+        Order, OrderItem, PaymentGateWay, ShippingCompany, ShippingMethod, StockReservation
+    )
+
+    state = State.objects.create(name="تهران")
+    address = UserAddress.objects.create(
+        state=state,
+        city=City.objects.create(name="تهران", state=state),
+        user=user,
+        title="خانه",
+        address_line="خیابان",
+        postal_code="1234567890",
+    )
+    shipping = ShippingMethod.objects.create(
+        company=ShippingCompany.objects.create(name="پست"), name="پست", price=Decimal("50000"), estimated_days=3
+    )
+
+    def make(status="pending", track_id=None):
+        order = Order.objects.create(
+            profile=profile, status=status, address=address, shipping=shipping,
+            first_name="علی", last_name="رضایی", phone="09120000001",
+        )
+        OrderItem.objects.create(order=order, product_variant=variant, price=variant.price, quantity=1)
+        StockReservation.objects.create(
+            order=order, product_variant=variant, quantity=1, expires_at=timezone.now() + timedelta(minutes=10)
+        )
+        if track_id:
+            PaymentGateWay.objects.create(
+                order=order, user=user, payment_gateway={"trackId": track_id, "result": 100}, track_id=track_id
+            )
+        return order
+    return make
@@ -0,0 +1,88 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+import io
+
+import pytest
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.utils.renderers import FastJSONParser, FastJSONRenderer
+
+NOW = timezone.now()
+
+
+class ImageSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    url = serializers.CharField()
+
+
+class VariantSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    price = serializers.DecimalField(max_digits=15, decimal_places=3)
+    created_at = serializers.DateTimeField()
+    images = ImageSerializer(many=True)
+
+
+class ProductSerializer(serializers.Serializer):
+    title = serializers.CharField()
+    category = serializers.DictField()
+    variants = VariantSerializer(many=True)
+
+
+def nested_data():
+    product = {
+        "title": "دریل «بوش»",
+        "category": {"id": 1, "name": _("ابزار برقی")},
+        "variants": [
+            {
+                "name": f"variant {i}",
+                "price": Decimal("1250000.500") + i,
+                "created_at": NOW + timedelta(minutes=i),
+                "images": [{"id": uuid.uuid4(), "url": f"/media/{i}.webp"}],
+            }
+            for i in range(3)
+        ],
+    }
+    return ProductSerializer([product, product], many=True).data
+
+
+PAYLOADS = {
+    "decimal": {"value": Decimal("1250000.500"), "small": Decimal("0.1"), "negative": Decimal("-3")},
+    "datetime": {"aware": NOW, "naive": NOW.replace(tzinfo=None), "date": NOW.date(), "time": NOW.time()},
+    "duration": {"value": timedelta(days=1, seconds=5)},
+    "uuid": {"value": uuid.uuid4()},
+    "lazy": {"value": _("خرید به صورت حضوری"), "list": [_("سبد خرید")]},
+    "strings": {"persian": "گوشی «سامسونگ» \"quoted\" \\ \n\t", "separators": "a\u2028b\u2029c"},
+    "keys": {"int_keys": {1: "a", 2: "b"}},
+    "containers": {"tuple": (1, 2, 3), "set": {1}, "nested": [None, True, False, 0, -1, 2 ** 62, "", []]},
+    "big int": {"value": 2 ** 70},
+    "nested serializers": nested_data(),
+    "empty list": [],
+}
+
+
+@pytest.mark.parametrize("data", PAYLOADS.values(), ids=PAYLOADS.keys())
+@pytest.mark.parametrize("media_type", ["application/json", "application/json; indent=2"])
+def test_same_bytes_as_drf(data, media_type):
+    assert FastJSONRenderer().render(data, media_type) == JSONRenderer().render(data, media_type)
+
+
+def test_same_bytes_as_drf_with_ascii_output():
+    class AsciiRenderer(FastJSONRenderer):
+        ensure_ascii = True
+
+    class DRFAsciiRenderer(JSONRenderer):
+        ensure_ascii = True
+
+    data = PAYLOADS["strings"]
+    assert AsciiRenderer().render(data) == DRFAsciiRenderer().render(data)
+
+
+def test_parser_reports_invalid_json():
+    with pytest.raises(ParseError, match="^JSON parse error - "):
+        FastJSONParser().parse(io.BytesIO(b'{"price": '))
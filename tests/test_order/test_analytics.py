@@ -0,0 +1,29 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from order_app.models import Order
+
+
+@pytest.fixture
+def admin_client(api_client, user):
+    user.is_staff = True
+    user.save()
+    return api_client
+
+
+@pytest.mark.django_db
+def test_sales_count_orders_in_every_fulfilment_status(admin_client, make_order):
+    for status in ("paid", "preparing", "shipped", "delivered", "pending", "needs_refund"):
+        order = make_order(status=status)
+        Order.objects.filter(id=order.id).update(is_complete=status != "pending")
+    today = timezone.localdate().isoformat()
+
+    summary = admin_client.get(reverse("v1_order_app:analytics_order-sale-summary")).json()
+    daily = admin_client.get(
+        reverse("v1_order_app:analytics_order-daily-sale-summary"), {"start_date": today, "end_date": today}
+    ).json()
+
+    # one line of 100000 per order
+    assert summary == {"total_quantity": 4, "total_amount": 400000.0}
+    assert daily[0]["total_quantity"] == 4
@@ -0,0 +1,26 @@
+import pytest
+
+from order_app import tasks
+from order_app.events import dispatch_events
+from order_app.models import OrderEvent
+
+
+@pytest.mark.django_db
+def test_each_event_queues_its_own_sms(make_order, monkeypatch, django_capture_on_commit_callbacks):
+    sent = []
+    monkeypatch.setattr(tasks.send_sms_after_complete_order, "delay", lambda *args: sent.append(("paid", *args)))
+    monkeypatch.setattr(tasks.send_sms_after_cancel_order, "delay", lambda *args: sent.append(("cancel", *args)))
+    monkeypatch.setattr(tasks.dispatch_order_events, "delay", lambda *args: None)
+    paid, cancelled = make_order(), make_order()
+    OrderEvent.objects.create(
+        order=paid, event_type="paid", payload={"mobile_phone": "09120000001", "tracking_code": "A1"}
+    )
+    OrderEvent.objects.create(
+        order=cancelled, event_type="fail_by_user", payload={"mobile_phone": "09120000002", "tracking_code": "B2"}
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert dispatch_events() == 2
+
+    assert sorted(sent) == [("cancel", "09120000002", "B2"), ("paid", "09120000001", "A1")]
+    assert not OrderEvent.objects.filter(dispatched_at__isnull=True).exists()
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from order_app.models import Order
+from order_app.reconciliation import MIN_AGE, collect_unsettled
+
+
+@pytest.mark.django_db
+def test_collects_orders_before_their_reservation_expires(make_order):
+    # both reservations are still live (10 minutes), only the older one missed its callback
+    make_order(track_id=1001)
+    waiting = make_order(track_id=1002)
+    Order.objects.filter(id=waiting.id).update(created_at=timezone.now() - timedelta(minutes=4))
+
+    collected = collect_unsettled(limit=10, min_age=MIN_AGE, max_age=60 * 60)
+
+    assert [payment["order_id"] for payment in collected] == [waiting.id]
@@ -0,0 +1,140 @@
+import pytest
+from django.urls import reverse
+
+from order_app.models import Order, OrderEvent, StockReservation, VerifyPaymentGateWay
+
+TRACK_ID = 4281457157
+
+# savepoint of settle_payments + the settle statement + release savepoint
+SETTLE_QUERIES = 3
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    """
+    answer of zibal verify for the next request
+    """
+    answer = {}
+    monkeypatch.setattr("apis.v1.order_app.views.verify_payment", lambda track_id: dict(answer))
+    return answer
+
+
+def verify(api_client, order, track_id=TRACK_ID):
+    return api_client.get(
+        reverse("v1_order_app:verify_payment"),
+        {"success": 1, "status": 2, "trackId": track_id, "orderId": order.id},
+    )
+
+
+def order_status(order):
+    return Order.objects.values_list("status", flat=True).get(id=order.id)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "answer, status_code, status",
+    [
+        ({"status": 1, "result": 100}, 200, "paid"),
+        ({"status": 2, "result": 201}, 200, "paid"),
+        ({"status": -1, "result": 100}, 204, "processing"),
+        ({"status": -2, "result": 100}, 400, "fail"),
+        ({"status": 3, "result": 100}, 400, "fail_by_user"),
+        ({"status": 2, "result": 202}, 400, "fail_by_user"),
+    ],
+)
+def test_verify_settles_in_one_statement(
+    api_client, make_order, gateway, django_assert_num_queries, answer, status_code, status
+):
+    order = make_order(track_id=TRACK_ID)
+    gateway.update(answer)
+
+    with django_assert_num_queries(SETTLE_QUERIES):
+        resp = verify(api_client, order)
+
+    assert resp.status_code == status_code
+    assert order_status(order) == status
+    assert VerifyPaymentGateWay.objects.filter(payment_gateway__order=order).count() == 1
+
+
+@pytest.mark.django_db
+def test_paid_commits_reservation_and_writes_one_event(api_client, make_order, gateway):
+    order = make_order(track_id=TRACK_ID)
+    gateway.update(status=1, result=100)
+
+    verify(api_client, order)
+
+    order.refresh_from_db()
+    assert order.is_complete and order.payment_date is not None
+    assert StockReservation.objects.get(order=order).status == "committed"
+    assert list(OrderEvent.objects.filter(order=order).values_list("event_type", flat=True)) == ["paid"]
+
+
+@pytest.mark.django_db
+def test_repeated_verify_of_the_same_track_id(api_client, make_order, gateway, django_assert_num_queries):
+    order = make_order(track_id=TRACK_ID)
+    gateway.update(status=1, result=100)
+    verify(api_client, order)
+
+    gateway.update(status=2, result=201)
+    with django_assert_num_queries(SETTLE_QUERIES):
+        resp = verify(api_client, order)
+
+    assert resp.status_code == 200
+    assert order_status(order) == "paid"
+    assert VerifyPaymentGateWay.objects.filter(payment_gateway__order=order).count() == 2
+    assert OrderEvent.objects.filter(order=order).count() == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("answer", [{"status": -1, "result": 100}, {"status": -2, "result": 100}, {"status": 3}])
+def test_second_callback_does_not_move_paid_order_back(
+    api_client, make_order, gateway, django_assert_num_queries, answer
+):
+    order = make_order(track_id=TRACK_ID)
+    gateway.update(status=1, result=100)
+    verify(api_client, order)
+
+    gateway.clear()
+    gateway.update(answer)
+    with django_assert_num_queries(SETTLE_QUERIES):
+        resp = verify(api_client, order)
+
+    assert resp.status_code == 409
+    assert order_status(order) == "paid"
+    # the gateway answer is kept anyway
+    assert VerifyPaymentGateWay.objects.filter(payment_gateway__order=order).count() == 2
+
+
+@pytest.mark.django_db
+def test_paid_after_cancel_needs_refund(api_client, make_order, gateway, django_assert_num_queries):
+    order = make_order(status="cancelled", track_id=TRACK_ID)
+    StockReservation.objects.filter(order=order).update(status="released")
+    gateway.update(status=1, result=100)
+
+    with django_assert_num_queries(SETTLE_QUERIES):
+        resp = verify(api_client, order)
+
+    assert resp.status_code == 409
+    order.refresh_from_db()
+    assert order.status == "needs_refund" and not order.is_complete
+    assert StockReservation.objects.get(order=order).status == "released"
+    assert VerifyPaymentGateWay.objects.filter(payment_gateway__order=order).count() == 1
+    assert list(OrderEvent.objects.filter(order=order).values_list("event_type", flat=True)) == ["needs_refund"]
+
+    # a replayed 201 keeps it there without a second event
+    gateway.update(status=2, result=201)
+    assert verify(api_client, order).status_code == 409
+    assert order_status(order) == "needs_refund"
+    assert OrderEvent.objects.filter(order=order).count() == 1
+
+
+@pytest.mark.django_db
+def test_unknown_track_id_is_not_settled(api_client, make_order, gateway):
+    order = make_order(track_id=TRACK_ID)
+    gateway.update(status=1, result=100)
+
+    resp = verify(api_client, order, track_id=TRACK_ID + 1)
+
+    assert resp.status_code == 404
+    assert order_status(order) == "pending"
+    assert not VerifyPaymentGateWay.objects.exists()
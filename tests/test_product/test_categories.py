@@ -0,0 +1,20 @@
+import pytest
+
+from product_app.categories import build_category_tree
+from product_app.models import Product
+
+
+@pytest.mark.django_db
+def test_counts_leave_deleted_and_inactive_products_out(category):
+    child = category.add_child(category_name="دریل")
+    for name in ("listed", "deleted", "inactive"):
+        Product.objects.create(product_name=name, product_slug=name, category=child)
+    Product.objects.create(product_name="root", product_slug="root", category=category)
+    Product.objects.filter(product_slug="deleted").update(is_deleted=True)
+    Product.objects.filter(product_slug="inactive").update(is_active=False)
+
+    [root] = build_category_tree()
+    [node] = root["children"]
+
+    assert (node["product_count"], node["total_product_count"]) == (1, 1)
+    assert (root["product_count"], root["total_product_count"]) == (1, 2)
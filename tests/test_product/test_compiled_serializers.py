@@ -0,0 +1,78 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from apis.v1.product_app.serializers import SeoProductSerializer, serialize_seo_product
+from apis.v1.product_app.views import SeoProductViewSet
+from apis.v1.third_party_app.serializers import TrobSerializer, serialize_torob
+from apis.v1.third_party_app.views import TorobProductView
+from apis.v2.product.serializers import ProductListingSerializer, serialize_listing
+from apis.v2.product.views import ProductListHomePageView
+
+# (queryset of the endpoint, drf serializer, compiled function)
+ENDPOINTS = {
+    "v2 listing": (lambda: ProductListHomePageView().get_queryset().order_by("-variant_id"),
+                   ProductListingSerializer, serialize_listing),
+    "torob": (lambda: TorobProductView().get_queryset().order_by("id"), TrobSerializer, serialize_torob),
+    "seo product": (lambda: SeoProductViewSet().get_queryset().order_by("id"), SeoProductSerializer,
+                    serialize_seo_product),
+}
+
+
+def image(name, **fields):
+    from core_app.models import Image
+
+    # update --> the post_save signal of Image uploads a new file to basalam
+    instance = Image.objects.create(**fields)
+    Image.objects.filter(id=instance.id).update(image=f"images/2026/10/18/{name}")
+    instance.refresh_from_db()
+    return instance
+
+
+@pytest.fixture
+def catalog(make_variant):
+    """
+    variants with and without brand, images, attributes and discounts, the listing rebuilt from them
+    """
+    from discount_app.models import ProductDiscount
+    from product_app.listing import rebuild_listing
+    from product_app.models import Attribute, ProductBrand, ProductImages, ProductVariantAttributeValues
+
+    brand = ProductBrand.objects.create(brand_name="بوش")
+    color = Attribute.objects.create(attribute_name="رنگ")
+    now = timezone.now()
+
+    plain = make_variant("plain", price=Decimal("99000"), stock=0)
+    branded = make_variant("branded", price=Decimal("1250000.500"), stock=4)
+    branded.product.brand = brand
+    branded.product.save()
+    ProductImages.objects.create(product=branded.product, image=image("drill.webp"), alt_text_image="دریل")
+    ProductImages.objects.create(product=plain.product, image=image("saw.jpg", wp_image_url="https://example.com/saw.jpg"))
+    ProductVariantAttributeValues.objects.create(product=branded.product, attribute=color, value="آبی")
+    ProductVariantAttributeValues.objects.create(product=branded.product, attribute=color, value="قرمز", is_active=False)
+    ProductDiscount.objects.create(
+        product_variant=branded, discount_type="percent", amount="10", start_date=now - timedelta(days=1),
+        end_date=now + timedelta(days=1),
+    )
+    rebuild_listing()
+    return [plain, branded]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_compiled_output_is_drf_output(catalog, endpoint):
+    queryset, serializer_class, function = ENDPOINTS[endpoint]
+    rows = list(queryset())
+
+    assert rows
+    assert [function(row) for row in rows] == [dict(item) for item in serializer_class(rows, many=True).data]
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_bench_serializers(catalog):
+    from django.core.management import call_command
+
+    call_command("bench_serializers", rows=100, repeat=3)
@@ -0,0 +1,32 @@
+import pytest
+from django.core.cache import cache
+
+from product_app.facets import VERSION_KEY, compute_facets
+from product_app.listing import rebuild_listing
+from product_app.models import ProductListing, Tag
+
+
+@pytest.mark.django_db
+def test_tag_facet_skips_inactive_and_deleted_tags(make_variant):
+    active = Tag.objects.create(tag_name="برقی")
+    inactive = Tag.objects.create(tag_name="قدیمی", is_active=False)
+    deleted = Tag.objects.create(tag_name="حذف شده", is_deleted=True)
+    for name in ("drill", "saw"):
+        make_variant(name).product.tags.add(active, inactive, deleted)
+    rebuild_listing()
+
+    facets = compute_facets(ProductListing.objects.all())
+
+    assert facets["tags"] == [{"id": active.id, "name": "برقی", "count": 2}]
+
+
+@pytest.mark.django_db
+def test_tag_change_drops_cached_facets(django_capture_on_commit_callbacks):
+    tag = Tag.objects.create(tag_name="برقی")
+    version = cache.get(VERSION_KEY) or 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.is_active = False
+        tag.save()
+
+    assert cache.get(VERSION_KEY) == version + 1
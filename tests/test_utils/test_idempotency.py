@@ -0,0 +1,96 @@
+import time
+
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework import response, views
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apis.v1.utils import idempotency
+from apis.v1.utils.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, idempotent
+
+
+class DownCache:
+    """
+    django-redis with DJANGO_REDIS_IGNORE_EXCEPTIONS when redis is down
+    """
+    def get(self, *args, **kwargs):
+        return None
+
+    def add(self, *args, **kwargs):
+        return None
+
+    def set(self, *args, **kwargs):
+        return None
+
+    def delete(self, *args, **kwargs):
+        return None
+
+
+class CountView(views.APIView):
+    calls = 0
+
+    @idempotent("count", wait=0.3, poll_interval=0.05)
+    def post(self, request):
+        CountView.calls += 1
+        return response.Response({"calls": CountView.calls}, status=201)
+
+
+@pytest.fixture
+def call(user):
+    CountView.calls = 0
+    factory = APIRequestFactory()
+
+    def call(key="key-1", data=None):
+        request = factory.post("/count/", data or {"a": 1}, format="json", headers={IDEMPOTENCY_HEADER: key})
+        force_authenticate(request, user)
+        return CountView.as_view()(request)
+    return call
+
+
+@pytest.fixture
+def local_cache(monkeypatch):
+    cache = LocMemCache("idempotency-test", {})
+    monkeypatch.setattr(idempotency, "cache", cache)
+    return cache
+
+
+def test_replays_the_first_response(call, local_cache):
+    first = call()
+    second = call()
+
+    assert first.status_code == second.status_code == 201
+    assert second.data == {"calls": 1}
+    assert second[REPLAYED_HEADER] == "true"
+    assert CountView.calls == 1
+
+
+def test_key_reused_with_another_body(call, local_cache):
+    call()
+
+    assert call(data={"a": 2}).status_code == 422
+
+
+def test_in_progress_duplicate_waits_only_until_the_deadline(call, monkeypatch):
+    # the lock of another worker is never released and its response never stored
+    busy = DownCache()
+    busy.add = lambda *args, **kwargs: False
+    monkeypatch.setattr(idempotency, "cache", busy)
+
+    started = time.monotonic()
+    resp = call()
+
+    assert resp.status_code == 409
+    assert time.monotonic() - started < 1
+    assert CountView.calls == 0
+
+
+def test_cache_down_runs_without_idempotency(call, monkeypatch):
+    monkeypatch.setattr(idempotency, "cache", DownCache())
+
+    started = time.monotonic()
+    first = call()
+    second = call()
+
+    assert first.status_code == second.status_code == 201
+    assert CountView.calls == 2
+    assert time.monotonic() - started < 1